@@ -5,6 +5,7 @@
 - 多级别日志（DEBUG, INFO, WARNING, ERROR）
 - 文件分类（主日志、错误日志、MCP日志）
 - 日志轮转（防止文件过大）
+- 文件日志后台线程写入（不阻塞调用方）
 - 格式统一
 - 易于调试
 
@@ -13,9 +14,11 @@
 日期: 2024-01-23
 """
 
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 from pathlib import Path
 
@@ -51,6 +54,12 @@ SIMPLE_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 MAX_BYTES = 10 * 1024 * 1024  # 10MB
 BACKUP_COUNT = 5              # 保留5个备份
 
+# 文件日志经队列交给后台线程写入（调用方只入队，不阻塞 asyncio 事件循环）
+LOG_FILE_QUEUE_ENABLED = True
+
+# 已启动的后台写日志线程（进程退出时停止并写完剩余日志）
+_queue_listeners: list[QueueListener] = []
+
 
 # ============================================================================
 # 日志开关控制函数
@@ -109,6 +118,8 @@ def setup_logging(
     if logger.handlers:
         return logger
 
+    file_handlers = []
+
     # ========================================
     # 文件Handler - 主日志（所有级别）
     # ========================================
@@ -121,7 +132,7 @@ def setup_logging(
         )
         main_handler.setLevel(logging.DEBUG)
         main_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(main_handler)
+        file_handlers.append(main_handler)
 
     # ========================================
     # 文件Handler - 错误日志（ERROR及以上）
@@ -135,7 +146,7 @@ def setup_logging(
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(error_handler)
+        file_handlers.append(error_handler)
 
     # ========================================
     # 文件Handler - 调试日志（DEBUG级别）
@@ -149,7 +160,21 @@ def setup_logging(
         )
         debug_handler.setLevel(logging.DEBUG)
         debug_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        logger.addHandler(debug_handler)
+        file_handlers.append(debug_handler)
+
+    # ========================================
+    # 文件Handler挂载（队列模式下由后台线程统一写入）
+    # ========================================
+    if file_handlers:
+        if LOG_FILE_QUEUE_ENABLED:
+            log_queue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, *file_handlers, respect_handler_level=True)
+            listener.start()
+            _queue_listeners.append(listener)
+            logger.addHandler(QueueHandler(log_queue))
+        else:
+            for handler in file_handlers:
+                logger.addHandler(handler)
 
     # ========================================
     # 控制台Handler（用户可见）
@@ -163,6 +188,15 @@ def setup_logging(
     return logger
 
 
+def _stop_queue_listeners():
+    """进程退出时停止后台写日志线程，并把队列中剩余的日志写入文件"""
+    while _queue_listeners:
+        _queue_listeners.pop().stop()
+
+
+atexit.register(_stop_queue_listeners)
+
+
 def get_logger(name: str = None) -> logging.Logger:
     """
     获取日志记录器（简便方法）
@@ -311,10 +345,22 @@ def clean_old_logs(days: int = 7):
 
 
 def _count_lines(filepath: Path) -> int:
-    """安全地计算文件行数（使用 with 语句避免资源泄漏）"""
+    """
+    安全地计算文件行数（使用 with 语句避免资源泄漏）
+
+    以二进制分块读取并用 bytes.count 统计换行符（C 实现），无需解码或逐行生成字符串；
+    末尾没有换行符的最后一行也计入。
+    """
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            return sum(1 for _ in f)
+        lines = 0
+        last = b""
+        with open(filepath, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                lines += chunk.count(b"\n")
+                last = chunk
+        if last and not last.endswith(b"\n"):
+            lines += 1
+        return lines
     except Exception:
         return 0
 
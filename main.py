@@ -25,6 +25,8 @@ import asyncio
 import warnings
 from pocketflow import AsyncFlow
 
+from memory import wait_for_pending_saves_async
+
 # 导入日志系统
 from logging_config import (
     setup_logging,
@@ -46,6 +48,7 @@ from nodes import (
     AnswerNode,
     EmbedNode,
     SupervisorNode,
+    shutdown_python_workers_async,
 )
 
 
@@ -150,6 +153,9 @@ async def main_async():
     try:
         await flow.run_async(shared)
     finally:
+        # 终止常驻的 Python 工作进程，等待记忆后台保存完成
+        await shutdown_python_workers_async()
+        await wait_for_pending_saves_async()
         # 确保会话结束时记录日志
         log_session_end()
 
@@ -34,8 +34,8 @@ import os
 import logging
 import traceback
 from pathlib import Path
-from dataclasses import dataclass, field
-from typing import Dict, List, Any, Optional, Literal
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Any, Optional, Literal, Tuple
 
 # ============================================================================
 # 日志配置
@@ -132,6 +132,15 @@ TOOL_SCHEMA_PATCHES: Dict[str, Dict[str, Any]] = {
 }
 
 
+# ============================================================================
+# 工具列表磁盘缓存
+# ============================================================================
+
+# 工具列表缓存文件：记录 mcp.json 的 mtime 和上次发现的工具，
+# 配置未变化时冷启动可直接加载，无需逐个连接 MCP 服务器
+MCP_TOOLS_CACHE_FILE = "_mcp_cache.json"
+
+
 # ============================================================================
 # 数据类定义
 # ============================================================================
@@ -202,11 +211,14 @@ class MCPManager:
         result = manager.call_tool("tool_name", {"param": "value"})
     """
 
-    def __init__(self, config_path: str = "mcp.json"):
+    def __init__(self, config_path: str = "mcp.json", cache_path: str = MCP_TOOLS_CACHE_FILE):
         """初始化 MCP 管理器"""
         self.config_path = config_path
+        self.cache_path = cache_path
         self.servers: Dict[str, MCPServerConfig] = {}
         self.tools: Dict[str, Tool] = {}
+        # format_tools_for_prompt 结果缓存：(生成时的 self.tools, 工具数, 文本)，工具列表替换后自动失效
+        self._tools_prompt_cache: Optional[Tuple[Dict[str, Tool], int, str]] = None
         self._load_config()
 
     # ========================================================================
@@ -250,12 +262,23 @@ class MCPManager:
     # 异步工具发现 (推荐使用)
     # ========================================================================
 
-    async def get_all_tools_async(self) -> List[Tool]:
+    async def get_all_tools_async(self, use_cache: bool = False) -> List[Tool]:
         """
         【异步】从所有配置的 MCP 服务器获取可用工具
 
         使用 asyncio.gather 并发连接所有服务器，提高发现速度。
+
+        Args:
+            use_cache: 是否使用工具列表磁盘缓存。mcp.json 未修改时直接返回
+                缓存的工具，所有服务器发现成功后更新缓存。
         """
+        if use_cache:
+            cached_tools = self._load_tools_cache()
+            if cached_tools is not None:
+                self.tools = {tool.name: tool for tool in cached_tools}
+                print(f"\n📦 从缓存加载 {len(cached_tools)} 个工具 ({self.cache_path})")
+                return cached_tools
+
         print("\n🔍 正在发现 MCP 工具 (异步模式)...")
 
         # 创建所有服务器的发现任务，并发执行
@@ -297,8 +320,67 @@ class MCPManager:
             print(f"   - {server_name}: {count} 个工具")
         print()
 
+        # 只有所有服务器都成功返回工具时才写缓存，避免把临时故障固化下来
+        if use_cache and len(tools_count_by_server) == len(tasks):
+            self._save_tools_cache(all_tools)
+
         return all_tools
 
+    def _get_config_mtime(self) -> Optional[float]:
+        """获取 mcp.json 的修改时间，文件不存在时返回 None"""
+        try:
+            return os.stat(self.config_path).st_mtime
+        except OSError:
+            return None
+
+    def _load_tools_cache(self) -> Optional[List[Tool]]:
+        """
+        读取工具列表缓存
+
+        Returns:
+            mcp.json 未修改时返回缓存的工具列表，否则返回 None
+        """
+        config_mtime = self._get_config_mtime()
+        if config_mtime is None:
+            return None
+
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if cache.get("mcp_json_mtime") != config_mtime:
+            return None
+
+        try:
+            tools = [Tool(**tool_data) for tool_data in cache.get("tools", [])]
+        except TypeError as e:
+            logger.warning(f"Invalid MCP tools cache {self.cache_path}: {e}")
+            return None
+
+        # 缓存中的工具必须都属于当前启用的服务器
+        if not tools or any(tool.server_name not in self.servers for tool in tools):
+            return None
+        return tools
+
+    def _save_tools_cache(self, tools: List[Tool]) -> None:
+        """将工具列表写入缓存（失败只记录日志，不影响主流程）"""
+        config_mtime = self._get_config_mtime()
+        if config_mtime is None or not tools:
+            return
+
+        cache = {
+            "mcp_json_mtime": config_mtime,
+            "tools": [asdict(tool) for tool in tools],
+        }
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            logger.info(f"Saved {len(tools)} tools to cache {self.cache_path}")
+        except OSError as e:
+            logger.warning(f"Failed to save MCP tools cache: {e}")
+
     def _patch_tool_schema(self, tools: List[Tool]):
         """
         修复已知有问题的工具 schema
@@ -666,7 +748,13 @@ class MCPManager:
         3. 描述截断到第一行或前80字符
         4. 移除冗余的类型信息和详细说明
         5. **保留参数默认值**（如 token），确保 LLM 能使用正确的配置
+
+        工具发现会整体替换 self.tools，因此以字典对象本身判断缓存是否仍然有效。
         """
+        cache = self._tools_prompt_cache
+        if cache is not None and cache[0] is self.tools and cache[1] == len(self.tools):
+            return cache[2]
+
         tools_by_server: Dict[str, List[Tool]] = {}
         for tool in self.tools.values():
             if tool.server_name not in tools_by_server:
@@ -717,5 +805,7 @@ class MCPManager:
 
             output_parts.append("\n".join(server_lines))
 
-        return "\n\n".join(output_parts)
+        result = "\n\n".join(output_parts)
+        self._tools_prompt_cache = (self.tools, len(self.tools), result)
+        return result
 
@@ -5,12 +5,28 @@
 使用本地 Sentence Transformers 进行向量检索。
 """
 
+import asyncio
 import os
+import hashlib
+import sqlite3
 import numpy as np
 import threading
+from collections import OrderedDict
 from typing import List, Tuple, Optional
 from dotenv import load_dotenv
 
+# orjson 为可选依赖（C 实现，直接序列化 numpy 数组），未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# usearch 为可选依赖（HNSW 近似最近邻索引），未安装时始终使用精确线性搜索
+try:
+    from usearch.index import Index as _AnnIndex
+except ImportError:
+    _AnnIndex = None
+
 load_dotenv()
 
 
@@ -26,6 +42,21 @@ DEFAULT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
 _embedding_model = None
 _embedding_lock = threading.Lock()  # 线程安全锁
 
+# 嵌入结果 LRU 缓存：以文本摘要为键（不持有原文），同一文本重复嵌入时直接返回
+EMBEDDING_CACHE_SIZE = 512
+
+# 批量嵌入时每次前向计算的文本数
+EMBEDDING_BATCH_SIZE = 32
+_embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+# 嵌入结果磁盘缓存（SQLite，键为模型名和文本的摘要），进程重启后仍可复用已计算的嵌入
+EMBEDDING_DISK_CACHE_ENABLED = True
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "pocketagent", "embeddings.sqlite")
+_disk_cache_conn: Optional[sqlite3.Connection] = None
+_disk_cache_path: Optional[str] = None
+_disk_cache_lock = threading.Lock()
+
 
 def get_hf_endpoint() -> str:
     """获取 HuggingFace 端点地址
@@ -49,6 +80,18 @@ def get_embedding_model_name() -> str:
     return os.environ.get("EMBEDDING_MODEL_NAME", DEFAULT_MODEL_NAME)
 
 
+def get_embedding_device() -> Optional[str]:
+    """获取 Embedding 模型运行设备
+
+    优先使用环境变量 EMBEDDING_DEVICE（如 cuda、cuda:1、mps、cpu），
+    未设置时返回 None，由 sentence-transformers 自动选择（有 CUDA 时使用 GPU）。
+
+    Returns:
+        设备名称或 None
+    """
+    return os.environ.get("EMBEDDING_DEVICE") or None
+
+
 def _get_embedding_model():
     """获取 Sentence Transformer 模型单例（线程安全）
 
@@ -76,11 +119,210 @@ def _get_embedding_model():
                 print(f"[INFO] HF_ENDPOINT: {hf_endpoint}")
 
                 # 多语言模型，中文语义理解更准确
-                _embedding_model = SentenceTransformer(model_name)
-                print(f"[OK] Embedding model loaded ({model_name})")
+                _embedding_model = SentenceTransformer(model_name, device=get_embedding_device())
+                print(f"[OK] Embedding model loaded ({model_name}, device: {_embedding_model.device})")
     return _embedding_model
 
 
+def get_embedding_cache_path() -> str:
+    """获取嵌入磁盘缓存文件路径
+
+    优先使用环境变量 EMBEDDING_CACHE_PATH，否则使用 ~/.cache/pocketagent/embeddings.sqlite。
+
+    Returns:
+        SQLite 文件路径
+    """
+    return os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_EMBEDDING_CACHE_PATH)
+
+
+def _embedding_cache_key(text: str) -> bytes:
+    """计算嵌入缓存键（模型名和文本的 blake2b 摘要，换模型后不会命中旧结果）"""
+    data = f"{get_embedding_model_name()}\0{text}".encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _get_cached_embedding(key: bytes) -> Optional[np.ndarray]:
+    """读取缓存的嵌入（命中时移到最近使用位置）
+
+    不加锁：OrderedDict 的 get / move_to_end 各自是原子操作；
+    两者之间该项恰好被淘汰时只会少一次 LRU 提升，不影响返回结果。
+    """
+    embedding = _embedding_cache.get(key)
+    if embedding is not None:
+        try:
+            _embedding_cache.move_to_end(key)
+        except KeyError:
+            pass
+    return embedding
+
+
+def _put_cached_embedding(key: bytes, embedding: np.ndarray) -> None:
+    """写入嵌入缓存（超出容量时淘汰最久未使用的项）"""
+    # 缓存的数组会被多处共享，设为只读防止被调用方原地修改
+    embedding.flags.writeable = False
+    with _embedding_cache_lock:
+        _embedding_cache[key] = embedding
+        _embedding_cache.move_to_end(key)
+        if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+
+def _get_disk_cache() -> Optional[sqlite3.Connection]:
+    """获取磁盘缓存连接（首次使用或路径变化时打开，需持有 _disk_cache_lock）"""
+    global _disk_cache_conn, _disk_cache_path
+    path = get_embedding_cache_path()
+    if _disk_cache_conn is not None and _disk_cache_path == path:
+        return _disk_cache_conn
+
+    _close_disk_cache()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    # WAL + NORMAL：写入无需每次 fsync，崩溃时最多丢失最近的缓存项
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+    _disk_cache_conn, _disk_cache_path = conn, path
+    return conn
+
+
+def _close_disk_cache() -> None:
+    """关闭磁盘缓存连接（需持有 _disk_cache_lock）"""
+    global _disk_cache_conn, _disk_cache_path
+    if _disk_cache_conn is not None:
+        _disk_cache_conn.close()
+    _disk_cache_conn, _disk_cache_path = None, None
+
+
+def _load_disk_embedding(key: bytes) -> Optional[np.ndarray]:
+    """从磁盘缓存读取嵌入（未命中或读取失败时返回 None）"""
+    if not EMBEDDING_DISK_CACHE_ENABLED:
+        return None
+    try:
+        with _disk_cache_lock:
+            row = _get_disk_cache().execute(
+                "SELECT vec FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+    except (sqlite3.Error, OSError) as e:
+        print(f"   [WARN] Embedding disk cache read failed: {e}")
+        return None
+    return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+
+def _store_disk_embedding(key: bytes, embedding: np.ndarray) -> None:
+    """写入磁盘缓存（失败只打印警告，不影响嵌入结果）"""
+    _store_disk_embeddings([(key, embedding)])
+
+
+def _store_disk_embeddings(entries: List[Tuple[bytes, np.ndarray]]) -> None:
+    """在一个事务中写入多条磁盘缓存"""
+    if not EMBEDDING_DISK_CACHE_ENABLED or not entries:
+        return
+    try:
+        with _disk_cache_lock:
+            conn = _get_disk_cache()
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(key, embedding.tobytes()) for key, embedding in entries],
+            )
+            conn.commit()
+    except (sqlite3.Error, OSError) as e:
+        print(f"   [WARN] Embedding disk cache write failed: {e}")
+
+
+def _compute_embedding(text: str, key: bytes) -> np.ndarray:
+    """先查磁盘缓存，未命中时调用模型计算并写入磁盘缓存（同步，可能较慢）"""
+    embedding = _load_disk_embedding(key)
+    if embedding is not None:
+        return embedding
+    model = _get_embedding_model()
+    embedding = model.encode(text, convert_to_numpy=True).astype(np.float32)
+    _store_disk_embedding(key, embedding)
+    return embedding
+
+
+def _compute_embeddings(texts: List[str], keys: List[bytes]) -> List[np.ndarray]:
+    """批量版 _compute_embedding：磁盘缓存未命中的文本一次性交给模型计算"""
+    results = [_load_disk_embedding(key) for key in keys]
+    missing = [i for i, embedding in enumerate(results) if embedding is None]
+    if missing:
+        model = _get_embedding_model()
+        encoded = model.encode(
+            [texts[i] for i in missing],
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+        ).astype(np.float32)
+        for i, embedding in zip(missing, encoded):
+            # 复制为独立数组，缓存项不会引用整批结果矩阵
+            results[i] = embedding.copy()
+        _store_disk_embeddings([(keys[i], results[i]) for i in missing])
+    return results
+
+
+def clear_embedding_cache() -> None:
+    """清空内存中的嵌入缓存，并关闭磁盘缓存连接（磁盘上的缓存项保留）"""
+    with _embedding_cache_lock:
+        _embedding_cache.clear()
+    with _disk_cache_lock:
+        _close_disk_cache()
+
+
+class _EmbeddingBatcher:
+    """
+    合并并发的 get_embedding_async 请求
+
+    同一事件循环轮次内到达的请求合为一批；一批计算期间新到达的请求排队，
+    上一批完成后一次性交给模型计算（不额外等待，单个请求的延迟不变）。
+    同一文本的并发请求共享一次计算；每个事件循环同一时刻最多一次 encode 在执行，
+    并发请求不会占满线程池、争抢 CPU。
+    """
+
+    def __init__(self):
+        self._loop: Optional["asyncio.AbstractEventLoop"] = None
+        self._pending: dict = {}  # 缓存键 -> (文本, Future)
+        self._task: Optional["asyncio.Task"] = None
+
+    async def embed_async(self, text: str, key: bytes) -> np.ndarray:
+        """提交一条文本并等待其嵌入（计算失败时抛出原始异常）"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环变化（如多次 asyncio.run）时丢弃旧循环的状态
+            self._loop = loop
+            self._pending = {}
+            self._task = None
+
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = (text, loop.create_future())
+            self._pending[key] = entry
+            if self._task is None:
+                self._task = loop.create_task(self._drain_async())
+        # shield：调用方被取消时不影响共享同一结果的其他请求
+        return await asyncio.shield(entry[1])
+
+    async def _drain_async(self) -> None:
+        """逐批计算排队中的请求，直到队列为空"""
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, {}
+                try:
+                    embeddings = await asyncio.to_thread(
+                        _compute_embeddings, [text for text, _ in batch.values()], list(batch)
+                    )
+                except Exception as e:
+                    for _, future in batch.values():
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for (_, future), embedding in zip(batch.values(), embeddings):
+                        if not future.done():
+                            future.set_result(embedding)
+        finally:
+            self._task = None
+
+
+_embedding_batcher = _EmbeddingBatcher()
+
+
 async def get_embedding_async(text: str) -> np.ndarray:
     """
     异步获取文本的向量嵌入
@@ -96,19 +338,16 @@ async def get_embedding_async(text: str) -> np.ndarray:
     Raises:
         VectorMemoryError: 当嵌入失败时抛出（不再静默返回零向量）
     """
-    import asyncio
     from exceptions import VectorMemoryError
 
-    # sentence-transformers 是同步的，用线程池包装
-    loop = asyncio.get_running_loop()
-
-    def _encode():
-        model = _get_embedding_model()
-        return model.encode(text, convert_to_numpy=True)
+    key = _embedding_cache_key(text)
+    cached = _get_cached_embedding(key)
+    if cached is not None:
+        return cached
 
+    # sentence-transformers 是同步的，在线程池中计算；并发请求合批后一次 encode
     try:
-        embedding = await loop.run_in_executor(None, _encode)
-        return embedding.astype(np.float32)
+        embedding = await _embedding_batcher.embed_async(text, key)
     except Exception as e:
         # 显式抛出异常，不再静默返回零向量
         raise VectorMemoryError(
@@ -116,6 +355,8 @@ async def get_embedding_async(text: str) -> np.ndarray:
             reason=str(e),
             context={"text_preview": text[:100] if len(text) > 100 else text}
         )
+    _put_cached_embedding(key, embedding)
+    return embedding
 
 
 def get_embedding(text: str) -> np.ndarray:
@@ -127,15 +368,109 @@ def get_embedding(text: str) -> np.ndarray:
     """
     from exceptions import VectorMemoryError
 
+    key = _embedding_cache_key(text)
+    cached = _get_cached_embedding(key)
+    if cached is not None:
+        return cached
+
     try:
-        model = _get_embedding_model()
-        return model.encode(text, convert_to_numpy=True).astype(np.float32)
+        embedding = _compute_embedding(text, key)
     except Exception as e:
         raise VectorMemoryError(
             operation="embedding",
             reason=str(e),
             context={"text_preview": text[:100] if len(text) > 100 else text}
         )
+    _put_cached_embedding(key, embedding)
+    return embedding
+
+
+def _split_cached_embeddings(texts: List[str]) -> Tuple[List[bytes], List[Optional[np.ndarray]], dict]:
+    """
+    从内存缓存中取出已有的嵌入
+
+    Returns:
+        (各文本的缓存键, 按原顺序排列的结果（未命中处为 None）,
+         {缓存键: 未命中文本}（批内重复文本只计算一次）)
+    """
+    keys = [_embedding_cache_key(text) for text in texts]
+    results = [_get_cached_embedding(key) for key in keys]
+    pending = {}
+    for key, text, cached in zip(keys, texts, results):
+        if cached is None:
+            pending.setdefault(key, text)
+    return keys, results, pending
+
+
+def _assemble_embeddings(keys: List[bytes], results: List[Optional[np.ndarray]],
+                         pending: dict, computed: List[np.ndarray]) -> np.ndarray:
+    """写入新计算的嵌入到内存缓存，并按原顺序堆叠为 (N, D) 矩阵"""
+    by_key = dict(zip(pending, computed))
+    for key, embedding in by_key.items():
+        _put_cached_embedding(key, embedding)
+    for i, embedding in enumerate(results):
+        if embedding is None:
+            results[i] = by_key[keys[i]]
+    if not results:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack(results)
+
+
+def _batch_error(texts: List[str], error: Exception):
+    """构造批量嵌入失败的异常"""
+    from exceptions import VectorMemoryError
+
+    preview = texts[0][:100] if texts else ""
+    return VectorMemoryError(
+        operation="embedding",
+        reason=str(error),
+        context={"batch_size": len(texts), "text_preview": preview}
+    )
+
+
+async def get_embeddings_batch_async(texts: List[str]) -> np.ndarray:
+    """
+    异步批量获取文本的向量嵌入
+
+    已缓存的文本直接复用，其余文本在线程池中一次性交给模型计算（比逐条调用快得多）。
+
+    Args:
+        texts: 要嵌入的文本列表
+
+    Returns:
+        (len(texts), 384) 的 float32 矩阵，行顺序与 texts 一致
+
+    Raises:
+        VectorMemoryError: 当嵌入失败时抛出
+    """
+    keys, results, pending = _split_cached_embeddings(texts)
+    computed: List[np.ndarray] = []
+    if pending:
+        # 经由合批器提交：与并发的单条请求合为同一批，且同一时刻最多一次 encode 在执行
+        try:
+            computed = await asyncio.gather(*(
+                _embedding_batcher.embed_async(text, key) for key, text in pending.items()
+            ))
+        except Exception as e:
+            raise _batch_error(texts, e)
+    return _assemble_embeddings(keys, results, pending, computed)
+
+
+def get_embeddings_batch(texts: List[str]) -> np.ndarray:
+    """
+    同步批量获取文本的向量嵌入（参数和返回值同 get_embeddings_batch_async）
+
+    Raises:
+        VectorMemoryError: 当嵌入失败时抛出
+    """
+    keys, results, pending = _split_cached_embeddings(texts)
+    computed: List[np.ndarray] = []
+    if pending:
+        try:
+            computed = _compute_embeddings(list(pending.values()), list(pending))
+        except Exception as e:
+            raise _batch_error(texts, e)
+    return _assemble_embeddings(keys, results, pending, computed)
 
 
 # ============================================================================
@@ -145,20 +480,41 @@ def get_embedding(text: str) -> np.ndarray:
 # 性能警告阈值
 MEMORY_SIZE_WARNING_THRESHOLD = 5000
 
+# 向量矩阵初始容量（写满后容量翻倍，摊还 O(1) 插入）
+INDEX_INITIAL_CAPACITY = 64
+
+# 记忆数量达到该值且已安装 usearch 时改用 HNSW 近似搜索（小规模时精确搜索更快也更准确）
+ANN_INDEX_MIN_SIZE = 2000
+
+# HNSW 索引参数（向量以 int8 量化存储：内存和每次搜索读取的字节数约为 float32 的 1/4，
+# 查询向量保持 float32，非对称量化下召回率基本不变）
+ANN_DTYPE = "i8"
+ANN_CONNECTIVITY = 16
+ANN_EXPANSION_ADD = 128
+ANN_EXPANSION_SEARCH = 64
+
 
 class SimpleVectorIndex:
     """
     简单的向量索引实现
 
     使用 numpy 进行余弦相似度搜索，无需 FAISS 依赖。
-    适合小规模记忆存储（< 10000 条）。
+    向量在写入时归一化，搜索时一次矩阵-向量乘法即得到全部余弦相似度。
+    适合小规模记忆存储（< 10000 条）；安装 usearch 后，
+    记忆数量达到 ANN_INDEX_MIN_SIZE 时自动改用 HNSW 近似搜索。
     """
 
     def __init__(self, dimension: int = 384):
         self.dimension = dimension
-        self.vectors: List[np.ndarray] = []
         self.items: List[dict] = []
+        # 预分配的 (容量, D) float32 矩阵，前 _count 行为 L2 归一化后的向量
+        self._matrix = np.empty((0, dimension), dtype=np.float32)
+        self._count = 0
         self._warned_size = False  # 避免重复打印性能警告
+        self._ann_index = None  # HNSW 索引（首次大规模搜索时构建，之后随增改同步更新）
+        self._last_save_task = None  # 最近一次后台保存任务（保证按顺序写入）
+        # 写锁：增改操作互斥；搜索不加锁（新行和对应 item 写好后才增加 _count，读者只看到完整的记录）
+        self._write_lock = threading.RLock()
 
     def add(self, vector: np.ndarray, item: dict) -> int:
         """
@@ -171,9 +527,42 @@ class SimpleVectorIndex:
         Returns:
             插入位置的索引
         """
-        self.vectors.append(vector.flatten())
-        self.items.append(item)
-        return len(self.vectors) - 1
+        vector = self._normalize(vector)
+        with self._write_lock:
+            if self._count == len(self._matrix):
+                self._grow()
+            idx = self._count
+            self._matrix[idx] = vector
+            self.items.append(item)
+            self._count += 1
+            if self._ann_index is not None:
+                self._ann_index.add(idx, self._matrix[idx])
+        return idx
+
+    def add_batch(self, vectors: np.ndarray, items: List[dict]) -> List[int]:
+        """
+        批量添加向量和对应的项目（整体归一化并一次写入矩阵）
+
+        Args:
+            vectors: (N, D) 嵌入向量矩阵（如 get_embeddings_batch 的结果）
+            items: 与每行向量对应的数据
+
+        Returns:
+            插入位置的索引列表
+        """
+        matrix = self._normalize_rows(vectors, items)
+
+        with self._write_lock:
+            start = self._count
+            end = start + len(matrix)
+            if end > len(self._matrix):
+                self._grow(end)
+            self._matrix[start:end] = matrix
+            self.items.extend(items)
+            self._count = end
+            if self._ann_index is not None and end > start:
+                self._ann_index.add(np.arange(start, end, dtype=np.uint64), self._matrix[start:end])
+        return list(range(start, end))
 
     def search(self, query_vector: np.ndarray, k: int = 3) -> List[Tuple[dict, float]]:
         """
@@ -186,29 +575,101 @@ class SimpleVectorIndex:
         Returns:
             列表，每项为 (item, similarity_score) 元组
         """
-        if not self.vectors:
+        if self._count == 0:
             return []
 
+        query = self._normalize(query_vector)
+
+        # 大规模索引：使用 HNSW 近似搜索（对数级遍历，避免逐条计算）
+        if self._use_ann():
+            return self._search_ann(query, k)
+
         # 性能警告：线性搜索在大数据量时会变慢（只警告一次）
-        if len(self.vectors) > MEMORY_SIZE_WARNING_THRESHOLD and not self._warned_size:
-            print(f"[WARN] Memory index has {len(self.vectors)} items, "
-                  f"search may be slow. Consider upgrading to FAISS.")
+        if self._count > MEMORY_SIZE_WARNING_THRESHOLD and not self._warned_size:
+            print(f"[WARN] Memory index has {self._count} items, "
+                  f"search may be slow. Consider installing usearch.")
             self._warned_size = True
 
-        query = query_vector.flatten()
+        # 向量均已归一化，一次矩阵-向量乘法即得到所有余弦相似度
+        scores = self.vectors @ query
 
-        # 计算所有向量的余弦相似度（复用 _cosine_similarity 方法）
-        similarities = [
-            (i, self._cosine_similarity(query, vec))
-            for i, vec in enumerate(self.vectors)
-        ]
-
-        # 按相似度降序排序并返回 top-k
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [(self.items[idx], sim) for idx, sim in similarities[:k]]
+        # 只对 top-k 候选排序（argpartition 为线性时间）
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.items[idx], float(scores[idx])) for idx in top]
 
     def __len__(self):
-        return len(self.vectors)
+        return self._count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """所有已存储向量组成的 (N, D) 矩阵视图（L2 归一化，不复制）"""
+        return self._matrix[:self._count]
+
+    def _grow(self, min_capacity: int = 0):
+        """矩阵写满时容量翻倍，直到不小于 min_capacity（只复制已有行）"""
+        capacity = max(INDEX_INITIAL_CAPACITY, 2 * len(self._matrix))
+        while capacity < min_capacity:
+            capacity *= 2
+        matrix = np.empty((capacity, self.dimension), dtype=np.float32)
+        matrix[:self._count] = self._matrix[:self._count]
+        self._matrix = matrix
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """展平并 L2 归一化为 float32 向量（零向量保持不变）"""
+        vector = np.asarray(vector, dtype=np.float32).flatten()
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def _normalize_rows(self, vectors: np.ndarray, items: List[dict]) -> np.ndarray:
+        """转换为 (N, D) float32 矩阵并逐行 L2 归一化（行数须与 items 一致）"""
+        matrix = np.array(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(matrix) != len(items):
+            raise ValueError(f"got {len(matrix)} vectors for {len(items)} items")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def _use_ann(self) -> bool:
+        """是否使用 HNSW 近似搜索（需要安装 usearch 且记忆数量足够大）"""
+        return _AnnIndex is not None and self._count >= ANN_INDEX_MIN_SIZE
+
+    def _search_ann(self, query: np.ndarray, k: int) -> List[Tuple[dict, float]]:
+        """通过 HNSW 索引搜索"""
+        return [(self.items[idx], sim) for idx, sim in self._ann_top_k(query, k)]
+
+    def _ann_top_k(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """HNSW 近似 top-k，返回 (索引, 相似度)（首次调用时用现有向量构建索引）"""
+        if self._ann_index is None:
+            with self._write_lock:
+                if self._ann_index is None:
+                    self._build_ann_index()
+
+        matches = self._ann_index.search(query, min(k, self._count))
+        # usearch 返回余弦距离，转换为相似度
+        return [
+            (int(key), 1.0 - float(distance))
+            for key, distance in zip(matches.keys, matches.distances)
+        ]
+
+    def _build_ann_index(self):
+        """用现有向量构建 HNSW 索引（需持有写锁）"""
+        ann_index = _AnnIndex(
+            ndim=self.dimension,
+            metric="cos",
+            dtype=ANN_DTYPE,
+            connectivity=ANN_CONNECTIVITY,
+            expansion_add=ANN_EXPANSION_ADD,
+            expansion_search=ANN_EXPANSION_SEARCH,
+        )
+        ann_index.add(np.arange(self._count, dtype=np.uint64), self.vectors)
+        self._ann_index = ann_index
 
     def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """计算两个向量的余弦相似度"""
@@ -229,18 +690,21 @@ class SimpleVectorIndex:
         Returns:
             如果找到相似记忆，返回 (索引, 相似度)；否则返回 None
         """
-        if not self.vectors:
+        if self._count == 0:
             return None
 
-        query = vector.flatten()
-        best_idx = -1
-        best_sim = 0.0
-
-        for i, vec in enumerate(self.vectors):
-            sim = self._cosine_similarity(query, vec)
-            if sim > best_sim:
-                best_sim = sim
-                best_idx = i
+        query = self._normalize(vector)
+        if self._use_ann():
+            # 只需要最相似的一条：HNSW top-1，无需逐条计算
+            top = self._ann_top_k(query, 1)
+            if not top:
+                return None
+            best_idx, best_sim = top[0]
+        else:
+            # 只取最大值，不做排序/top-k 划分
+            scores = self.vectors @ query
+            best_idx = int(np.argmax(scores))
+            best_sim = float(scores[best_idx])
 
         if best_sim >= threshold:
             return (best_idx, best_sim)
@@ -255,9 +719,14 @@ class SimpleVectorIndex:
             vector: 新的嵌入向量
             item: 新的关联数据
         """
-        if 0 <= index < len(self.vectors):
-            self.vectors[index] = vector.flatten()
-            self.items[index] = item
+        vector = self._normalize(vector)
+        with self._write_lock:
+            if 0 <= index < self._count:
+                self._matrix[index] = vector
+                self.items[index] = item
+                if self._ann_index is not None:
+                    self._ann_index.remove(index)
+                    self._ann_index.add(index, self._matrix[index])
 
     def add_or_update(self, vector: np.ndarray, item: dict,
                       dedup_threshold: float = 0.85) -> Tuple[int, bool]:
@@ -272,17 +741,72 @@ class SimpleVectorIndex:
         Returns:
             (索引, 是否为新增) - 如果是更新则返回 (idx, False)，新增则返回 (idx, True)
         """
-        similar = self.find_similar(vector, dedup_threshold)
+        # 查找和写入在同一把写锁内完成，并发写入相似记忆时不会重复新增
+        with self._write_lock:
+            similar = self.find_similar(vector, dedup_threshold)
+
+            if similar:
+                idx, sim = similar
+                # 更新已有记忆
+                self.update(idx, vector, item)
+                return (idx, False)
+            else:
+                # 添加新记忆
+                idx = self.add(vector, item)
+                return (idx, True)
+
+    def add_or_update_batch(self, vectors: np.ndarray, items: List[dict],
+                            dedup_threshold: float = 0.85) -> List[Tuple[int, bool]]:
+        """
+        批量版 add_or_update：结果与逐条调用一致
 
-        if similar:
-            idx, sim = similar
-            # 更新已有记忆
-            self.update(idx, vector, item)
-            return (idx, False)
-        else:
-            # 添加新记忆
-            idx = self.add(vector, item)
-            return (idx, True)
+        与已有记忆的相似度通过一次矩阵乘法计算；本批次中被更新或新增的行
+        单独重新计算，因此后面的向量也会与本批次前面的向量去重。
+
+        Args:
+            vectors: (N, D) 嵌入向量矩阵（或 N 个向量组成的列表）
+            items: 与每行向量对应的数据
+            dedup_threshold: 去重相似度阈值（默认 0.85）
+
+        Returns:
+            每条记录的 (索引, 是否为新增)
+        """
+        matrix = self._normalize_rows(vectors, items)
+
+        with self._write_lock:
+            if self._use_ann():
+                # 大规模索引逐条走 HNSW top-1，无需计算整批相似度矩阵
+                return [
+                    self.add_or_update(vector, item, dedup_threshold)
+                    for vector, item in zip(matrix, items)
+                ]
+
+            base = self._count
+            scores = matrix @ self.vectors.T
+            touched: List[int] = []  # 本批次更新过的已有行（批量结果中的相似度已过期）
+            results = []
+            for vector, item, row in zip(matrix, items, scores):
+                best_idx, best_sim = -1, -np.inf
+                if base:
+                    if touched:
+                        row = row.copy()
+                        row[touched] = self._matrix[touched] @ vector
+                    best_idx = int(np.argmax(row))
+                    best_sim = float(row[best_idx])
+                if self._count > base:
+                    added = self._matrix[base:self._count] @ vector
+                    j = int(np.argmax(added))
+                    if added[j] > best_sim:
+                        best_idx, best_sim = base + j, float(added[j])
+
+                if best_sim >= dedup_threshold:
+                    self.update(best_idx, vector, item)
+                    if best_idx < base and best_idx not in touched:
+                        touched.append(best_idx)
+                    results.append((best_idx, False))
+                else:
+                    results.append((self.add(vector, item), True))
+            return results
 
 
     def save(self, filepath: str):
@@ -291,16 +815,56 @@ class SimpleVectorIndex:
 
         使用临时文件 + 重命名的方式，确保写入过程中程序崩溃不会损坏数据。
         """
-        import json
-        import tempfile
-        import shutil
+        self._write_snapshot(filepath, self._snapshot())
 
-        data = {
+    def save_in_background(self, filepath: str) -> "asyncio.Task":
+        """
+        在后台线程中保存索引（不阻塞事件循环，需在事件循环中调用）
+
+        调用时立即在当前线程拍下快照，之后的增改不影响本次写入；
+        同一索引的多次后台保存按调用顺序依次写入，较早的快照不会覆盖较新的。
+        """
+        snapshot = self._snapshot()
+        previous = self._last_save_task
+        if previous is not None and previous.get_loop() is not asyncio.get_running_loop():
+            previous = None
+
+        async def _save():
+            if previous is not None and not previous.done():
+                await asyncio.wait([previous])
+            try:
+                await asyncio.to_thread(self._write_snapshot, filepath, snapshot)
+            except Exception:
+                pass  # 失败信息已在 _write_snapshot 中打印
+
+        task = asyncio.create_task(_save())
+        self._last_save_task = task
+        _pending_saves.add(task)
+        task.add_done_callback(_pending_saves.discard)
+        return task
+
+    def _snapshot(self) -> dict:
+        """复制当前索引数据，供保存使用（与后续增改相互独立）"""
+        with self._write_lock:
+            if orjson is not None:
+                # orjson 直接序列化 float32 数组，无需先转成 Python 列表
+                vectors = self.vectors.copy()
+            else:
+                vectors = self.vectors.tolist()
+            items = list(self.items)
+        return {
             "dimension": self.dimension,
-            "vectors": [v.tolist() for v in self.vectors],
-            "items": self.items
+            "normalized": True,  # 向量已 L2 归一化，加载时无需再次归一化
+            "vectors": vectors,
+            "items": items
         }
 
+    @staticmethod
+    def _write_snapshot(filepath: str, data: dict):
+        """将快照原子性写入文件"""
+        import tempfile
+        import shutil
+
         # 获取目标目录（确保临时文件和目标文件在同一文件系统）
         abs_filepath = os.path.abspath(filepath)
         dir_path = os.path.dirname(abs_filepath) or '.'
@@ -308,8 +872,13 @@ class SimpleVectorIndex:
         # 先写入临时文件
         fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=dir_path)
         try:
-            with os.fdopen(fd, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if orjson is not None:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2))
+            else:
+                import json
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
             # 原子性重命名（同一文件系统内是原子操作）
             shutil.move(temp_path, abs_filepath)
             print(f"[OK] Memory saved: {filepath}")
@@ -322,13 +891,27 @@ class SimpleVectorIndex:
 
     def load(self, filepath: str) -> bool:
         """从文件加载索引"""
-        import json
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            self.dimension = data["dimension"]
-            self.vectors = [np.array(v, dtype=np.float32) for v in data["vectors"]]
-            self.items = data["items"]
+            if orjson is not None:
+                with open(filepath, 'rb') as f:
+                    data = orjson.loads(f.read())
+            else:
+                import json
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            dimension = data["dimension"]
+            matrix = np.array(data["vectors"], dtype=np.float32).reshape(-1, dimension)
+            if not data.get("normalized"):
+                # 旧版文件未归一化：整体转换为矩阵后批量归一化
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                np.divide(matrix, norms, out=matrix, where=norms > 0)
+            with self._write_lock:
+                self.dimension = dimension
+                self._count = 0  # 先清零，替换过程中的搜索看到的是空索引
+                self._matrix = matrix
+                self.items = data["items"]
+                self._ann_index = None  # 向量已整体替换，下次搜索时重建
+                self._count = len(matrix)
             print(f"[OK] Memory loaded: {len(self.items)} items")
             return True
         except FileNotFoundError:
@@ -338,6 +921,16 @@ class SimpleVectorIndex:
             return False
 
 
+# 尚未完成的后台保存任务（退出前等待写完）
+_pending_saves: set = set()
+
+
+async def wait_for_pending_saves_async() -> None:
+    """等待所有后台保存任务完成（会话结束时调用）"""
+    if _pending_saves:
+        await asyncio.gather(*_pending_saves)
+
+
 # 全局记忆索引
 _memory_index: Optional[SimpleVectorIndex] = None
 _memory_index_lock = threading.Lock()  # 线程安全锁
@@ -353,8 +946,9 @@ def get_memory_index() -> SimpleVectorIndex:
         with _memory_index_lock:
             # 双重检查锁定（Double-Checked Locking）
             if _memory_index is None:
-                _memory_index = SimpleVectorIndex(dimension=384)
-                # 尝试从文件加载
-                _memory_index.load("memory_index.json")
+                index = SimpleVectorIndex(dimension=384)
+                # 尝试从文件加载；加载完成后再发布，无锁快速路径不会读到加载了一半的索引
+                index.load("memory_index.json")
+                _memory_index = index
     return _memory_index
 
@@ -27,6 +27,13 @@
 from .base import (
     Action,
     parse_yaml_response,
+    safe_load_yaml,
+    trim_context,
+    append_context,
+    reset_context,
+    get_context,
+    get_trimmed_context,
+    estimate_tokens,
     MEMORY_WINDOW_SIZE,
     CONTEXT_WINDOW_SIZE,
     MAX_TOOL_RESULT_LENGTH,
@@ -45,12 +52,20 @@ from .planning_utils import (
     FINDINGS_FILE,
     PROGRESS_FILE,
     get_planning_file_path,
+    current_timestamp,
     read_planning_file,
     write_planning_file,
+    write_planning_file_async,
+    append_planning_file,
     update_plan_phase,
+    update_plan_phases,
+    update_plan_phases_async,
     append_to_findings,
     append_to_progress,
+    append_to_findings_async,
+    append_to_progress_async,
     record_error_in_plan,
+    record_error_in_plan_async,
     get_plan_completion_status,
     is_complex_task,
     cleanup_planning_files,
@@ -63,7 +78,7 @@ from .input_node import InputNode
 from .planning_node import PlanningNode
 from .retrieve_node import RetrieveNode
 from .decide_node import DecideNode
-from .tool_node import ToolNode
+from .tool_node import ToolNode, shutdown_python_workers_async
 from .think_node import ThinkNode
 from .answer_node import AnswerNode
 from .embed_node import EmbedNode
@@ -80,9 +95,17 @@ __all__ = [
     "AnswerNode",
     "EmbedNode",
     "SupervisorNode",
+    "shutdown_python_workers_async",
     # 常量和工具
     "Action",
     "parse_yaml_response",
+    "safe_load_yaml",
+    "trim_context",
+    "append_context",
+    "reset_context",
+    "get_context",
+    "get_trimmed_context",
+    "estimate_tokens",
     # 配置常量
     "MEMORY_WINDOW_SIZE",
     "CONTEXT_WINDOW_SIZE",
@@ -97,8 +120,16 @@ __all__ = [
     "FINDINGS_FILE",
     "PROGRESS_FILE",
     "get_planning_file_path",
+    "current_timestamp",
     "read_planning_file",
     "write_planning_file",
+    "write_planning_file_async",
+    "append_planning_file",
+    "update_plan_phases",
+    "update_plan_phases_async",
+    "append_to_findings_async",
+    "append_to_progress_async",
+    "record_error_in_plan_async",
     "is_complex_task",
     "cleanup_planning_files",
 ]
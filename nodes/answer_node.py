@@ -9,7 +9,7 @@ from pocketflow import AsyncNode
 
 from utils import call_llm_async
 
-from .base import Action, CONTEXT_WINDOW_SIZE
+from .base import Action, get_trimmed_context, with_supervisor_feedback, estimate_tokens, CONTEXT_WINDOW_SIZE
 from .prompts import ANSWER_PROMPT
 
 # 导入日志系统
@@ -34,14 +34,14 @@ class AnswerNode(AsyncNode):
 
         # 否则生成答案
         task = shared.get("current_task", "")
-        context = shared.get("context", "")
 
         # ========================================
         # 上下文修剪：与 DecideNode 保持一致
         # ========================================
-        trimmed_context = self._trim_context(context, CONTEXT_WINDOW_SIZE)
-        if trimmed_context != context:
+        trimmed_context, trimmed = get_trimmed_context(shared, CONTEXT_WINDOW_SIZE)
+        if trimmed:
             print(f"   [Answer] Context trimmed to last {CONTEXT_WINDOW_SIZE} steps")
+        trimmed_context = with_supervisor_feedback(trimmed_context, shared.get("supervisor_feedback"))
 
         prompt = ANSWER_PROMPT.format(task=task, context=trimmed_context)
         messages = [{"role": "user", "content": prompt}]
@@ -51,29 +51,8 @@ class AnswerNode(AsyncNode):
 
         return {"messages": messages}
 
-    def _trim_context(self, context: str, window_size: int) -> str:
-        """修剪上下文，只保留最近 N 步的操作记录"""
-        if not context:
-            return ""
-
-        sections = context.split("\n\n###")
-        if len(sections) <= window_size:
-            return context
-
-        recent_sections = sections[-window_size:]
-        result = "###".join(recent_sections)
-        if not result.startswith("###"):
-            result = "###" + result
-
-        return result
-
     def _log_token_estimation(self, node_name: str, content: str):
         """记录token估算（调试用）"""
-        def estimate_tokens(text: str) -> int:
-            chinese_chars = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
-            english_words = len(text.split()) - chinese_chars
-            return int(chinese_chars * 1.5 + english_words * 1.3)
-
         tokens = estimate_tokens(content)
         print(f"   [{node_name}] Token estimation: ~{tokens} tokens")
         if tokens > 500000:
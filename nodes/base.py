@@ -6,10 +6,18 @@
 - YAML 解析工具函数
 - 配置常量
 - 城市时区映射
+- 上下文修剪与 token 估算
 """
 
 import re
 import yaml
+import numpy as np
+
+# 优先使用 libyaml 的 C 加载器（比纯 Python 实现快一个数量级），未编译 libyaml 时回退
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 
 
 # ============================================================================
@@ -144,10 +152,119 @@ CITY_TIMEZONE_MAP = {
 }
 
 
+# ============================================================================
+# 上下文修剪
+# ============================================================================
+
+# 上下文中每一步操作记录的分隔标记
+CONTEXT_SECTION_SEPARATOR = "\n\n###"
+
+
+def trim_context(context: str, window_size: int) -> str:
+    """
+    修剪上下文，只保留最近 N 步的操作记录
+
+    从末尾反向查找第 window_size 个分隔标记，直接切片返回，
+    不拆分、不重新拼接整个上下文。
+
+    Args:
+        context: 完整的上下文字符串
+        window_size: 保留的步骤数量
+
+    Returns:
+        修剪后的上下文（以 ### 开头）；步骤数未超过窗口时原样返回
+    """
+    if not context:
+        return ""
+
+    pos = len(context)
+    for _ in range(window_size):
+        pos = context.rfind(CONTEXT_SECTION_SEPARATOR, 0, pos)
+        if pos < 0:
+            return context
+
+    # 跳过分隔标记前的空行，保留 ### 前缀
+    return context[pos + 2:]
+
+
+# ----------------------------------------------------------------------------
+# 上下文缓冲区：shared["context_chunks"] 保存按顺序追加的片段，
+# 追加不复制已有内容，需要字符串时才拼接
+# ----------------------------------------------------------------------------
+
+def append_context(shared: dict, text: str) -> None:
+    """向当前任务上下文追加一段记录"""
+    shared.setdefault("context_chunks", []).append(text)
+
+
+def reset_context(shared: dict) -> None:
+    """清空当前任务上下文"""
+    shared["context_chunks"] = []
+
+
+def get_context(shared: dict) -> str:
+    """拼接完整的上下文字符串（只在确实需要全文时调用）"""
+    return "".join(shared.get("context_chunks") or ())
+
+
+def get_trimmed_context(shared: dict, window_size: int) -> tuple[str, bool]:
+    """
+    获取最近 N 步的上下文（结果与 trim_context(get_context(shared)) 相同）
+
+    从末尾向前累计各片段中的分隔标记，只拼接覆盖窗口所需的尾部片段。
+
+    Returns:
+        (修剪后的上下文, 是否发生了修剪)
+    """
+    chunks = shared.get("context_chunks") or []
+    found = 0
+    for start in range(len(chunks) - 1, -1, -1):
+        found += chunks[start].count(CONTEXT_SECTION_SEPARATOR)
+        if found >= window_size:
+            return trim_context("".join(chunks[start:]), window_size), True
+    return "".join(chunks), False
+
+
+# Supervisor 拒绝反馈前缀（反馈单独保存在 shared["supervisor_feedback"]，生成提示词时附加）
+SUPERVISOR_FEEDBACK_PREFIX = "\n\n[Supervisor] Previous answer rejected: "
+
+
+def with_supervisor_feedback(context: str, feedback: str | None) -> str:
+    """在上下文末尾附加 Supervisor 最近一次的拒绝原因（只有最新一条）"""
+    if not feedback:
+        return context
+    return f"{context}{SUPERVISOR_FEEDBACK_PREFIX}{feedback}"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算token数（中文1字≈1.5token，英文1词≈1.3token）
+
+    中文字符计数通过 numpy 对 UTF-32 码点整体比较完成，避免逐字符的 Python 循环。
+    """
+    if not text:
+        return 0
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    chinese_chars = int(np.count_nonzero((codepoints >= 0x4E00) & (codepoints <= 0x9FFF)))
+    english_words = len(text.split()) - chinese_chars
+    return int(chinese_chars * 1.5 + english_words * 1.3)
+
+
 # ============================================================================
 # YAML 解析辅助函数
 # ============================================================================
 
+# _extract_full_answer 使用的正则（模块加载时编译一次）
+_ANSWER_BLOCK_RE = re.compile(r'answer:\s*[|>]\s*\n((?:[ \t]+[^\n]*\n?)+)')
+_ANSWER_TAIL_RE = re.compile(r'answer:\s*\|?\s*\n?([\s\S]+)$')
+_ANSWER_INLINE_RE = re.compile(r'answer:\s*["\']?(.*?)["\']?\s*$', re.MULTILINE)
+
+
+def safe_load_yaml(text: str):
+    """安全加载 YAML 文本（等价于 yaml.safe_load，可用时走 C 加载器）"""
+    return yaml.load(text, Loader=_YamlLoader)
+
+
 def _extract_yaml_block(response: str) -> str:
     """
     智能提取 YAML 代码块，正确处理嵌套的 ``` 标记
@@ -177,32 +294,29 @@ def _extract_yaml_block(response: str) -> str:
     # 策略：从内容开始位置向后搜索，跟踪嵌套的代码块
     content = response[content_start:]
     nesting_level = 0
-    i = 0
-    while i < len(content):
-        # 检查是否是 ``` 标记（可能带语言标识符）
-        if content[i:i+3] == "```":
-            # 检查是否在行首或前面是换行
-            is_line_start = (i == 0) or (content[i-1] == '\n')
-            if is_line_start:
-                # 检查这是开始标记还是结束标记
-                # 如果 ``` 后面跟着字母（语言名），是开始标记
-                rest = content[i+3:]
-                if rest and (rest[0].isalpha() or rest[0] == '\n' or rest[0] == ' '):
-                    if rest[0].isalpha():
-                        nesting_level += 1
-                    elif nesting_level > 0:
-                        nesting_level -= 1
-                    else:
-                        # 找到了配对的结束标记
-                        return content[:i].strip()
+    # 直接跳到下一个 ``` 标记（可能带语言标识符），不逐字符扫描
+    i = content.find("```")
+    while i != -1:
+        # 检查是否在行首或前面是换行
+        is_line_start = (i == 0) or (content[i-1] == '\n')
+        if is_line_start:
+            # 检查这是开始标记还是结束标记
+            # 如果 ``` 后面跟着字母（语言名），是开始标记
+            next_char = content[i+3:i+4]
+            if next_char and (next_char.isalpha() or next_char == '\n' or next_char == ' '):
+                if next_char.isalpha():
+                    nesting_level += 1
                 elif nesting_level > 0:
                     nesting_level -= 1
                 else:
                     # 找到了配对的结束标记
                     return content[:i].strip()
-            i += 3
-        else:
-            i += 1
+            elif nesting_level > 0:
+                nesting_level -= 1
+            else:
+                # 找到了配对的结束标记
+                return content[:i].strip()
+        i = content.find("```", i + 3)
 
     # 如果没找到结束标记，返回全部内容
     return content.strip()
@@ -225,7 +339,7 @@ def parse_yaml_response(response: str) -> dict:
         # 使用智能提取，正确处理嵌套的代码块
         yaml_str = _extract_yaml_block(response)
 
-        result = yaml.safe_load(yaml_str)
+        result = safe_load_yaml(yaml_str)
         if result is None:
             raise ValueError("YAML parse result is empty")
 
@@ -256,7 +370,7 @@ def _extract_full_answer(yaml_str: str) -> str | None:
     """
     # 方法1：匹配 answer: | 或 answer: > 后的多行内容
     # 使用贪婪匹配获取所有缩进的行
-    match = re.search(r'answer:\s*[|>]\s*\n((?:[ \t]+[^\n]*\n?)+)', yaml_str)
+    match = _ANSWER_BLOCK_RE.search(yaml_str)
     if match:
         content = match.group(1)
         # 移除公共缩进
@@ -273,7 +387,7 @@ def _extract_full_answer(yaml_str: str) -> str | None:
 
     # 方法2：从 "answer:" 提取到 yaml_str 末尾（最宽松的提取）
     # 查找 answer: 后面的所有内容
-    match = re.search(r'answer:\s*\|?\s*\n?([\s\S]+)$', yaml_str)
+    match = _ANSWER_TAIL_RE.search(yaml_str)
     if match:
         content = match.group(1)
         # 如果内容有缩进，移除公共缩进
@@ -290,7 +404,7 @@ def _extract_full_answer(yaml_str: str) -> str | None:
         return content.strip()
 
     # 方法3：单行 answer（引号包裹或直接值）
-    match = re.search(r'answer:\s*["\']?(.*?)["\']?\s*$', yaml_str, re.MULTILINE)
+    match = _ANSWER_INLINE_RE.search(yaml_str)
     if match and match.group(1).strip():
         return match.group(1).strip()
 
@@ -15,6 +15,11 @@ from utils import call_llm_async
 from .base import (
     Action,
     parse_yaml_response,
+    safe_load_yaml,
+    get_context,
+    get_trimmed_context,
+    with_supervisor_feedback,
+    estimate_tokens,
     CONTEXT_WINDOW_SIZE,
     YAML_PARSE_MAX_RETRIES,
     YAML_FORMAT_REMINDER,
@@ -30,6 +35,13 @@ from .planning_utils import (
 # 导入日志系统
 from logging_config import log_decision
 
+# 规则引擎缺失时不注入行为规则，不影响主流程
+try:
+    from rules_engine import load_rules
+except ImportError:
+    def load_rules() -> str:
+        return ""
+
 
 class DecideNode(AsyncNode):
     """
@@ -44,7 +56,6 @@ class DecideNode(AsyncNode):
     async def prep_async(self, shared):
         """准备决策所需的上下文（含计划重读）"""
         task = shared.get("current_task", "")
-        context = shared.get("context", "")
         step_count = shared.get("step_count", 0)
         max_steps = shared.get("max_steps", 10)
         retrieved_memory = shared.get("retrieved_memory", "")
@@ -59,7 +70,7 @@ class DecideNode(AsyncNode):
 
             if extension_count >= max_extensions:
                 print(f"   [Decide] ⚠️  Maximum extensions reached ({max_extensions}), forcing answer...")
-                return {"force_answer": True, "task": task, "context": context}
+                return {"force_answer": True, "task": task}
 
             # 询问 LLM 是否需要延长
             print(f"   [Decide] 📊 Step limit reached ({step_count}/{max_steps}), checking if extension needed...")
@@ -73,7 +84,7 @@ class DecideNode(AsyncNode):
                 # 继续正常流程，不强制回答
             else:
                 print(f"   [Decide] 🏁 LLM chose to wrap up, forcing final answer...")
-                return {"force_answer": True, "task": task, "context": context}
+                return {"force_answer": True, "task": task}
 
         # ========================================
         # Manus-style: 决策前重读计划 (注意力操纵)
@@ -94,7 +105,6 @@ class DecideNode(AsyncNode):
         behavior_rules = shared.get("behavior_rules", "")
         if not behavior_rules:
             try:
-                from rules_engine import load_rules
                 behavior_rules = load_rules()
                 if behavior_rules:
                     shared["behavior_rules"] = behavior_rules
@@ -105,9 +115,10 @@ class DecideNode(AsyncNode):
         # ========================================
         # 上下文窗口管理：只保留最近 N 步操作
         # ========================================
-        trimmed_context = self._trim_context(context, CONTEXT_WINDOW_SIZE)
-        if trimmed_context != context:
+        trimmed_context, trimmed = get_trimmed_context(shared, CONTEXT_WINDOW_SIZE)
+        if trimmed:
             print(f"   [Decide] Context trimmed to last {CONTEXT_WINDOW_SIZE} steps")
+        trimmed_context = with_supervisor_feedback(trimmed_context, shared.get("supervisor_feedback"))
 
         # ========================================
         # 方案1: 生成剩余步数警告信息
@@ -170,12 +181,6 @@ Reply in YAML format."""
         # ========================================
         # 调试日志：追踪token消耗
         # ========================================
-        def estimate_tokens(text: str) -> int:
-            """粗略估算token数（中文1字≈1.5token，英文1词≈1.3token）"""
-            chinese_chars = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
-            english_words = len(text.split()) - chinese_chars
-            return int(chinese_chars * 1.5 + english_words * 1.3)
-
         system_tokens = estimate_tokens(messages[0]["content"])
         user_tokens = estimate_tokens(messages[1]["content"])
         total_tokens = system_tokens + user_tokens
@@ -198,42 +203,12 @@ Reply in YAML format."""
         # 警告：如果预估超过50万tokens，很可能有问题
         if total_tokens > 500000:
             print(f"      ⚠️  WARNING: Estimated tokens ({total_tokens}) exceeds 500K!")
-            print(f"      ⚠️  Context length: {len(context)} chars")
+            print(f"      ⚠️  Context length: {len(get_context(shared))} chars")
             print(f"      ⚠️  Trimmed context length: {len(trimmed_context)} chars")
 
         shared["step_count"] = step_count + 1
 
-        return {"messages": messages, "force_answer": False, "task": task, "context": context}
-
-    def _trim_context(self, context: str, window_size: int) -> str:
-        """
-        修剪上下文，只保留最近 N 步的操作记录
-
-        Args:
-            context: 完整的上下文字符串
-            window_size: 保留的步骤数量
-
-        Returns:
-            修剪后的上下文
-        """
-        if not context:
-            return ""
-
-        # 按操作分段（每个 ### 标记一次操作）
-        sections = context.split("\n\n###")
-
-        if len(sections) <= window_size:
-            return context
-
-        # 只保留最后 window_size 个操作
-        recent_sections = sections[-window_size:]
-
-        # 重新组合，确保首个段落有 ### 前缀
-        result = "###".join(recent_sections)
-        if not result.startswith("###"):
-            result = "###" + result
-
-        return result
+        return {"messages": messages, "force_answer": False, "task": task}
 
     def _extract_plan_summary(self, plan_content: str) -> str:
         """
@@ -429,7 +404,7 @@ Progress: Step {step_count}/{max_steps} ({progress_pct:.0f}% used)
             "continue" 或 "answer"
         """
         task = shared.get("current_task", "")
-        context = shared.get("context", "")
+        context = get_context(shared)
 
         # 构建延长请求的 prompt
         extension_prompt = f"""You've reached the step limit ({step_count}/{max_steps} steps used).
@@ -466,8 +441,7 @@ Make your decision:"""
             response = await call_llm_async(messages)
 
             # 解析 YAML 响应
-            import yaml
-            parsed = yaml.safe_load(response)
+            parsed = safe_load_yaml(response)
 
             if isinstance(parsed, dict) and "decision" in parsed:
                 decision = parsed["decision"].lower().strip()
@@ -8,7 +8,7 @@ EmbedNode - 记忆存储节点
 
 from pocketflow import AsyncNode
 
-from memory import get_embedding, get_memory_index
+from memory import get_embeddings_batch_async, get_memory_index
 
 from .base import Action, MEMORY_WINDOW_SIZE, MEMORY_DEDUP_THRESHOLD
 
@@ -23,62 +23,70 @@ class EmbedNode(AsyncNode):
     """
 
     async def prep_async(self, shared):
-        """检查是否需要存储记忆"""
+        """检查是否需要存储记忆（取出窗口之外的所有完整对话轮次）"""
         messages = shared.get("messages", [])
+        rounds = []
 
-        # 如果消息数量未超过窗口大小，不需要存储
-        if len(messages) <= MEMORY_WINDOW_SIZE:
+        # 消息数量超过窗口大小时，从最早的消息开始逐轮取出，直到回到窗口之内
+        while len(messages) > MEMORY_WINDOW_SIZE:
+            conversation, consumed_count = self._find_round(messages)
+            if conversation is None:
+                break
+            rounds.append(conversation)
+            messages = messages[consumed_count:]
+
+        if not rounds:
             return None
+        shared["messages"] = messages
+        return rounds
 
-        # 寻找完整的对话轮次（user + assistant）
-        # 不再假设消息总是成对出现
-        user_msg = None
-        assistant_msg = None
-        consumed_count = 0
+    @staticmethod
+    def _find_round(messages):
+        """
+        寻找最早的完整对话轮次（user + assistant）
+
+        不再假设消息总是成对出现。
 
+        Returns:
+            ([user_msg, assistant_msg], 消耗的消息数)；没有完整轮次时返回 (None, 0)
+        """
+        user_msg = None
         for i, msg in enumerate(messages):
             role = msg.get("role", "")
             if role == "user" and user_msg is None:
                 user_msg = msg
-                consumed_count = i + 1
             elif role == "assistant" and user_msg is not None:
-                assistant_msg = msg
-                consumed_count = i + 1
-                break  # 找到完整的一轮对话
-
-        # 只有找到完整的 user + assistant 对话才存储
-        if user_msg and assistant_msg:
-            shared["messages"] = messages[consumed_count:]
-            return [user_msg, assistant_msg]
-
-        return None
+                return [user_msg, msg], i + 1
+        return None, 0
 
     async def exec_async(self, prep_res):
-        """生成对话的嵌入向量"""
+        """生成对话的嵌入向量（多轮对话一次批量计算）"""
         if not prep_res:
             return None
 
-        conversation = prep_res
-
-        # 组合对话内容
-        user_msg = ""
-        assistant_msg = ""
-        for msg in conversation:
-            if msg["role"] == "user":
-                user_msg = msg["content"]
-            elif msg["role"] == "assistant":
-                assistant_msg = msg["content"]
-
-        combined = f"User: {user_msg}\nAssistant: {assistant_msg}"
+        contents = []
+        for conversation in prep_res:
+            # 组合对话内容
+            user_msg = ""
+            assistant_msg = ""
+            for msg in conversation:
+                if msg["role"] == "user":
+                    user_msg = msg["content"]
+                elif msg["role"] == "assistant":
+                    assistant_msg = msg["content"]
+            contents.append(f"User: {user_msg}\nAssistant: {assistant_msg}")
 
         # 生成嵌入
-        embedding = get_embedding(combined)
+        embeddings = await get_embeddings_batch_async(contents)
 
-        return {
-            "conversation": conversation,
-            "embedding": embedding,
-            "content": combined
-        }
+        return [
+            {
+                "conversation": conversation,
+                "embedding": embedding,
+                "content": content
+            }
+            for conversation, embedding, content in zip(prep_res, embeddings, contents)
+        ]
 
     async def post_async(self, shared, prep_res, exec_res):
         """将对话存入向量索引（带去重）"""
@@ -86,26 +94,28 @@ class EmbedNode(AsyncNode):
             return Action.INPUT
 
         memory_index = shared.get("memory_index")
-        if not memory_index:
+        if memory_index is None:
             memory_index = get_memory_index()
             shared["memory_index"] = memory_index
 
-        # 使用去重存储：如果存在相似记忆则更新，否则新增
-        idx, is_new = memory_index.add_or_update(
-            exec_res["embedding"],
-            {
-                "content": exec_res["content"],
-                "conversation": exec_res["conversation"]
-            },
+        # 使用去重存储：如果存在相似记忆则更新，否则新增（整批一次计算相似度）
+        results = memory_index.add_or_update_batch(
+            [record["embedding"] for record in exec_res],
+            [
+                {
+                    "content": record["content"],
+                    "conversation": record["conversation"]
+                }
+                for record in exec_res
+            ],
             dedup_threshold=MEMORY_DEDUP_THRESHOLD
         )
 
-        if is_new:
-            print(f"[Memory] Added new memory (total: {len(memory_index)} items)")
-        else:
-            print(f"[Memory] Updated similar memory at index {idx} (total: {len(memory_index)} items)")
+        added = sum(1 for _, is_new in results if is_new)
+        print(f"[Memory] Added {added} new, updated {len(results) - added} similar memories "
+              f"(total: {len(memory_index)} items)")
 
-        # 每次存储后立即保存到文件（防止异常退出丢失数据）
-        memory_index.save("memory_index.json")
+        # 每次存储后立即在后台保存到文件（防止异常退出丢失数据，且与其他后台保存按顺序写入）
+        memory_index.save_in_background("memory_index.json")
 
         return Action.INPUT
@@ -8,22 +8,159 @@ InputNode - 用户输入节点
 - 重置任务状态
 """
 
+import inspect
 import os
 from datetime import datetime
+from typing import Awaitable, Callable
 from pocketflow import AsyncNode
 
 from utils import async_input
 from mcp_client import MCPManager
-from memory import get_memory_index
+from memory import SimpleVectorIndex, get_memory_index, wait_for_pending_saves_async
 
-from .base import Action
-from .prompts import AGENT_SYSTEM_PROMPT
+from .base import Action, reset_context
+from .prompts import build_system_prompt
 from .planning_utils import PLANNING_DIR, cleanup_planning_files
 
 # 导入日志系统
 from logging_config import log_user_input
 
 
+# 进程内 MCP Manager 单例：多次实例化 InputNode（或多个 shared）时复用，避免重复发现工具
+_MCP_MANAGER_SINGLETON: MCPManager | None = None
+
+
+async def _get_mcp_manager() -> MCPManager:
+    """获取 MCP Manager 单例（首次调用时加载配置并发现工具，优先使用工具缓存）"""
+    global _MCP_MANAGER_SINGLETON
+    if _MCP_MANAGER_SINGLETON is None:
+        manager = MCPManager("mcp.json")
+        await manager.get_all_tools_async(use_cache=True)
+        _MCP_MANAGER_SINGLETON = manager
+    return _MCP_MANAGER_SINGLETON
+
+
+# ============================================================================
+# 控制命令处理函数（在 prep 阶段直接执行，post 阶段只需返回 Action.INPUT）
+# ============================================================================
+
+def _handle_clear(shared):
+    """清除当前任务上下文"""
+    reset_context(shared)
+    shared["step_count"] = 0
+    shared["supervisor_retry_count"] = 0
+    shared["supervisor_feedback"] = None
+    print("\n✓ [Command] Current task context cleared")
+    print("   - Tool call history: cleared")
+    print("   - Think analysis: cleared")
+    print("   - Step count: reset to 0")
+
+
+def _handle_new(shared):
+    """开始新任务：清除上下文 + 规划文件"""
+    reset_context(shared)
+    shared["step_count"] = 0
+    shared["supervisor_retry_count"] = 0
+    shared["supervisor_feedback"] = None
+    shared["has_plan"] = False
+    shared["tool_call_count"] = 0
+    cleanup_planning_files()
+    print("\n✓ [Command] New task started")
+    print("   - Current context: cleared")
+    print("   - Planning files: removed")
+    print("   - Dialog history: preserved")
+
+
+def _handle_reset(shared):
+    """完全重置：清除所有历史"""
+    reset_context(shared)
+    shared["step_count"] = 0
+    shared["supervisor_retry_count"] = 0
+    shared["supervisor_feedback"] = None
+    shared["has_plan"] = False
+    shared["tool_call_count"] = 0
+    shared["messages"] = []
+    cleanup_planning_files()
+    print("\n✓ [Command] System fully reset")
+    print("   - All context: cleared")
+    print("   - Dialog history: cleared")
+    print("   - Planning files: removed")
+    print("   - Long-term memory: preserved")
+
+
+async def _handle_forget(shared):
+    """清除长期记忆"""
+    memory_index = shared.get("memory_index")
+    if memory_index:
+        count = len(memory_index)
+        shared["memory_index"] = SimpleVectorIndex(dimension=384)
+        # 先等待排队中的后台保存完成，否则它们会在删除后把旧记忆重新写回文件
+        await wait_for_pending_saves_async()
+        # 删除记忆文件
+        if os.path.exists("memory_index.json"):
+            os.remove("memory_index.json")
+        print(f"\n✓ [Command] Long-term memory cleared ({count} items removed)")
+    else:
+        print("\n✓ [Command] No memory to clear")
+
+
+def _handle_logoff(shared):
+    """关闭日志记录"""
+    from logging_config import disable_logging, is_logging_enabled
+    if is_logging_enabled():
+        disable_logging()
+        print("\n✓ [Command] Logging disabled")
+        print("   - All log functions will not write to files")
+        print("   - Use /logon to re-enable logging")
+    else:
+        print("\n✓ [Command] Logging is already disabled")
+
+
+def _handle_logon(shared):
+    """启用日志记录"""
+    from logging_config import enable_logging, is_logging_enabled
+    if not is_logging_enabled():
+        enable_logging()
+        print("\n✓ [Command] Logging enabled")
+        print("   - All operations will be logged to files")
+        print("   - Log files location: logs/")
+    else:
+        print("\n✓ [Command] Logging is already enabled")
+
+
+def _handle_help(shared):
+    """显示帮助信息"""
+    print("\n" + "=" * 50)
+    print("Available Commands:")
+    print("=" * 50)
+    print("/clear      - Clear current task context only")
+    print("/new        - Start a new task (clear context + plans)")
+    print("/newtask    - Alias for /new")
+    print("/reset      - Full reset (clear everything except memory)")
+    print("/forget     - Clear long-term memory index")
+    print("/logoff     - Disable logging to files")
+    print("/logon      - Enable logging to files")
+    print("/help       - Show this help message")
+    print("exit/quit   - Exit the program")
+    print("=" * 50)
+
+
+# prep 阶段已处理控制命令的标记（用独立对象区分普通输入文本）
+_COMMAND_HANDLED = object()
+
+# 命令名 -> 处理函数（小写命令名；处理函数可以是协程函数）
+_COMMAND_HANDLERS: dict[str, Callable[[dict], None | Awaitable[None]]] = {
+    "/clear": _handle_clear,
+    "/new": _handle_new,
+    "/newtask": _handle_new,
+    "/reset": _handle_reset,
+    "/forget": _handle_forget,
+    "/logoff": _handle_logoff,
+    "/logon": _handle_logon,
+    "/help": _handle_help,
+}
+
+
 class InputNode(AsyncNode):
     """
     用户输入节点
@@ -58,13 +195,12 @@ class InputNode(AsyncNode):
             shared["sandbox_path"] = sandbox_path
 
             try:
-                manager = MCPManager("mcp.json")
-                await manager.get_all_tools_async()
+                manager = await _get_mcp_manager()
                 shared["mcp_manager"] = manager
 
                 if manager.tools:
                     tool_info = manager.format_tools_for_prompt()
-                    shared["system_prompt"] = AGENT_SYSTEM_PROMPT.format(
+                    shared["system_prompt"] = build_system_prompt(
                         tool_info=tool_info,
                         current_datetime=current_datetime_str,
                         project_root=project_root,
@@ -72,7 +208,7 @@ class InputNode(AsyncNode):
                     )
                     print(f"[OK] Loaded {len(manager.tools)} tools")
                 else:
-                    shared["system_prompt"] = AGENT_SYSTEM_PROMPT.format(
+                    shared["system_prompt"] = build_system_prompt(
                         tool_info="(no tools)",
                         current_datetime=current_datetime_str,
                         project_root=project_root,
@@ -83,7 +219,7 @@ class InputNode(AsyncNode):
             except Exception as e:
                 print(f"[WARN] MCP initialization failed: {e}")
                 shared["mcp_manager"] = None
-                shared["system_prompt"] = AGENT_SYSTEM_PROMPT.format(
+                shared["system_prompt"] = build_system_prompt(
                     tool_info="(init failed)",
                     current_datetime=current_datetime_str,
                     project_root=project_root,
@@ -120,7 +256,16 @@ class InputNode(AsyncNode):
         # 处理控制命令
         # ========================================
         if user_input.startswith('/'):
-            return {"type": "command", "command": user_input}
+            command = user_input.lower()
+            handler = _COMMAND_HANDLERS.get(command)
+            if handler is not None:
+                result = handler(shared)
+                if inspect.isawaitable(result):
+                    await result
+            else:
+                print(f"\n✗ [Command] Unknown command: {command}")
+                print("   Type /help to see available commands")
+            return _COMMAND_HANDLED
 
         return user_input
 
@@ -131,129 +276,23 @@ class InputNode(AsyncNode):
     async def post_async(self, shared, prep_res, exec_res):
         """保存用户输入并开始任务"""
         if prep_res is None:
-            # 保存记忆索引
+            # 保存记忆索引（后台写入，会话结束时由 main 等待完成）
             memory_index = shared.get("memory_index")
             if memory_index and len(memory_index) > 0:
-                memory_index.save("memory_index.json")
+                memory_index.save_in_background("memory_index.json")
             print("\n[INFO] Goodbye!")
             return None  # 结束流程
 
-        if prep_res == "empty":
-            return Action.INPUT  # 重新获取输入
-
-        # ========================================
-        # 处理控制命令
-        # ========================================
-        if isinstance(exec_res, dict) and exec_res.get("type") == "command":
-            command = exec_res.get("command", "").lower()
-
-            if command == "/clear":
-                # 清除当前任务上下文
-                shared["context"] = ""
-                shared["step_count"] = 0
-                shared["supervisor_retry_count"] = 0
-                print("\n✓ [Command] Current task context cleared")
-                print("   - Tool call history: cleared")
-                print("   - Think analysis: cleared")
-                print("   - Step count: reset to 0")
-                return Action.INPUT
-
-            elif command in ["/new", "/newtask"]:
-                # 开始新任务：清除上下文 + 规划文件
-                shared["context"] = ""
-                shared["step_count"] = 0
-                shared["supervisor_retry_count"] = 0
-                shared["has_plan"] = False
-                shared["tool_call_count"] = 0
-                cleanup_planning_files()
-                print("\n✓ [Command] New task started")
-                print("   - Current context: cleared")
-                print("   - Planning files: removed")
-                print("   - Dialog history: preserved")
-                return Action.INPUT
-
-            elif command == "/reset":
-                # 完全重置：清除所有历史
-                shared["context"] = ""
-                shared["step_count"] = 0
-                shared["supervisor_retry_count"] = 0
-                shared["has_plan"] = False
-                shared["tool_call_count"] = 0
-                shared["messages"] = []
-                cleanup_planning_files()
-                print("\n✓ [Command] System fully reset")
-                print("   - All context: cleared")
-                print("   - Dialog history: cleared")
-                print("   - Planning files: removed")
-                print("   - Long-term memory: preserved")
-                return Action.INPUT
-
-            elif command == "/forget":
-                # 清除长期记忆
-                memory_index = shared.get("memory_index")
-                if memory_index:
-                    count = len(memory_index)
-                    shared["memory_index"] = get_memory_index.__class__(dimension=384)
-                    # 删除记忆文件
-                    if os.path.exists("memory_index.json"):
-                        os.remove("memory_index.json")
-                    print(f"\n✓ [Command] Long-term memory cleared ({count} items removed)")
-                else:
-                    print("\n✓ [Command] No memory to clear")
-                return Action.INPUT
-
-            elif command == "/logoff":
-                # 关闭日志记录
-                from logging_config import disable_logging, is_logging_enabled
-                if is_logging_enabled():
-                    disable_logging()
-                    print("\n✓ [Command] Logging disabled")
-                    print("   - All log functions will not write to files")
-                    print("   - Use /logon to re-enable logging")
-                else:
-                    print("\n✓ [Command] Logging is already disabled")
-                return Action.INPUT
-
-            elif command == "/logon":
-                # 启用日志记录
-                from logging_config import enable_logging, is_logging_enabled
-                if not is_logging_enabled():
-                    enable_logging()
-                    print("\n✓ [Command] Logging enabled")
-                    print("   - All operations will be logged to files")
-                    print("   - Log files location: logs/")
-                else:
-                    print("\n✓ [Command] Logging is already enabled")
-                return Action.INPUT
-
-            elif command == "/help":
-                # 显示帮助信息
-                print("\n" + "=" * 50)
-                print("Available Commands:")
-                print("=" * 50)
-                print("/clear      - Clear current task context only")
-                print("/new        - Start a new task (clear context + plans)")
-                print("/newtask    - Alias for /new")
-                print("/reset      - Full reset (clear everything except memory)")
-                print("/forget     - Clear long-term memory index")
-                print("/logoff     - Disable logging to files")
-                print("/logon      - Enable logging to files")
-                print("/help       - Show this help message")
-                print("exit/quit   - Exit the program")
-                print("=" * 50)
-                return Action.INPUT
-
-            else:
-                print(f"\n✗ [Command] Unknown command: {command}")
-                print("   Type /help to see available commands")
-                return Action.INPUT
+        if prep_res == "empty" or prep_res is _COMMAND_HANDLED:
+            return Action.INPUT  # 重新获取输入（命令已在 prep 阶段处理）
 
         # ========================================
         # 正常任务处理
         # ========================================
         # 重置任务状态
         shared["current_task"] = exec_res
-        shared["context"] = ""
+        reset_context(shared)
+        shared["supervisor_feedback"] = None
         shared["step_count"] = 0
         shared["max_steps"] = 25  # 复杂任务需要更多步骤
         shared["extension_count"] = 0  # 初始化延长计数器
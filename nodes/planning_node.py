@@ -8,7 +8,9 @@ PlanningNode - 任务规划节点 (Manus-style)
 """
 
 import os
-from datetime import datetime
+import re
+import asyncio
+from dataclasses import dataclass
 from pocketflow import AsyncNode
 
 from .base import Action
@@ -18,9 +20,63 @@ from .planning_utils import (
     FINDINGS_FILE,
     PROGRESS_FILE,
     is_complex_task,
-    write_planning_file,
+    write_planning_file_async,
+    current_timestamp,
 )
 
+# 模板目录（项目根目录下的 templates/）
+_TEMPLATES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates"
+)
+
+# 模板内容缓存：模板在运行期间不会变化，只需读取一次
+_TEMPLATE_CACHE: dict[str, str] = {}
+
+
+def _load_template(name: str) -> str:
+    """读取规划文件模板（首次读取后缓存）"""
+    template = _TEMPLATE_CACHE.get(name)
+    if template is None:
+        with open(os.path.join(_TEMPLATES_DIR, name), "r", encoding="utf-8") as f:
+            template = f.read()
+        _TEMPLATE_CACHE[name] = template
+    return template
+
+
+# 任务类型关键词（按优先级排列：同时命中多个类型时取靠前的类型）
+_TASK_TYPE_KEYWORDS = [
+    ("analysis", "Research & Analysis", ["分析", "analyze", "研究", "research"]),
+    ("compare", "Comparison", ["比较", "compare", "对比"]),
+    ("summary", "Summarization", ["总结", "summarize", "汇总"]),
+]
+_TASK_TYPE_NAMES = {group: task_type for group, task_type, _ in _TASK_TYPE_KEYWORDS}
+
+# 每个类型一个从开头起的前瞻分支，分支按优先级依次尝试，lastgroup 即命中的类型
+_TASK_TYPE_RE = re.compile(
+    "|".join(
+        f"(?=.*?(?P<{group}>{'|'.join(map(re.escape, keywords))}))"
+        for group, _, keywords in _TASK_TYPE_KEYWORDS
+    ),
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@dataclass(slots=True, frozen=True)
+class PlanningResult:
+    """
+    exec_async 传给 post_async 的规划判断结果
+
+    Attributes:
+        needs_planning: 是否需要创建规划文件
+        task: 任务内容
+        task_type: 任务类型
+        timestamp: 规划创建时间
+    """
+    needs_planning: bool
+    task: str = ""
+    task_type: str = ""
+    timestamp: str = ""
+
 
 class PlanningNode(AsyncNode):
     """
@@ -45,84 +101,74 @@ class PlanningNode(AsyncNode):
         needs_planning = is_complex_task(task)
 
         if not needs_planning:
-            return {"needs_planning": False}
-
-        # 确定任务类型
-        task_lower = task.lower()
-        if any(kw in task_lower for kw in ["分析", "analyze", "研究", "research"]):
-            task_type = "Research & Analysis"
-        elif any(kw in task_lower for kw in ["比较", "compare", "对比"]):
-            task_type = "Comparison"
-        elif any(kw in task_lower for kw in ["总结", "summarize", "汇总"]):
-            task_type = "Summarization"
-        else:
-            task_type = "Multi-step Task"
-
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-
-        return {
-            "needs_planning": True,
-            "task": task,
-            "task_type": task_type,
-            "timestamp": timestamp
-        }
+            return PlanningResult(needs_planning=False)
+
+        # 确定任务类型（单个预编译正则完成分类）
+        match = _TASK_TYPE_RE.match(task)
+        task_type = _TASK_TYPE_NAMES[match.lastgroup] if match else "Multi-step Task"
+
+        return PlanningResult(
+            needs_planning=True,
+            task=task,
+            task_type=task_type,
+            timestamp=current_timestamp()
+        )
 
     async def post_async(self, shared, prep_res, exec_res):
         """创建规划文件或跳过"""
-        if not exec_res.get("needs_planning"):
+        if not exec_res.needs_planning:
             print("   [Planning] Simple task, skipping planning files")
             shared["has_plan"] = False
             return Action.RETRIEVE
 
-        task = exec_res["task"]
-        task_type = exec_res["task_type"]
-        timestamp = exec_res["timestamp"]
+        task = exec_res.task
+        task_type = exec_res.task_type
+        timestamp = exec_res.timestamp
 
         # 读取模板并填充
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        templates_dir = os.path.join(base_dir, "templates")
+        files_to_write = []
 
         # 创建 task_plan.md
         try:
-            with open(os.path.join(templates_dir, "task_plan.md"), "r", encoding="utf-8") as f:
-                plan_template = f.read()
-            plan_content = plan_template.format(
+            plan_content = _load_template("task_plan.md").format(
                 goal=task,
                 task_type=task_type,
                 timestamp=timestamp
             )
-            write_planning_file(PLAN_FILE, plan_content)
-            print(f"   [Planning] Created {PLAN_FILE}")
+            files_to_write.append((PLAN_FILE, plan_content))
         except Exception as e:
             print(f"   [WARN] Failed to create {PLAN_FILE}: {e}")
 
         # 创建 findings.md
         try:
-            with open(os.path.join(templates_dir, "findings.md"), "r", encoding="utf-8") as f:
-                findings_template = f.read()
-            findings_content = findings_template.format(
+            findings_content = _load_template("findings.md").format(
                 task=task,
                 timestamp=timestamp,
                 initial_finding="Task analysis initiated"
             )
-            write_planning_file(FINDINGS_FILE, findings_content)
-            print(f"   [Planning] Created {FINDINGS_FILE}")
+            files_to_write.append((FINDINGS_FILE, findings_content))
         except Exception as e:
             print(f"   [WARN] Failed to create {FINDINGS_FILE}: {e}")
 
         # 创建 progress.md
         try:
-            with open(os.path.join(templates_dir, "progress.md"), "r", encoding="utf-8") as f:
-                progress_template = f.read()
-            progress_content = progress_template.format(
+            progress_content = _load_template("progress.md").format(
                 task=task,
                 timestamp=timestamp
             )
-            write_planning_file(PROGRESS_FILE, progress_content)
-            print(f"   [Planning] Created {PROGRESS_FILE}")
+            files_to_write.append((PROGRESS_FILE, progress_content))
         except Exception as e:
             print(f"   [WARN] Failed to create {PROGRESS_FILE}: {e}")
 
+        # 三个文件相互独立，并发写入
+        results = await asyncio.gather(*(
+            write_planning_file_async(filename, content)
+            for filename, content in files_to_write
+        ))
+        for (filename, _), ok in zip(files_to_write, results):
+            if ok:
+                print(f"   [Planning] Created {filename}")
+
         # 标记已创建规划
         shared["has_plan"] = True
         shared["tool_call_count"] = 0  # 用于 2-动作规则
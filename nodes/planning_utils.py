@@ -10,7 +10,11 @@ Manus-style 规划文件操作辅助函数
 
 import os
 import re
+import shutil
+import time
+import asyncio
 from datetime import datetime
+from functools import lru_cache
 
 
 # ============================================================================
@@ -74,6 +78,9 @@ FINDINGS_UPDATE_INTERVAL = 2
 # Progress 文件最大条目数（防止文件过大）
 MAX_PROGRESS_ENTRIES = 20
 
+# Progress 条目裁剪间隔：每追加 N 条才解析一次整个文件检查是否超限
+PROGRESS_TRIM_INTERVAL = 10
+
 # 规划文件归档目录
 ARCHIVE_DIR = "sandbox/archive"
 
@@ -122,15 +129,90 @@ TOOL_IMPLICATIONS_MAP = {
     "execute_python": "Python代码已运行，输出可用于分析",
 }
 
+# 工具名关键词到 implications 的模糊匹配规则（按优先级排列，先匹配者优先）
+TOOL_IMPLICATION_KEYWORDS = [
+    (["stock", "quote", "kline", "financial", "price"], "金融数据已获取，可用于市场分析"),
+    (["search", "query", "find"], "搜索结果已获取，可提取相关信息"),
+    (["news", "trending", "hot", "rank"], "热点信息已获取，可了解当前趋势"),
+    (["weather", "天气", "forecast"], "天气信息已获取，可用于规划"),
+    (["map", "direction", "route", "geo"], "地理信息已获取，可用于导航决策"),
+    (["file", "read", "write", "directory"], "文件操作已完成"),
+    (["execute", "run", "code", "python", "terminal"], "代码已执行，输出可用于下一步分析"),
+    (["image", "generate", "edit", "画"], "图像处理完成"),
+]
+
+# 项目根目录及规划/归档目录的绝对路径（模块加载时解析一次，避免每次调用重复计算）
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PLANNING_ABS = os.path.join(_BASE_DIR, PLANNING_DIR)
+_ARCHIVE_ABS = os.path.join(_BASE_DIR, ARCHIVE_DIR)
+
+# 规划目录在运行期间不会变化，初始化时创建一次即可
+os.makedirs(_PLANNING_ABS, exist_ok=True)
+
+# 归档父目录是否已创建（首次归档时创建一次，之后只需创建带时间戳的子目录）
+_archive_dir_ready = False
+
+# 本次运行中已追加的 progress 条目数（用于控制裁剪频率）
+_progress_append_count = 0
+
+# progress.md 裁剪后缺失尾部时补充的默认尾部
+_PROGRESS_DEFAULT_FOOTER = "\n## Errors Log\n<!-- Track errors to avoid repeating -->\n\n## Test Results\n<!-- Record any validation or test outcomes -->\n"
+
+# 预编译的规划文件解析正则（避免每次调用重复编译）
+_PROGRESS_ENTRY_RE = re.compile(r'### \[[^\]]+\] .+?(?=### \[|## Errors|## Test|$)', re.DOTALL)
+_PROGRESS_HEADER_RE = re.compile(r'(.*?## Log Entries\s*)', re.DOTALL)
+_PROGRESS_FOOTER_RE = re.compile(r'(## Errors Log.*)', re.DOTALL)
+_PLAN_PHASE_COMPLETED_RE = re.compile(r"- \[x\] Phase \d+:")
+_PLAN_PHASE_ANY_RE = re.compile(r"- \[.\] Phase \d+:")
+_PLAN_UNCOMPLETED_RE = re.compile(r"- \[ \] (Phase \d+:[^-\n]+)")
+# 使用 [^\n]* 替代 .* 避免贪婪匹配跨行
+_CURRENT_PHASE_RE = re.compile(r"## Current Phase\n[^\n]*")
+# Errors Encountered 段落：从标题到下一个 "\n##" 之前
+_ERRORS_SECTION_RE = re.compile(r"(## Errors Encountered(?:(?!\n##).)*)", re.DOTALL)
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r'[\\/:*?"<>|]')
+
+# 复杂任务关键词和句式模式（合并为单个忽略大小写的正则，一次扫描完成匹配；
+# 正则引擎自身按候选首字符跳过不可能的位置，无需额外的首字符位图预筛选）
+_COMPLEX_KEYWORD_RE = re.compile(
+    "|".join(re.escape(kw) for kw in COMPLEX_TASK_KEYWORDS), re.IGNORECASE
+)
+_COMPLEX_PATTERN_RE = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in COMPLEX_TASK_PATTERNS), re.IGNORECASE
+)
+
+# 工具类别匹配：每个类别一个前瞻分支，按列表顺序尝试，
+# 命中分支的捕获组编号即类别下标 + 1（保持原 if 链的优先级语义）
+_TOOL_IMPLICATION_RE = re.compile(
+    "|".join(
+        "(?=.*?(" + "|".join(re.escape(kw) for kw in keywords) + "))"
+        for keywords, _ in TOOL_IMPLICATION_KEYWORDS
+    ),
+    re.IGNORECASE | re.DOTALL,
+)
+
 
 # ============================================================================
 # 规划文件操作辅助函数
 # ============================================================================
 
+@lru_cache(maxsize=1)
+def _format_minute_timestamp(minute: int) -> str:
+    """格式化指定分钟（Unix 时间戳 // 60）的时间戳，同一分钟内直接命中缓存"""
+    return datetime.fromtimestamp(minute * 60).strftime("%Y-%m-%d %H:%M")
+
+
+def current_timestamp() -> str:
+    """
+    获取规划文件记录使用的时间戳（精确到分钟）
+
+    同一步骤内多次记录时，调用方可获取一次后通过 timestamp 参数传给各 append_* 函数。
+    """
+    return _format_minute_timestamp(int(time.time()) // 60)
+
+
 def get_planning_file_path(filename: str) -> str:
     """获取规划文件的完整路径"""
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_dir, PLANNING_DIR, filename)
+    return os.path.join(_PLANNING_ABS, filename)
 
 
 def read_planning_file(filename: str) -> str | None:
@@ -145,43 +227,102 @@ def read_planning_file(filename: str) -> str | None:
     return None
 
 
+def _replace_file(filepath: str, content: str) -> None:
+    """先写入临时文件再原子替换目标文件，避免读到写了一半的规划文件"""
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, filepath)
+
+
 def write_planning_file(filename: str, content: str) -> bool:
     """写入规划文件"""
     filepath = get_planning_file_path(filename)
     try:
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(content)
+        try:
+            _replace_file(filepath, content)
+        except FileNotFoundError:
+            # 规划目录在运行期间被删除时重建一次后重试
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            _replace_file(filepath, content)
         return True
     except Exception as e:
         print(f"   [WARN] Failed to write {filename}: {e}")
         return False
 
 
+async def write_planning_file_async(filename: str, content: str) -> bool:
+    """【异步】写入规划文件（在线程池中执行，不阻塞事件循环）"""
+    return await asyncio.to_thread(write_planning_file, filename, content)
+
+
+def append_planning_file(filename: str, text: str) -> bool:
+    """
+    以追加模式写入规划文件（只写入新增内容，不重写整个文件）
+
+    文件不存在时返回 False（说明当前任务没有创建规划文件）。
+    """
+    filepath = get_planning_file_path(filename)
+    try:
+        # 不带 O_CREAT 打开：文件是否存在由 open 本身判断，省去单独的 stat 调用
+        fd = os.open(filepath, os.O_WRONLY | os.O_APPEND | getattr(os, "O_BINARY", 0))
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"   [WARN] Failed to append {filename}: {e}")
+        return False
+    try:
+        with os.fdopen(fd, "a", encoding="utf-8") as f:
+            f.write(text)
+        return True
+    except Exception as e:
+        print(f"   [WARN] Failed to append {filename}: {e}")
+        return False
+
+
 def update_plan_phase(phase_num: int, completed: bool = False) -> bool:
     """更新计划文件中的阶段状态"""
+    return update_plan_phases([(phase_num, completed)])
+
+
+def update_plan_phases(updates: list[tuple[int, bool]]) -> bool:
+    """
+    批量更新计划文件中的阶段状态（只读写一次文件）
+
+    Args:
+        updates: (阶段编号, 是否完成) 列表，按顺序应用
+    """
     content = read_planning_file(PLAN_FILE)
     if not content:
         return False
 
-    # 更新复选框状态
-    old_marker = f"- [ ] Phase {phase_num}:"
-    new_marker = f"- [x] Phase {phase_num}:" if completed else f"- [ ] Phase {phase_num}:"
+    changed = False
+    for phase_num, completed in updates:
+        # 更新复选框状态
+        old_marker = f"- [ ] Phase {phase_num}:"
+        new_marker = f"- [x] Phase {phase_num}:" if completed else f"- [ ] Phase {phase_num}:"
 
-    if old_marker in content or f"- [x] Phase {phase_num}:" in content:
-        content = content.replace(f"- [ ] Phase {phase_num}:", new_marker)
-        content = content.replace(f"- [x] Phase {phase_num}:", new_marker)
+        if old_marker in content or f"- [x] Phase {phase_num}:" in content:
+            content = content.replace(f"- [ ] Phase {phase_num}:", new_marker)
+            content = content.replace(f"- [x] Phase {phase_num}:", new_marker)
 
-        # 更新当前阶段
-        if not completed:
-            # 使用 [^\n]* 替代 .* 避免贪婪匹配跨行
-            content = re.sub(r"## Current Phase\n[^\n]*", f"## Current Phase\nPhase {phase_num}", content)
+            # 更新当前阶段
+            if not completed:
+                content = _CURRENT_PHASE_RE.sub(f"## Current Phase\nPhase {phase_num}", content)
+            changed = True
 
+    if changed:
         return write_planning_file(PLAN_FILE, content)
     return False
 
 
-def append_to_findings(title: str, source: str, finding: str, implications: str = "", priority: str = "normal") -> bool:
+async def update_plan_phases_async(updates: list[tuple[int, bool]]) -> bool:
+    """update_plan_phases 的异步版本（在线程池中执行文件读写）"""
+    return await asyncio.to_thread(update_plan_phases, updates)
+
+
+def append_to_findings(title: str, source: str, finding: str, implications: str = "", priority: str = "normal",
+                       timestamp: str | None = None) -> bool:
     """
     追加发现到 findings.md
 
@@ -191,18 +332,15 @@ def append_to_findings(title: str, source: str, finding: str, implications: str
         finding: 发现内容
         implications: 影响/意义
         priority: 优先级 ("critical", "important", "normal")
+        timestamp: 记录时间（默认取当前时间，同一步骤可共享一个值）
     """
-    content = read_planning_file(FINDINGS_FILE)
-    if not content:
-        return False
-
     # 根据优先级截断内容
     max_length = FINDING_LENGTH_LIMITS.get(priority, 200)
     finding_truncated = finding[:max_length]
     if len(finding) > max_length:
         finding_truncated += f"\n... (truncated {len(finding) - max_length} chars)"
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    timestamp = timestamp or current_timestamp()
     priority_tag = f"[{priority.upper()}] " if priority != "normal" else ""
 
     new_entry = f"""
@@ -216,17 +354,15 @@ def append_to_findings(title: str, source: str, finding: str, implications: str
 
 ---
 """
-    content += new_entry
-    return write_planning_file(FINDINGS_FILE, content)
+    return append_planning_file(FINDINGS_FILE, new_entry)
 
 
-def append_to_progress(action_type: str, description: str, tool_name: str = "", result: str = "") -> bool:
-    """追加进度到 progress.md，并限制最大条目数防止文件过大"""
-    content = read_planning_file(PROGRESS_FILE)
-    if not content:
-        return False
+def append_to_progress(action_type: str, description: str, tool_name: str = "", result: str = "",
+                       timestamp: str | None = None) -> bool:
+    """追加进度到 progress.md，并定期限制最大条目数防止文件过大"""
+    global _progress_append_count
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    timestamp = timestamp or current_timestamp()
     tool_line = f"\n- Tool: {tool_name}" if tool_name else ""
     result_line = f"\n- Result: {result[:100]}..." if result and len(result) > 100 else (f"\n- Result: {result}" if result else "")
 
@@ -235,64 +371,91 @@ def append_to_progress(action_type: str, description: str, tool_name: str = "",
 - {description}{tool_line}{result_line}
 
 """
-    content += new_entry
+    if not append_planning_file(PROGRESS_FILE, new_entry):
+        return False
+
+    # 每 PROGRESS_TRIM_INTERVAL 次追加才检查一次条目数量
+    _progress_append_count += 1
+    if _progress_append_count % PROGRESS_TRIM_INTERVAL == 0:
+        return _trim_progress_file()
+    return True
+
+
+async def append_to_findings_async(title: str, source: str, finding: str, implications: str = "", priority: str = "normal",
+                                   timestamp: str | None = None) -> bool:
+    """【异步】追加发现到 findings.md（参数同 append_to_findings）"""
+    return await asyncio.to_thread(append_to_findings, title, source, finding, implications, priority, timestamp)
+
+
+async def append_to_progress_async(action_type: str, description: str, tool_name: str = "", result: str = "",
+                                   timestamp: str | None = None) -> bool:
+    """【异步】追加进度到 progress.md（参数同 append_to_progress）"""
+    return await asyncio.to_thread(append_to_progress, action_type, description, tool_name, result, timestamp)
+
+
+def _trim_progress_file() -> bool:
+    """限制 progress 条目数量，防止文件过大"""
+    content = read_planning_file(PROGRESS_FILE)
+    if not content:
+        return False
+
+    entries = _PROGRESS_ENTRY_RE.findall(content)
+    if len(entries) <= MAX_PROGRESS_ENTRIES:
+        return True
 
-    # ========================================
-    # 限制 progress 条目数量，防止文件过大
-    # ========================================
-    entries = re.findall(r'### \[[^\]]+\] .+?(?=### \[|## Errors|## Test|$)', content, re.DOTALL)
-    if len(entries) > MAX_PROGRESS_ENTRIES:
-        # 保留头部（标题和任务信息）+ 最近 N 条记录
-        header_match = re.match(r'(.*?## Log Entries\s*)', content, re.DOTALL)
-        header = header_match.group(1) if header_match else ""
+    # 保留头部（标题和任务信息）+ 最近 N 条记录
+    header_match = _PROGRESS_HEADER_RE.match(content)
+    header = header_match.group(1) if header_match else ""
 
-        # 只保留最近的条目
-        recent_entries = entries[-MAX_PROGRESS_ENTRIES:]
-        content = header + "\n" + "\n".join(recent_entries)
+    # 只保留最近的条目（收集片段后一次性拼接，避免反复生成中间字符串）
+    parts = [header]
+    parts.extend(entries[-MAX_PROGRESS_ENTRIES:])
 
-        # 保留尾部（Errors Log 和 Test Results）
-        footer_match = re.search(r'(## Errors Log.*)', content, re.DOTALL)
-        if not footer_match:
-            content += "\n## Errors Log\n<!-- Track errors to avoid repeating -->\n\n## Test Results\n<!-- Record any validation or test outcomes -->\n"
+    # 保留尾部（Errors Log 和 Test Results）
+    has_footer = any(_PROGRESS_FOOTER_RE.search(part) for part in parts)
+    footer = "" if has_footer else _PROGRESS_DEFAULT_FOOTER
 
-    return write_planning_file(PROGRESS_FILE, content)
+    return write_planning_file(PROGRESS_FILE, "\n".join(parts) + footer)
 
 
-def record_error_in_plan(error: str) -> bool:
+def record_error_in_plan(error: str, timestamp: str | None = None) -> bool:
     """在计划文件中记录错误（避免重复）"""
     content = read_planning_file(PLAN_FILE)
     if not content:
         return False
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    timestamp = timestamp or current_timestamp()
     error_entry = f"\n- [{timestamp}] {error}"
 
-    # 在 Errors Encountered 部分追加
-    if "## Errors Encountered" in content:
-        parts = content.split("## Errors Encountered")
-        if len(parts) == 2:
-            content = parts[0] + "## Errors Encountered" + parts[1].split("\n##")[0] + error_entry
-            if "\n##" in parts[1]:
-                content += "\n##" + "\n##".join(parts[1].split("\n##")[1:])
-            return write_planning_file(PLAN_FILE, content)
+    # 在 Errors Encountered 部分末尾追加（单次正则替换完成拼接）
+    content, count = _ERRORS_SECTION_RE.subn(lambda m: m.group(1) + error_entry, content, count=1)
+    if count:
+        return write_planning_file(PLAN_FILE, content)
     return False
 
 
+async def record_error_in_plan_async(error: str, timestamp: str | None = None) -> bool:
+    """【异步】在计划文件中记录错误（参数同 record_error_in_plan）"""
+    return await asyncio.to_thread(record_error_in_plan, error, timestamp)
+
+
 def get_plan_completion_status() -> tuple[int, int, list[str]]:
     """获取计划完成状态: (已完成数, 总数, 未完成阶段列表)"""
     content = read_planning_file(PLAN_FILE)
     if not content:
         return 0, 0, []
 
-    completed = len(re.findall(r"- \[x\] Phase \d+:", content))
-    total = len(re.findall(r"- \[.\] Phase \d+:", content))
+    # 只需计数，用 finditer 逐个迭代，避免构建匹配列表
+    completed = sum(1 for _ in _PLAN_PHASE_COMPLETED_RE.finditer(content))
+    total = sum(1 for _ in _PLAN_PHASE_ANY_RE.finditer(content))
 
     # 获取未完成阶段
-    uncompleted = re.findall(r"- \[ \] (Phase \d+:[^-\n]+)", content)
+    uncompleted = _PLAN_UNCOMPLETED_RE.findall(content)
 
     return completed, total, uncompleted
 
 
+@lru_cache(maxsize=256)
 def is_complex_task(task: str) -> bool:
     """
     判断是否为复杂任务，需要创建规划文件
@@ -302,25 +465,23 @@ def is_complex_task(task: str) -> bool:
     2. 包含复杂任务关键词
     3. 匹配复杂任务句式模式（正则）
 
+    纯函数，结果按任务文本缓存（用户重试/重复提问时直接命中）。
+
     Returns:
         True: 复杂任务，需要创建规划文件
         False: 简单任务，跳过规划
     """
-    # 条件1: 长度检查
+    # 条件1: 长度检查（长任务直接返回，无需任何字符串处理）
     if len(task) >= COMPLEX_TASK_MIN_LENGTH:
         return True
 
-    task_lower = task.lower()
-
-    # 条件2: 关键词检查
-    for keyword in COMPLEX_TASK_KEYWORDS:
-        if keyword.lower() in task_lower:
-            return True
+    # 条件2: 关键词检查（预编译的忽略大小写正则，无需 lower() 复制字符串）
+    if _COMPLEX_KEYWORD_RE.search(task):
+        return True
 
     # 条件3: 句式模式匹配（正则表达式）
-    for pattern in COMPLEX_TASK_PATTERNS:
-        if re.search(pattern, task, re.IGNORECASE):
-            return True
+    if _COMPLEX_PATTERN_RE.search(task):
+        return True
 
     return False
 
@@ -346,17 +507,21 @@ def archive_planning_files(task_summary: str = "") -> str | None:
     Returns:
         归档目录路径，失败返回 None
     """
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    archive_base = os.path.join(base_dir, ARCHIVE_DIR)
-
     # 创建带时间戳的归档目录
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     # 清理 task_summary，移除特殊字符
-    safe_summary = re.sub(r'[\\/:*?"<>|]', '_', task_summary[:30]) if task_summary else "task"
-    archive_dir = os.path.join(archive_base, f"{timestamp}_{safe_summary}")
+    safe_summary = _UNSAFE_FILENAME_CHARS_RE.sub('_', task_summary[:30]) if task_summary else "task"
+    archive_dir = os.path.join(_ARCHIVE_ABS, f"{timestamp}_{safe_summary}")
 
+    global _archive_dir_ready
     try:
-        os.makedirs(archive_dir, exist_ok=True)
+        if not _archive_dir_ready:
+            os.makedirs(_ARCHIVE_ABS, exist_ok=True)
+            _archive_dir_ready = True
+        try:
+            os.mkdir(archive_dir)
+        except FileExistsError:
+            pass
 
         archived_count = 0
         for filename in [PLAN_FILE, FINDINGS_FILE, PROGRESS_FILE]:
@@ -364,7 +529,7 @@ def archive_planning_files(task_summary: str = "") -> str | None:
             if os.path.exists(src_path):
                 dst_path = os.path.join(archive_dir, filename)
                 # 复制而非移动，保留原文件以便调试
-                import shutil
+                # （不能用硬链接：append_planning_file 原地追加，会同时改变已归档的内容）
                 shutil.copy2(src_path, dst_path)
                 archived_count += 1
 
@@ -392,40 +557,10 @@ def get_smart_implications(tool_name: str, result_str: str = "") -> str:
     if tool_name in TOOL_IMPLICATIONS_MAP:
         return TOOL_IMPLICATIONS_MAP[tool_name]
 
-    # 模糊匹配：检查工具名是否包含关键词
-    tool_lower = tool_name.lower()
-
-    # 金融/股票类
-    if any(kw in tool_lower for kw in ["stock", "quote", "kline", "financial", "price"]):
-        return "金融数据已获取，可用于市场分析"
-
-    # 搜索类
-    if any(kw in tool_lower for kw in ["search", "query", "find"]):
-        return "搜索结果已获取，可提取相关信息"
-
-    # 新闻/热点类
-    if any(kw in tool_lower for kw in ["news", "trending", "hot", "rank"]):
-        return "热点信息已获取，可了解当前趋势"
-
-    # 天气类
-    if any(kw in tool_lower for kw in ["weather", "天气", "forecast"]):
-        return "天气信息已获取，可用于规划"
-
-    # 地图/导航类
-    if any(kw in tool_lower for kw in ["map", "direction", "route", "geo"]):
-        return "地理信息已获取，可用于导航决策"
-
-    # 文件操作类
-    if any(kw in tool_lower for kw in ["file", "read", "write", "directory"]):
-        return "文件操作已完成"
-
-    # 代码执行类
-    if any(kw in tool_lower for kw in ["execute", "run", "code", "python", "terminal"]):
-        return "代码已执行，输出可用于下一步分析"
-
-    # 图像类
-    if any(kw in tool_lower for kw in ["image", "generate", "edit", "画"]):
-        return "图像处理完成"
+    # 模糊匹配：按类别优先级检查工具名是否包含关键词（单次正则匹配）
+    match = _TOOL_IMPLICATION_RE.match(tool_name)
+    if match:
+        return TOOL_IMPLICATION_KEYWORDS[match.lastindex - 1][1]
 
     # 默认
     return "数据已收集，待进一步分析"
@@ -3,14 +3,15 @@
 
 包含:
 - AGENT_SYSTEM_PROMPT: 主系统提示词
+- build_system_prompt: 填充主系统提示词
 - THINKING_PROMPT: 思考节点提示词
 - ANSWER_PROMPT: 回答节点提示词
 """
 
-AGENT_SYSTEM_PROMPT = """你是一个智能助手，可以通过 MCP 协议调用各种工具来帮助用户解决复杂问题。
+from string import Formatter
 
-### 当前时间
-{current_datetime}
+# 注意：当前时间放在提示词末尾，使前面的静态内容在不同会话间保持一致（利于 LLM 服务端前缀缓存）
+AGENT_SYSTEM_PROMPT = """你是一个智能助手，可以通过 MCP 协议调用各种工具来帮助用户解决复杂问题。
 
 ### 项目路径
 - 项目根目录: {project_root}
@@ -155,8 +156,33 @@ tool_params:
 - 股票代码格式说明：
   - xueqiu 工具使用前缀格式：SH600016（上海）、SZ000001（深圳）
   - financial-analysis 工具使用后缀格式：600016.SH、000001.SZ
+
+### 当前时间
+{current_datetime}
 """
 
+# 模板在导入时拆分为 (静态文本, 字段名) 片段，填充时只需拼接，无需每次重新解析模板
+_SYSTEM_PROMPT_PARTS = [
+    (literal, field_name)
+    for literal, field_name, _, _ in Formatter().parse(AGENT_SYSTEM_PROMPT)
+]
+
+
+def build_system_prompt(tool_info: str, current_datetime: str, project_root: str, sandbox_path: str) -> str:
+    """填充主系统提示词（等价于 AGENT_SYSTEM_PROMPT.format(...)）"""
+    fields = {
+        "tool_info": tool_info,
+        "current_datetime": current_datetime,
+        "project_root": project_root,
+        "sandbox_path": sandbox_path,
+    }
+    parts = []
+    for literal, field_name in _SYSTEM_PROMPT_PARTS:
+        parts.append(literal)
+        if field_name is not None:
+            parts.append(fields[field_name])
+    return "".join(parts)
+
 THINKING_PROMPT = """基于以下上下文信息，进行分析推理:
 
 ### 当前任务
@@ -0,0 +1,377 @@
+"""
+常驻 Python 工作进程池 (execute_python 内置工具)
+
+职责:
+- 启动一次解释器并预导入常用库，之后通过管道发送代码执行，省去每次启动进程的开销
+- 每次执行使用独立的全局命名空间，stdout/stderr 在文件描述符层面重定向到临时文件
+- 每次执行后恢复工作目录、环境变量和 sys.path；改变了工作目录/环境变量、留下运行中线程
+  或导入了本地模块（安装目录之外的 .py 文件）的进程不再复用
+- 超时、输出超限、被取消或异常退出的工作进程直接终止，下次按需重新启动
+
+本文件同时是工作进程的入口脚本，只依赖标准库，可由项目虚拟环境的 Python 直接运行:
+    python python_worker.py [预导入模块名 ...]
+
+协议（每行一个 JSON）:
+- 启动完成: {"ready": true}
+- 请求: {"code": 代码, "stdout": 输出文件路径, "stderr": 错误输出文件路径}
+- 响应: {"exit": 退出码, "dirty": 是否留下了无法复原的状态（需回收工作进程）}
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+
+
+# 执行期间检查输出文件大小的间隔（秒）
+OUTPUT_POLL_INTERVAL = 0.05
+
+
+# ============================================================================
+# 进程辅助函数
+# ============================================================================
+
+def kill_process_tree(proc) -> None:
+    """强制终止子进程（POSIX 下连同其进程组，需以 start_new_session=True 启动）"""
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, OSError, RuntimeError):
+        # 进程已退出，或所属事件循环已关闭
+        pass
+
+
+def _output_exceeds(limit: int, *paths: str) -> bool:
+    """任一输出文件超过 limit 字节时返回 True"""
+    for path in paths:
+        try:
+            if os.path.getsize(path) > limit:
+                return True
+        except OSError:
+            pass
+    return False
+
+
+class PythonWorkerError(RuntimeError):
+    """工作进程启动失败或通信中断"""
+    pass
+
+
+# ============================================================================
+# 主进程端：工作进程与进程池
+# ============================================================================
+
+class PythonWorker:
+    """单个常驻 Python 解释器"""
+
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+        self.tasks = 0       # 已执行的任务数
+        self.busy = False    # 请求已发送但尚未收到响应（此时不能复用）
+        self.dirty = False   # 上一次执行留下了进程级状态（此时不能复用）
+
+    @classmethod
+    async def start_async(cls, python: str, cwd: str, preload: tuple[str, ...] = ()) -> "PythonWorker":
+        """启动工作进程并等待预导入完成"""
+        kwargs = {}
+        if os.name == "posix":
+            kwargs["start_new_session"] = True
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                python, os.path.abspath(__file__), *preload,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                cwd=cwd,
+                **kwargs,
+            )
+        except OSError as e:
+            raise PythonWorkerError(f"failed to start {python}: {e}") from e
+
+        worker = cls(proc)
+        line = await proc.stdout.readline()
+        if not line:
+            await worker.close_async()
+            raise PythonWorkerError(f"worker exited during startup (code {proc.returncode})")
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    async def run_async(self, code: str, timeout: float,
+                        output_limit: int = -1) -> tuple[bytes, bytes, int, bool]:
+        """
+        执行一段代码
+
+        执行期间每隔 OUTPUT_POLL_INTERVAL 秒检查输出文件大小，任一输出流超过
+        output_limit 时立即终止工作进程（与单次子进程的输出上限行为一致）。
+
+        Args:
+            code: Python 代码
+            timeout: 超时时间（秒）
+            output_limit: 每个输出流的字节上限（-1 表示不限制）；
+                每个流最多返回 output_limit + 1 字节，调用方可据此判断是否截断
+
+        Returns:
+            (stdout, stderr, 退出码, 是否因输出超限被终止)
+
+        Raises:
+            asyncio.TimeoutError: 超时（工作进程已被终止）
+            PythonWorkerError: 请求发送失败
+        """
+        out_fd, out_path = tempfile.mkstemp(prefix="pyworker_", suffix=".out")
+        err_fd, err_path = tempfile.mkstemp(prefix="pyworker_", suffix=".err")
+        os.close(out_fd)
+        os.close(err_fd)
+        try:
+            request = json.dumps({"code": code, "stdout": out_path, "stderr": err_path}) + "\n"
+            self.busy = True
+            try:
+                self.proc.stdin.write(request.encode("utf-8"))
+                await self.proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                raise PythonWorkerError(f"worker is not accepting requests: {e}") from e
+
+            terminated = False
+            response = asyncio.ensure_future(self.proc.stdout.readline())
+            try:
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + timeout
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        await self.close_async()
+                        raise asyncio.TimeoutError()
+                    done, _ = await asyncio.wait([response], timeout=min(OUTPUT_POLL_INTERVAL, remaining))
+                    if done:
+                        line = response.result()
+                        break
+                    if output_limit >= 0 and _output_exceeds(output_limit, out_path, err_path):
+                        # 失控输出：立即终止，不再等待代码结束
+                        terminated = True
+                        await self.close_async()
+                        line = b""
+                        break
+            finally:
+                if not response.done():
+                    response.cancel()
+
+            if line:
+                try:
+                    reply = json.loads(line)
+                    exit_code = reply["exit"]
+                except (ValueError, TypeError, KeyError) as e:
+                    # 响应无法解析：工作进程状态未知，终止后交给调用方回退
+                    await self.close_async()
+                    raise PythonWorkerError(f"invalid worker reply {line[:100]!r}: {e}") from e
+                self.dirty = reply.get("dirty", False)
+                self.busy = False
+            else:
+                # 工作进程在执行中退出（如用户代码调用 os._exit，或输出超限被终止），以进程退出码为准
+                exit_code = await self.proc.wait()
+            self.tasks += 1
+
+            read_limit = output_limit + 1 if output_limit >= 0 else -1
+            with open(out_path, "rb") as f:
+                stdout = f.read(read_limit)
+            with open(err_path, "rb") as f:
+                stderr = f.read(read_limit)
+            return stdout, stderr, exit_code, terminated
+        finally:
+            for path in (out_path, err_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    async def close_async(self) -> None:
+        """终止工作进程"""
+        if self.alive:
+            kill_process_tree(self.proc)
+        await self.proc.wait()
+
+
+class PythonWorkerPool:
+    """
+    按需启动、空闲复用的工作进程池
+
+    同时执行的任务数不超过 size；空闲进程留待复用，执行 max_tasks 次后回收以限制状态累积。
+    """
+
+    def __init__(self, python: str, cwd: str, size: int = 2, max_tasks: int = 50,
+                 preload: tuple[str, ...] = ()):
+        self.python = python
+        self.cwd = cwd
+        self.size = size
+        self.max_tasks = max_tasks
+        self.preload = preload
+        self._idle: list[PythonWorker] = []
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _bind_loop(self) -> None:
+        """子进程绑定在创建它的事件循环上；循环变化时（如多次 asyncio.run）丢弃旧进程"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            for worker in self._idle:
+                kill_process_tree(worker.proc)
+            self._idle.clear()
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.size)
+
+    async def run_async(self, code: str, timeout: float,
+                        output_limit: int = -1) -> tuple[bytes, bytes, int, bool]:
+        """在空闲工作进程中执行代码（无空闲进程时启动新进程），返回值同 PythonWorker.run_async"""
+        self._bind_loop()
+        async with self._semaphore:
+            if self._idle:
+                worker = self._idle.pop()
+            else:
+                worker = await PythonWorker.start_async(self.python, self.cwd, self.preload)
+            try:
+                return await worker.run_async(code, timeout, output_limit)
+            finally:
+                if worker.alive and not worker.busy and not worker.dirty and worker.tasks < self.max_tasks:
+                    self._idle.append(worker)
+                else:
+                    await worker.close_async()
+
+    async def close_async(self) -> None:
+        """终止所有空闲工作进程"""
+        while self._idle:
+            await self._idle.pop().close_async()
+
+
+# ============================================================================
+# 工作进程端
+# ============================================================================
+
+def _run_job(code: str, stdout_path: str, stderr_path: str) -> int:
+    """在独立命名空间中执行代码，输出写入指定文件，返回退出码（与 python -c 一致）"""
+    import builtins
+    import traceback
+
+    saved_fds = os.dup(1), os.dup(2)
+    flags = os.O_WRONLY | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    for target_fd, path in ((1, stdout_path), (2, stderr_path)):
+        fd = os.open(path, flags)
+        os.dup2(fd, target_fd)
+        os.close(fd)
+    sys.stdout = open(1, "w", encoding="utf-8", errors="backslashreplace", closefd=False)
+    sys.stderr = open(2, "w", encoding="utf-8", errors="backslashreplace", closefd=False)
+    sys.argv = ["-c"]
+
+    exit_code = 0
+    try:
+        exec(compile(code, "<string>", "exec"), {"__name__": "__main__", "__builtins__": builtins})
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # 跳过本函数的栈帧，只显示用户代码的 traceback
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        exit_code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        for target_fd, saved_fd in zip((1, 2), saved_fds):
+            os.dup2(saved_fd, target_fd)
+            os.close(saved_fd)
+    return exit_code
+
+
+def _installed_prefixes() -> tuple[str, ...]:
+    """标准库与 site-packages 目录（这些目录中的模块在会话期间视为不变）"""
+    import sysconfig
+
+    paths = sysconfig.get_paths()
+    return tuple({
+        os.path.normcase(os.path.abspath(paths[key])) + os.sep
+        for key in ("stdlib", "platstdlib", "purelib", "platlib")
+        if key in paths
+    })
+
+
+def _imported_local_module(names, prefixes: tuple[str, ...]) -> bool:
+    """names 中是否有来自安装目录之外的模块（用户编写的文件，之后可能被修改）"""
+    for name in names:
+        path = getattr(sys.modules.get(name), "__file__", None)
+        if path and not os.path.normcase(os.path.abspath(path)).startswith(prefixes):
+            return True
+    return False
+
+
+def _worker_main(preload: list[str]) -> None:
+    """工作进程主循环：逐行读取请求并执行"""
+    # 协议使用私有的描述符副本；标准输入输出指向空设备，用户代码读写不会干扰协议
+    proto_in = os.fdopen(os.dup(0), "rb")
+    proto_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    sys.stdin = open(0, "r", closefd=False)
+
+    # 与 python -c 一致：sys.path[0] 为当前目录，而不是本脚本所在目录
+    sys.path[0] = ""
+    cwd = os.getcwd()
+
+    for name in preload:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+    # 每次执行后恢复的进程级状态
+    base_environ = dict(os.environ)
+    base_path = list(sys.path)
+    base_threads = threading.active_count()
+    base_modules = set(sys.modules)
+    installed = _installed_prefixes()
+
+    proto_out.write(b'{"ready": true}\n')
+    proto_out.flush()
+
+    # 协议编解码不使用 json 模块的全局函数：用户代码可能替换 json.loads/json.dumps
+    decode = json.JSONDecoder().decode
+
+    for line in proto_in:
+        request = decode(line.decode("utf-8"))
+        exit_code = _run_job(request["code"], request["stdout"], request["stderr"])
+
+        # 改变了工作目录/环境变量或留下仍在运行的线程时，要求主进程回收本进程
+        try:
+            dirty = os.getcwd() != cwd
+        except OSError:
+            dirty = True
+        dirty = dirty or os.environ != base_environ or threading.active_count() > base_threads
+        # 导入过本地模块时回收：复用的进程会一直使用旧代码，看不到之后对该文件的修改
+        dirty = dirty or _imported_local_module(sys.modules.keys() - base_modules, installed)
+
+        os.chdir(cwd)
+        if os.environ != base_environ:
+            os.environ.clear()
+            os.environ.update(base_environ)
+        sys.path[:] = base_path
+
+        reply = '{"exit": %d, "dirty": %s}\n' % (exit_code, "true" if dirty else "false")
+        proto_out.write(reply.encode("ascii"))
+        proto_out.flush()
+
+
+if __name__ == "__main__":
+    _worker_main(sys.argv[1:])
@@ -74,12 +74,10 @@ class RetrieveNode(AsyncNode):
         """将检索结果注入上下文"""
         if exec_res:
             # 有相关记忆
-            memory_text = []
-            for item, similarity in exec_res:
-                content = item.get("content", "")
-                memory_text.append(f"[Similarity: {similarity:.2f}] {content}")
-
-            shared["retrieved_memory"] = "\n".join(memory_text)
+            shared["retrieved_memory"] = "\n".join(
+                f"[Similarity: {similarity:.2f}] {item.get('content', '')}"
+                for item, similarity in exec_res
+            )
             print(f"[Memory] Retrieved {len(exec_res)} relevant memories")
         else:
             shared["retrieved_memory"] = None
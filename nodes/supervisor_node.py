@@ -10,17 +10,30 @@ SupervisorNode - 答案质量监督节点 (含 Manus-style 计划完成度检查
 """
 
 import re
+import asyncio
 from pocketflow import AsyncNode
 
 from .base import Action, SUPERVISOR_MAX_RETRIES, REJECT_PATTERNS
 from .planning_utils import (
     get_plan_completion_status,
-    update_plan_phase,
-    append_to_progress,
-    record_error_in_plan,
+    update_plan_phases_async,
+    append_to_progress_async,
+    record_error_in_plan_async,
     archive_planning_files,
+    current_timestamp,
 )
 
+# 拒绝回复模式合并为单个预编译正则（各模式均以 ^ 锚定回复开头）
+_REJECT_RE = re.compile("|".join(f"(?:{pattern})" for pattern in REJECT_PATTERNS), re.IGNORECASE)
+
+# 错误标记 (仅检查明确的错误前缀，避免误判正常讨论错误的回答)
+_ERROR_MARKERS = ["[error]", "[错误]", "error:", "错误:", "failed:", "失败:"]
+_ERROR_MARKER_RE = re.compile("|".join(map(re.escape, _ERROR_MARKERS)), re.IGNORECASE)
+
+# 不完整标记 (不包含 "..." 避免误判，只检查明确的未完成标记)
+_INCOMPLETE_MARKERS = ["待续", "to be continued", "未完", "[未完]"]
+_INCOMPLETE_MARKER_RE = re.compile("|".join(map(re.escape, _INCOMPLETE_MARKERS)), re.IGNORECASE)
+
 
 class SupervisorNode(AsyncNode):
     """
@@ -90,21 +103,15 @@ class SupervisorNode(AsyncNode):
 
         # 检查2: 拒绝模式检测（使用正则表达式，更精确）
         # 只在短回复时检测，避免误判详细回答中包含的道歉词
-        if len(answer) < 120:
-            answer_start = answer[:200].lower().strip()
-            for pattern in REJECT_PATTERNS:
-                if re.search(pattern, answer_start, re.IGNORECASE):
-                    issues.append("答案可能是拒绝回复")
-                    break
-
-        # 检查3: 错误标记 (仅检查明确的错误前缀，避免误判正常讨论错误的回答)
-        error_patterns = ["[error]", "[错误]", "error:", "错误:", "failed:", "失败:"]
-        if any(pattern in answer.lower() for pattern in error_patterns):
+        if len(answer) < 120 and _REJECT_RE.search(answer[:200].strip()):
+            issues.append("答案可能是拒绝回复")
+
+        # 检查3: 错误标记（预编译正则忽略大小写，无需 lower() 复制答案）
+        if _ERROR_MARKER_RE.search(answer):
             issues.append("答案包含错误标记")
 
-        # 检查4: 不完整标记 (移除 "..." 避免误判，只检查明确的未完成标记)
-        incomplete_markers = ["待续", "to be continued", "未完", "[未完]"]
-        if any(marker in answer.lower() for marker in incomplete_markers):
+        # 检查4: 不完整标记
+        if _INCOMPLETE_MARKER_RE.search(answer):
             issues.append("答案可能不完整")
 
         # ========================================
@@ -155,16 +162,18 @@ class SupervisorNode(AsyncNode):
             # Manus-style: 更新计划完成状态
             # ========================================
             if has_plan:
-                # 标记 Phase 3 (Synthesis) 和 Phase 4 (Verification) 完成
-                update_plan_phase(2, completed=True)  # 分析完成
-                update_plan_phase(3, completed=True)  # 综合完成
-                update_plan_phase(4, completed=True)  # 验证完成
-
-                # 记录最终进度
-                append_to_progress(
-                    action_type="Task Completed",
-                    description="Answer approved by Supervisor",
-                    result="All phases completed"
+                # 标记 Phase 2/3/4 完成（一次读写计划文件），同时记录最终进度（不同文件，可并行）
+                await asyncio.gather(
+                    update_plan_phases_async([
+                        (2, True),  # 分析完成
+                        (3, True),  # 综合完成
+                        (4, True),  # 验证完成
+                    ]),
+                    append_to_progress_async(
+                        action_type="Task Completed",
+                        description="Answer approved by Supervisor",
+                        result="All phases completed"
+                    ),
                 )
 
                 # 显示最终计划状态
@@ -173,20 +182,23 @@ class SupervisorNode(AsyncNode):
 
                 # 归档规划文件（保留历史记录）
                 task = shared.get("current_task", "")
-                archive_planning_files(task)
+                await asyncio.to_thread(archive_planning_files, task)
 
-            # 重置重试计数
+            # 重置重试计数和拒绝反馈
             shared["supervisor_retry_count"] = 0
+            shared["supervisor_feedback"] = None
             return Action.EMBED
         else:
             print(f"   [Supervisor] Rejected: {reason}")
 
             # Manus-style: 记录拒绝到计划文件
             if has_plan:
-                record_error_in_plan(f"Answer rejected: {reason}")
-                append_to_progress(
+                timestamp = current_timestamp()
+                await record_error_in_plan_async(f"Answer rejected: {reason}", timestamp=timestamp)
+                await append_to_progress_async(
                     action_type="Rejection",
-                    description=f"Answer rejected by Supervisor: {reason}"
+                    description=f"Answer rejected by Supervisor: {reason}",
+                    timestamp=timestamp
                 )
 
             # 增加重试计数
@@ -199,13 +211,7 @@ class SupervisorNode(AsyncNode):
             if messages and messages[-1]["role"] == "assistant":
                 messages.pop()
 
-            # 在上下文中添加拒绝原因（先移除之前的反馈，避免累积）
-            context = shared.get("context", "")
-            supervisor_marker = "\n\n[Supervisor] Previous answer rejected:"
-            # 移除之前的 Supervisor 反馈，只保留最新一条
-            if supervisor_marker in context:
-                context = context[:context.rfind(supervisor_marker)]
-            supervisor_feedback = f"{supervisor_marker} {reason}"
-            shared["context"] = context + supervisor_feedback
+            # 记录拒绝原因（单独保存、覆盖之前的反馈，生成提示词时附加到上下文末尾）
+            shared["supervisor_feedback"] = reason
 
             return Action.DECIDE
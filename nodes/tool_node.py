@@ -8,49 +8,58 @@ ToolNode - 工具执行节点 (含 Manus-style 2-动作规则)
 - 记录进度到 progress.md
 """
 
-import subprocess
+import asyncio
+import json
 import sys
 import os
 from datetime import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 from pocketflow import AsyncNode
 
-from memory import get_embedding, get_memory_index
+from memory import get_embedding_async, get_memory_index
 
 from .base import (
     Action,
+    append_context,
     CITY_TIMEZONE_MAP,
     MAX_TOOL_RESULT_LENGTH,
     MEMORY_DEDUP_THRESHOLD,
 )
 from .planning_utils import (
     FINDINGS_UPDATE_INTERVAL,
-    update_plan_phase,
-    append_to_findings,
-    append_to_progress,
-    record_error_in_plan,
+    update_plan_phases_async,
+    append_to_findings_async,
+    append_to_progress_async,
+    record_error_in_plan_async,
     get_smart_implications,
+    current_timestamp,
 )
+from .python_worker import PythonWorkerPool, PythonWorkerError, kill_process_tree
 
 # 导入日志系统
 from logging_config import log_tool_call, log_tool_result, log_error
 
+# 规则引擎缺失时不注入行为规则，不影响主流程
+try:
+    from rules_engine import load_rules
+except ImportError:
+    def load_rules() -> str:
+        return ""
+
 
 # ============================================================================
 # 内置代码执行工具配置
 # ============================================================================
 
-# 项目虚拟环境的 Python 路径
-PROJECT_PYTHON = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-    ".venv", "Scripts", "python.exe"
-)
+# 项目根目录（代码/命令执行的工作目录）
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 项目虚拟环境的 Python 路径（导入时解析一次）
+PROJECT_PYTHON = os.path.join(PROJECT_ROOT, ".venv", "Scripts", "python.exe")
 # 如果 Windows 路径不存在，尝试 Linux/Mac 路径
 if not os.path.exists(PROJECT_PYTHON):
-    PROJECT_PYTHON = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        ".venv", "bin", "python"
-    )
+    PROJECT_PYTHON = os.path.join(PROJECT_ROOT, ".venv", "bin", "python")
 # 如果还是不存在，使用系统 Python
 if not os.path.exists(PROJECT_PYTHON):
     PROJECT_PYTHON = sys.executable
@@ -58,6 +67,171 @@ if not os.path.exists(PROJECT_PYTHON):
 # 代码执行超时（秒）
 CODE_EXECUTION_TIMEOUT = 120
 
+# 子进程每个输出流最多读取的字节数（超出后终止子进程，避免失控输出耗尽内存）
+# 按 UTF-8 最长 4 字节/字符换算，保证截断前至少有 MAX_TOOL_RESULT_LENGTH 个字符可用
+OUTPUT_BYTE_LIMIT = MAX_TOOL_RESULT_LENGTH * 4
+
+# execute_python 使用常驻工作进程执行（省去每次启动解释器和导入库的开销）
+PYTHON_WORKER_ENABLED = True
+PYTHON_WORKER_POOL_SIZE = 2       # 最多同时执行的代码数
+PYTHON_WORKER_MAX_TASKS = 50      # 每个工作进程执行多少次后回收
+PYTHON_WORKER_PRELOAD = ("numpy", "pandas")  # 工作进程启动时预导入（未安装则跳过）
+
+_PYTHON_WORKER_POOL = PythonWorkerPool(
+    PROJECT_PYTHON,
+    PROJECT_ROOT,
+    size=PYTHON_WORKER_POOL_SIZE,
+    max_tasks=PYTHON_WORKER_MAX_TASKS,
+    preload=PYTHON_WORKER_PRELOAD,
+)
+
+
+async def shutdown_python_workers_async():
+    """终止空闲的 Python 工作进程（会话结束时调用）"""
+    await _PYTHON_WORKER_POOL.close_async()
+
+
+async def _run_python_async(code: str) -> str:
+    """
+    执行 Python 代码并格式化输出
+
+    优先使用常驻工作进程；工作进程不可用时回退为单次子进程。
+
+    Raises:
+        asyncio.TimeoutError: 超过 CODE_EXECUTION_TIMEOUT
+    """
+    if PYTHON_WORKER_ENABLED:
+        try:
+            stdout, stderr, returncode, terminated = await _PYTHON_WORKER_POOL.run_async(
+                code, CODE_EXECUTION_TIMEOUT, output_limit=OUTPUT_BYTE_LIMIT
+            )
+            return _format_process_output(stdout, stderr, returncode, terminated=terminated)
+        except PythonWorkerError as e:
+            print(f"   [WARN] Python worker unavailable, falling back to subprocess: {e}")
+    return await _run_process_async(PROJECT_PYTHON, "-c", code)
+
+
+async def _run_process_async(*args: str, shell: bool = False) -> str:
+    """
+    异步运行子进程并格式化输出（不阻塞事件循环）
+
+    Args:
+        args: 可执行文件及参数；shell=True 时为单条 shell 命令
+        shell: 是否通过 shell 执行
+
+    Raises:
+        asyncio.TimeoutError: 超过 CODE_EXECUTION_TIMEOUT（子进程已被终止）
+    """
+    kwargs = {
+        "stdout": asyncio.subprocess.PIPE,
+        "stderr": asyncio.subprocess.PIPE,
+        "cwd": PROJECT_ROOT,
+    }
+    if os.name == "posix":
+        # 独立进程组：超时时连同 shell 派生的子进程一起终止
+        kwargs["start_new_session"] = True
+
+    if shell:
+        proc = await asyncio.create_subprocess_shell(args[0], **kwargs)
+    else:
+        proc = await asyncio.create_subprocess_exec(*args, **kwargs)
+
+    overflow = False
+
+    async def read_limited(stream) -> bytes:
+        """读取输出流，超过 OUTPUT_BYTE_LIMIT 时停止读取并终止子进程"""
+        nonlocal overflow
+        buf = bytearray()
+        while chunk := await stream.read(65536):
+            buf += chunk
+            if len(buf) > OUTPUT_BYTE_LIMIT:
+                overflow = True
+                kill_process_tree(proc)
+                break
+        return bytes(buf)
+
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            asyncio.gather(read_limited(proc.stdout), read_limited(proc.stderr)),
+            timeout=CODE_EXECUTION_TIMEOUT,
+        )
+        await proc.wait()
+    except asyncio.TimeoutError:
+        # 终止并回收子进程，避免僵尸进程
+        kill_process_tree(proc)
+        await proc.wait()
+        raise
+
+    return _format_process_output(stdout, stderr, proc.returncode, terminated=overflow)
+
+
+# 截断后缀（预先构造，避免每次调用重新格式化）
+_TRUNCATED_SUFFIX = "\n... (truncated)"
+_ELLIPSIS_SUFFIX = "..."
+
+
+def _cap(text: str, limit: int, suffix: str = "") -> str:
+    """截断到 limit 个字符并追加 suffix；未超出时原样返回（不复制）"""
+    return text if len(text) <= limit else text[:limit] + suffix
+
+
+def _stringify_result(result) -> str:
+    """将 MCP 工具结果转为文本（dict/list 输出紧凑 JSON，bytes 按 UTF-8 解码）"""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, (dict, list)):
+        try:
+            return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return str(result)
+    if isinstance(result, bytes):
+        return result.decode("utf-8", errors="replace")
+    return str(result)
+
+
+def _format_process_output(stdout: bytes, stderr: bytes, returncode: int, terminated: bool = False) -> str:
+    """
+    合并子进程的 stdout、stderr 和非零退出码
+
+    每个输出流超过 OUTPUT_BYTE_LIMIT 的部分被丢弃；terminated 表示子进程因输出过多被终止。
+    """
+    truncated = len(stdout) > OUTPUT_BYTE_LIMIT or len(stderr) > OUTPUT_BYTE_LIMIT
+    stdout = stdout[:OUTPUT_BYTE_LIMIT]
+    stderr = stderr[:OUTPUT_BYTE_LIMIT]
+
+    output_parts = []
+    if stdout:
+        output_parts.append(_decode_output(stdout))
+    if stderr:
+        output_parts.append(f"[STDERR] {_decode_output(stderr)}")
+    if terminated:
+        output_parts.append(f"[Output exceeded {OUTPUT_BYTE_LIMIT} bytes, process terminated]")
+    else:
+        if truncated:
+            output_parts.append(f"[Output truncated at {OUTPUT_BYTE_LIMIT} bytes]")
+        if returncode != 0:
+            output_parts.append(f"[Exit Code: {returncode}]")
+
+    return "\n".join(output_parts) if output_parts else "(No output)"
+
+
+def _decode_output(data: bytes) -> str:
+    """按 UTF-8 解码子进程输出（与文本模式一致：替换非法字节并统一换行符）"""
+    return data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+@lru_cache(maxsize=64)
+def _get_timezone(tz_name: str) -> ZoneInfo:
+    """按名称获取时区（最近使用的时区加载后缓存，名称来自模型参数故限制容量；无效名称抛出异常，不缓存）"""
+    return ZoneInfo(tz_name)
+
+
+@lru_cache(maxsize=256)
+def _get_city_timezone(city: str) -> ZoneInfo | None:
+    """按城市名获取时区（CITY_TIMEZONE_MAP 的键均为小写，一次查找；未知城市返回 None）"""
+    tz_name = CITY_TIMEZONE_MAP.get(city.lower())
+    return _get_timezone(tz_name) if tz_name else None
+
 
 class ToolNode(AsyncNode):
     """
@@ -74,9 +248,9 @@ class ToolNode(AsyncNode):
         """获取工具调用信息（集成行为规则）"""
         # 加载全局行为规则（第一步实施）
         try:
-            from rules_engine import load_rules
+            # 规则文件未变化时 load_rules 返回同一个缓存对象，无需重新写入 shared
             rules = load_rules()
-            if rules:
+            if rules and rules is not shared.get("behavior_rules"):
                 # 将规则存入 shared，供后续节点使用
                 shared["behavior_rules"] = rules
                 # 首次加载时打印确认信息
@@ -117,248 +291,26 @@ class ToolNode(AsyncNode):
         has_plan = shared.get("has_plan", False)
 
         # ========================================
-        # 内置工具处理（不需要 MCP）
+        # 内置工具处理（不需要 MCP，按工具名直接分派）
         # ========================================
-        if tool_name == "get_current_time":
-            # 内置时钟工具：返回当前准确时间（支持多时区）
-            city = tool_params.get("city", "")
-            tz_name = tool_params.get("timezone", "")
-            location_info = ""
-
-            # 确定时区
-            target_tz = None
-            if city:
-                # 从城市映射查找时区
-                city_lower = city.lower()
-                tz_name = CITY_TIMEZONE_MAP.get(city) or CITY_TIMEZONE_MAP.get(city_lower)
-                if tz_name:
-                    try:
-                        target_tz = ZoneInfo(tz_name)
-                        location_info = f" [{city}]"
-                    except Exception:
-                        location_info = f" [Unknown city: {city}, using local time]"
-                else:
-                    location_info = f" [Unknown city: {city}, using local time]"
-            elif tz_name:
-                # 直接使用时区名称
-                try:
-                    target_tz = ZoneInfo(tz_name)
-                    location_info = f" [{tz_name}]"
-                except Exception:
-                    location_info = f" [Invalid timezone: {tz_name}, using local time]"
-
-            # 获取时间
-            if target_tz:
-                current_dt = datetime.now(target_tz)
-                result_str = current_dt.strftime("%Y-%m-%d %H:%M:%S (%A)") + location_info
-            else:
-                # 本地时间：附加系统时区信息，让 Agent 知道基准时区
-                current_dt = datetime.now().astimezone()  # 带时区的本地时间
-                utc_offset = current_dt.strftime("%z")  # 如 +0800
-                utc_offset_formatted = f"UTC{utc_offset[:3]}:{utc_offset[3:]}"  # 格式化为 UTC+08:00
-                result_str = current_dt.strftime("%Y-%m-%d %H:%M:%S (%A)") + f" [Local: {utc_offset_formatted}]"
-            print(f"   [OK] Built-in tool result: {result_str}")
-
-            # 添加到上下文
-            context = shared.get("context", "")
-            shared["context"] = context + f"\n\n### Tool Call: {tool_name} (Built-in)\nResult: {result_str}"
-
-            # Manus-style 进度记录
-            if has_plan:
-                append_to_progress(
-                    action_type="Built-in Tool",
-                    description=f"Called get_current_time{location_info}",
-                    result=result_str
-                )
-
-            return Action.DECIDE
-
-        # ========================================
-        # 内置工具: save_to_memory - 用户主动保存到长期记忆
-        # ========================================
-        if tool_name == "save_to_memory":
-            content = tool_params.get("content", "")
-            tag = tool_params.get("tag", "用户保存")
-
-            if not content:
-                result_str = "Error: content parameter is required"
-                print(f"   [ERROR] {result_str}")
-            else:
-                # 获取记忆索引
-                memory_index = shared.get("memory_index")
-                if not memory_index:
-                    memory_index = get_memory_index()
-                    shared["memory_index"] = memory_index
-
-                # 添加时间戳和标签
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-                memory_content = f"[{tag}] [{timestamp}]\n{content}"
-
-                # 生成嵌入并存储
-                embedding = get_embedding(memory_content)
-                idx, is_new = memory_index.add_or_update(
-                    embedding,
-                    {"content": memory_content, "tag": tag, "timestamp": timestamp},
-                    dedup_threshold=MEMORY_DEDUP_THRESHOLD
-                )
-
-                # 立即保存到文件
-                memory_index.save("memory_index.json")
-
-                if is_new:
-                    result_str = f"Successfully saved to long-term memory (index: {idx}, tag: {tag})"
-                else:
-                    result_str = f"Updated existing similar memory (index: {idx}, tag: {tag})"
-
-                print(f"   [OK] Built-in tool result: {result_str}")
-
-            # 记录工具结果到日志
-            log_tool_result(tool_name, True, result_str)
-
-            # 添加到上下文
-            context = shared.get("context", "")
-            shared["context"] = context + f"\n\n### Tool Call: {tool_name} (Built-in)\nResult: {result_str}"
-
-            # Manus-style 进度记录
-            if has_plan:
-                append_to_progress(
-                    action_type="Built-in Tool",
-                    description=f"Saved to memory with tag: {tag}",
-                    result=result_str
-                )
-
-            return Action.DECIDE
-
-        # ========================================
-        # 内置工具: execute_python - 本地执行 Python 代码
-        # 使用项目虚拟环境，可访问 akshare 等已安装库
-        # ========================================
-        if tool_name == "execute_python":
-            code = tool_params.get("code", "")
-            if not code:
-                result_str = "Error: code parameter is required"
-                print(f"   [ERROR] {result_str}")
-            else:
-                try:
-                    # 使用项目虚拟环境的 Python 执行代码
-                    result = subprocess.run(
-                        [PROJECT_PYTHON, "-c", code],
-                        capture_output=True,
-                        text=True,
-                        timeout=CODE_EXECUTION_TIMEOUT,
-                        encoding='utf-8',
-                        errors='replace',
-                        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                    )
-
-                    output_parts = []
-                    if result.stdout:
-                        output_parts.append(result.stdout)
-                    if result.stderr:
-                        output_parts.append(f"[STDERR] {result.stderr}")
-                    if result.returncode != 0:
-                        output_parts.append(f"[Exit Code: {result.returncode}]")
-
-                    result_str = "\n".join(output_parts) if output_parts else "(No output)"
-
-                except subprocess.TimeoutExpired:
-                    result_str = f"[ERROR] Code execution timed out after {CODE_EXECUTION_TIMEOUT} seconds"
-                except Exception as e:
-                    result_str = f"[ERROR] {str(e)}"
-
-            # 记录工具结果到日志
-            log_tool_result(tool_name, True, result_str[:500] if len(result_str) > 500 else result_str)
-
-            # 截断过大的结果
-            if len(result_str) > MAX_TOOL_RESULT_LENGTH:
-                result_str = result_str[:MAX_TOOL_RESULT_LENGTH] + f"\n... (truncated)"
-
-            # 添加到上下文
-            context = shared.get("context", "")
-            shared["context"] = context + f"\n\n### Tool Call: {tool_name} (Built-in)\nCode:\n```python\n{code[:500]}{'...' if len(code) > 500 else ''}\n```\nResult:\n{result_str}"
-
-            # Manus-style 进度记录
-            if has_plan:
-                append_to_progress(
-                    action_type="Built-in Tool",
-                    description=f"Executed Python code",
-                    result=result_str[:200]
-                )
-
-            return Action.DECIDE
-
-        # ========================================
-        # 内置工具: execute_terminal - 本地执行终端命令
-        # 使用 subprocess 执行 shell 命令
-        # ========================================
-        if tool_name == "execute_terminal":
-            command = tool_params.get("command", "")
-            if not command:
-                result_str = "Error: command parameter is required"
-                print(f"   [ERROR] {result_str}")
-            else:
-                try:
-                    result = subprocess.run(
-                        command,
-                        shell=True,
-                        capture_output=True,
-                        text=True,
-                        timeout=CODE_EXECUTION_TIMEOUT,
-                        encoding='utf-8',
-                        errors='replace',
-                        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                    )
-
-                    output_parts = []
-                    if result.stdout:
-                        output_parts.append(result.stdout)
-                    if result.stderr:
-                        output_parts.append(f"[STDERR] {result.stderr}")
-                    if result.returncode != 0:
-                        output_parts.append(f"[Exit Code: {result.returncode}]")
-
-                    result_str = "\n".join(output_parts) if output_parts else "(No output)"
-
-                except subprocess.TimeoutExpired:
-                    result_str = f"[ERROR] Command timed out after {CODE_EXECUTION_TIMEOUT} seconds"
-                except Exception as e:
-                    result_str = f"[ERROR] {str(e)}"
-
-            # 记录工具结果到日志
-            log_tool_result(tool_name, True, result_str[:500] if len(result_str) > 500 else result_str)
-
-            # 截断过大的结果
-            if len(result_str) > MAX_TOOL_RESULT_LENGTH:
-                result_str = result_str[:MAX_TOOL_RESULT_LENGTH] + f"\n... (truncated)"
-
-            # 添加到上下文
-            context = shared.get("context", "")
-            shared["context"] = context + f"\n\n### Tool Call: {tool_name} (Built-in)\nCommand: {command}\nResult:\n{result_str}"
-
-            # Manus-style 进度记录
-            if has_plan:
-                append_to_progress(
-                    action_type="Built-in Tool",
-                    description=f"Executed: {command[:50]}",
-                    result=result_str[:200]
-                )
-
-            return Action.DECIDE
+        handler = self._BUILTIN_HANDLERS.get(tool_name)
+        if handler:
+            return await handler(self, shared, tool_params, has_plan)
 
         # ========================================
         # MCP 工具处理
         # ========================================
         manager = shared.get("mcp_manager")
         if not manager:
-            shared["context"] += "\n\n[Tool call failed: MCP Manager not initialized]"
+            append_context(shared, "\n\n[Tool call failed: MCP Manager not initialized]")
             # 记录错误到计划文件
             if shared.get("has_plan"):
-                record_error_in_plan("MCP Manager not initialized")
+                await record_error_in_plan_async("MCP Manager not initialized")
             return Action.DECIDE
 
         try:
             result = await manager.call_tool_async(tool_name, tool_params)
-            result_str = str(result)
+            result_str = _stringify_result(result)
 
             # ========================================
             # 截断过大的工具结果，防止上下文爆炸
@@ -368,14 +320,13 @@ class ToolNode(AsyncNode):
                 result_str = result_str[:MAX_TOOL_RESULT_LENGTH] + f"\n\n... (truncated {original_length - MAX_TOOL_RESULT_LENGTH} chars)"
                 print(f"   [WARN] Tool result truncated: {original_length} -> {MAX_TOOL_RESULT_LENGTH} chars")
 
-            print(f"   [OK] Tool result: {result_str[:200]}..." if len(result_str) > 200 else f"   [OK] Tool result: {result_str}")
+            print(f"   [OK] Tool result: {_cap(result_str, 200, _ELLIPSIS_SUFFIX)}")
 
             # 记录工具结果到日志（使用预览）
-            log_tool_result(tool_name, True, result_str[:500] if len(result_str) > 500 else result_str)
+            log_tool_result(tool_name, True, _cap(result_str, 500))
 
             # 添加到上下文（使用截断后的结果）
-            context = shared.get("context", "")
-            shared["context"] = context + f"\n\n### Tool Call: {tool_name}\nParams: {tool_params}\nResult:\n{result_str}"
+            append_context(shared, f"\n\n### Tool Call: {tool_name}\nParams: {tool_params}\nResult:\n{result_str}")
 
             # ========================================
             # Manus-style: 2-动作规则 + 进度记录
@@ -385,28 +336,33 @@ class ToolNode(AsyncNode):
                 tool_call_count = shared.get("tool_call_count", 0) + 1
                 shared["tool_call_count"] = tool_call_count
 
+                # 同一步骤的进度和发现共享一个时间戳
+                timestamp = current_timestamp()
+
                 # 记录进度
-                append_to_progress(
+                await append_to_progress_async(
                     action_type="Tool Call",
                     description=f"Called {tool_name}",
                     tool_name=tool_name,
-                    result=result_str[:200]
+                    result=result_str[:200],
+                    timestamp=timestamp
                 )
 
                 # 2-动作规则：每 N 次工具调用后更新 findings
                 if tool_call_count % FINDINGS_UPDATE_INTERVAL == 0:
                     finding_title = f"Tool Result: {tool_name}"
                     smart_impl = get_smart_implications(tool_name, result_str)
-                    append_to_findings(
+                    await append_to_findings_async(
                         title=finding_title,
                         source=f"Tool: {tool_name}",
                         finding=result_str[:500],
-                        implications=smart_impl
+                        implications=smart_impl,
+                        timestamp=timestamp
                     )
                     print(f"   [Planning] Updated findings (2-action rule)")
 
                 # 更新阶段状态（工具调用 = Phase 1 信息收集）
-                update_plan_phase(1, completed=False)
+                await update_plan_phases_async([(1, False)])
 
         except Exception as e:
             error_msg = str(e)
@@ -416,15 +372,200 @@ class ToolNode(AsyncNode):
             log_tool_result(tool_name, False, error_msg)
             log_error(f"Tool call failed: {tool_name} - {error_msg}", exc_info=False)
 
-            shared["context"] += f"\n\n[Tool call failed: {tool_name} - {error_msg}]"
+            append_context(shared, f"\n\n[Tool call failed: {tool_name} - {error_msg}]")
 
             # Manus-style: 记录错误到计划文件（避免重复失败）
             if has_plan:
-                record_error_in_plan(f"Tool {tool_name} failed: {error_msg[:100]}")
-                append_to_progress(
+                timestamp = current_timestamp()
+                await record_error_in_plan_async(f"Tool {tool_name} failed: {error_msg[:100]}", timestamp=timestamp)
+                await append_to_progress_async(
                     action_type="Error",
                     description=f"Tool call failed: {tool_name}",
-                    result=error_msg[:100]
+                    result=error_msg[:100],
+                    timestamp=timestamp
                 )
 
         return Action.DECIDE
+
+    # ========================================
+    # 内置工具
+    # ========================================
+
+    async def _get_current_time_async(self, shared, tool_params, has_plan):
+        """内置时钟工具：返回当前准确时间（支持多时区）"""
+        city = tool_params.get("city", "")
+        tz_name = tool_params.get("timezone", "")
+        location_info = ""
+
+        # 确定时区
+        target_tz = None
+        if city:
+            # 从城市映射查找时区
+            try:
+                target_tz = _get_city_timezone(city)
+            except Exception:
+                target_tz = None
+            if target_tz:
+                location_info = f" [{city}]"
+            else:
+                location_info = f" [Unknown city: {city}, using local time]"
+        elif tz_name:
+            # 直接使用时区名称
+            try:
+                target_tz = _get_timezone(tz_name)
+                location_info = f" [{tz_name}]"
+            except Exception:
+                location_info = f" [Invalid timezone: {tz_name}, using local time]"
+
+        # 获取时间
+        if target_tz:
+            current_dt = datetime.now(target_tz)
+            result_str = current_dt.strftime("%Y-%m-%d %H:%M:%S (%A)") + location_info
+        else:
+            # 本地时间：附加系统时区信息，让 Agent 知道基准时区
+            current_dt = datetime.now().astimezone()  # 带时区的本地时间
+            utc_offset = current_dt.strftime("%z")  # 如 +0800
+            utc_offset_formatted = f"UTC{utc_offset[:3]}:{utc_offset[3:]}"  # 格式化为 UTC+08:00
+            result_str = current_dt.strftime("%Y-%m-%d %H:%M:%S (%A)") + f" [Local: {utc_offset_formatted}]"
+        print(f"   [OK] Built-in tool result: {result_str}")
+
+        # 添加到上下文
+        append_context(shared, f"\n\n### Tool Call: get_current_time (Built-in)\nResult: {result_str}")
+
+        # Manus-style 进度记录
+        if has_plan:
+            await append_to_progress_async(
+                action_type="Built-in Tool",
+                description=f"Called get_current_time{location_info}",
+                result=result_str
+            )
+
+        return Action.DECIDE
+
+    async def _save_to_memory_async(self, shared, tool_params, has_plan):
+        """内置工具：用户主动保存到长期记忆"""
+        content = tool_params.get("content", "")
+        tag = tool_params.get("tag", "用户保存")
+
+        if not content:
+            result_str = "Error: content parameter is required"
+            print(f"   [ERROR] {result_str}")
+        else:
+            # 获取记忆索引
+            memory_index = shared.get("memory_index")
+            if memory_index is None:
+                memory_index = get_memory_index()
+                shared["memory_index"] = memory_index
+
+            # 添加时间戳和标签
+            timestamp = current_timestamp()
+            memory_content = f"[{tag}] [{timestamp}]\n{content}"
+
+            # 生成嵌入并存储（模型推理在线程池中执行）
+            embedding = await get_embedding_async(memory_content)
+            idx, is_new = memory_index.add_or_update(
+                embedding,
+                {"content": memory_content, "tag": tag, "timestamp": timestamp},
+                dedup_threshold=MEMORY_DEDUP_THRESHOLD
+            )
+
+            # 立即保存到文件（后台线程写入，不等待完成）
+            memory_index.save_in_background("memory_index.json")
+
+            if is_new:
+                result_str = f"Successfully saved to long-term memory (index: {idx}, tag: {tag})"
+            else:
+                result_str = f"Updated existing similar memory (index: {idx}, tag: {tag})"
+
+            print(f"   [OK] Built-in tool result: {result_str}")
+
+        # 记录工具结果到日志
+        log_tool_result("save_to_memory", True, result_str)
+
+        # 添加到上下文
+        append_context(shared, f"\n\n### Tool Call: save_to_memory (Built-in)\nResult: {result_str}")
+
+        # Manus-style 进度记录
+        if has_plan:
+            await append_to_progress_async(
+                action_type="Built-in Tool",
+                description=f"Saved to memory with tag: {tag}",
+                result=result_str
+            )
+
+        return Action.DECIDE
+
+    async def _execute_python_async(self, shared, tool_params, has_plan):
+        """内置工具：使用项目虚拟环境本地执行 Python 代码"""
+        code = tool_params.get("code", "")
+        if not code:
+            result_str = "Error: code parameter is required"
+            print(f"   [ERROR] {result_str}")
+        else:
+            try:
+                # 使用项目虚拟环境的 Python 执行代码
+                result_str = await _run_python_async(code)
+            except asyncio.TimeoutError:
+                result_str = f"[ERROR] Code execution timed out after {CODE_EXECUTION_TIMEOUT} seconds"
+            except Exception as e:
+                result_str = f"[ERROR] {str(e)}"
+
+        # 记录工具结果到日志
+        log_tool_result("execute_python", True, _cap(result_str, 500))
+
+        # 截断过大的结果
+        result_str = _cap(result_str, MAX_TOOL_RESULT_LENGTH, _TRUNCATED_SUFFIX)
+
+        # 添加到上下文
+        append_context(shared, f"\n\n### Tool Call: execute_python (Built-in)\nCode:\n```python\n{_cap(code, 500, _ELLIPSIS_SUFFIX)}\n```\nResult:\n{result_str}")
+
+        # Manus-style 进度记录
+        if has_plan:
+            await append_to_progress_async(
+                action_type="Built-in Tool",
+                description=f"Executed Python code",
+                result=result_str[:200]
+            )
+
+        return Action.DECIDE
+
+    async def _execute_terminal_async(self, shared, tool_params, has_plan):
+        """内置工具：使用异步子进程本地执行终端命令"""
+        command = tool_params.get("command", "")
+        if not command:
+            result_str = "Error: command parameter is required"
+            print(f"   [ERROR] {result_str}")
+        else:
+            try:
+                result_str = await _run_process_async(command, shell=True)
+            except asyncio.TimeoutError:
+                result_str = f"[ERROR] Command timed out after {CODE_EXECUTION_TIMEOUT} seconds"
+            except Exception as e:
+                result_str = f"[ERROR] {str(e)}"
+
+        # 记录工具结果到日志
+        log_tool_result("execute_terminal", True, _cap(result_str, 500))
+
+        # 截断过大的结果
+        result_str = _cap(result_str, MAX_TOOL_RESULT_LENGTH, _TRUNCATED_SUFFIX)
+
+        # 添加到上下文
+        append_context(shared, f"\n\n### Tool Call: execute_terminal (Built-in)\nCommand: {command}\nResult:\n{result_str}")
+
+        # Manus-style 进度记录
+        if has_plan:
+            await append_to_progress_async(
+                action_type="Built-in Tool",
+                description=f"Executed: {command[:50]}",
+                result=result_str[:200]
+            )
+
+        return Action.DECIDE
+
+    # 工具名 -> 处理方法（在 post_async 中一次字典查找完成分派）
+    _BUILTIN_HANDLERS = {
+        "get_current_time": _get_current_time_async,
+        "save_to_memory": _save_to_memory_async,
+        "execute_python": _execute_python_async,
+        "execute_terminal": _execute_terminal_async,
+    }
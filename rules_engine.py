@@ -19,6 +19,9 @@ RULES_DIR = Path(__file__).parent / "rules"
 # 是否启用规则系统（可用于快速开关）
 ENABLE_RULES_SYSTEM = True
 
+# 规则文件不存在时的缓存标记
+_RULES_FILE_MISSING = object()
+
 
 class RulesEngine:
     """
@@ -35,14 +38,37 @@ class RulesEngine:
     - 规则优先级
     """
 
+    # 规则标题框（固定不变，类定义时拼接一次）
+    _RULES_HEADER = "\n\n".join([
+        "=" * 70,
+        "📋 BEHAVIOR RULES (行为准则)",
+        "=" * 70,
+        "",
+        "",
+    ])
+    _RULES_FOOTER = "\n\n".join([
+        "",
+        "",
+        "=" * 70,
+        "⚠️  请严格遵守以上规则，确保行为一致性和质量",
+        "=" * 70,
+    ])
+
     def __init__(self):
         self._global_rules_cache: Optional[str] = None
+        # 缓存对应的文件状态 (mtime_ns, size)；文件不存在时为 _RULES_FILE_MISSING
+        self._global_rules_stat: Optional[object] = None
+        # 注入 prompt 时使用的前缀（规则 + 空行），随缓存一起更新
+        self._injection_prefix: str = ""
         self._enabled = ENABLE_RULES_SYSTEM
 
     def load_global_rules(self) -> str:
         """
         加载全局规则文件（带缓存）
 
+        每次调用只 stat 一次文件：修改时间和大小未变时直接返回缓存，
+        文件被修改后自动重新读取。
+
         Returns:
             格式化的规则文本，如果加载失败或禁用则返回空字符串
         """
@@ -50,21 +76,28 @@ class RulesEngine:
         if not self._enabled:
             return ""
 
-        # 检查缓存
-        if self._global_rules_cache is not None:
-            return self._global_rules_cache
-
         # 构建文件路径
         file_path = RULES_DIR / "global.md"
 
-        # 检查文件是否存在
-        if not file_path.exists():
-            print(f"[WARN] Global rules file not found: {file_path}")
-            print(f"[INFO] Rules system disabled. Create {file_path} to enable.")
-            self._global_rules_cache = ""
+        # 检查文件是否存在（不存在时只提示一次，直到文件出现后又被删除）
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            if self._global_rules_stat is not _RULES_FILE_MISSING:
+                print(f"[WARN] Global rules file not found: {file_path}")
+                print(f"[INFO] Rules system disabled. Create {file_path} to enable.")
+                self._global_rules_stat = _RULES_FILE_MISSING
+                self._global_rules_cache = ""
+                self._injection_prefix = ""
             return ""
 
-        # 读取文件
+        # 检查缓存（文件未修改）
+        file_key = (stat.st_mtime_ns, stat.st_size)
+        if self._global_rules_cache is not None and self._global_rules_stat == file_key:
+            return self._global_rules_cache
+
+        # 读取文件（读取失败时同样按文件状态缓存，文件修改后再重试）
+        self._global_rules_stat = file_key
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read().strip()
@@ -74,6 +107,7 @@ class RulesEngine:
 
             # 缓存
             self._global_rules_cache = formatted
+            self._injection_prefix = f"{formatted}\n\n" if formatted else ""
             print(f"[OK] Global rules loaded: {len(content)} chars")
 
             return formatted
@@ -81,6 +115,7 @@ class RulesEngine:
         except Exception as e:
             print(f"[ERROR] Failed to load global rules: {e}")
             self._global_rules_cache = ""
+            self._injection_prefix = ""
             return ""
 
     def _format_rules(self, content: str) -> str:
@@ -93,19 +128,7 @@ class RulesEngine:
         Returns:
             格式化后的规则文本
         """
-        formatted = "\n\n".join([
-            "=" * 70,
-            "📋 BEHAVIOR RULES (行为准则)",
-            "=" * 70,
-            "",
-            content,
-            "",
-            "=" * 70,
-            "⚠️  请严格遵守以上规则，确保行为一致性和质量",
-            "=" * 70,
-        ])
-
-        return formatted
+        return f"{self._RULES_HEADER}{content}{self._RULES_FOOTER}"
 
     def inject_rules_to_prompt(self, prompt: str, include_rules: bool = True) -> str:
         """
@@ -121,18 +144,17 @@ class RulesEngine:
         if not include_rules or not self._enabled:
             return prompt
 
-        # 加载规则
-        rules = self.load_global_rules()
-
-        if not rules:
+        # 加载规则（同时刷新注入前缀）
+        if not self.load_global_rules():
             return prompt
 
         # 在 prompt 前注入规则
-        return f"{rules}\n\n{prompt}"
+        return self._injection_prefix + prompt
 
     def reload(self):
         """清除缓存，重新加载规则（用于开发调试）"""
         self._global_rules_cache = None
+        self._global_rules_stat = None
         print("[INFO] Rules cache cleared. Will reload on next access.")
 
     def disable(self):
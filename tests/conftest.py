@@ -12,6 +12,24 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 
+def pytest_configure(config):
+    """注册自定义标记（需要下载/加载 Embedding 模型的测试可用 -m "not slow" 跳过）"""
+    config.addinivalue_line("markers", "slow: 需要加载 Embedding 模型的慢速测试")
+
+
+@pytest.fixture(autouse=True)
+def clear_embedding_cache(tmp_path, monkeypatch):
+    """每个测试前清空嵌入缓存，磁盘缓存指向临时目录，避免不同测试的 mock 模型结果相互影响"""
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite"))
+    memory = sys.modules.get("memory")
+    if memory is not None:
+        memory.clear_embedding_cache()
+    yield
+    memory = sys.modules.get("memory")
+    if memory is not None:
+        memory.clear_embedding_cache()
+
+
 @pytest.fixture
 def sample_shared_store():
     """提供一个示例 shared store 用于节点测试"""
@@ -302,6 +302,18 @@ class TestResourceLeak:
         assert hasattr(logging_config, '_count_lines')
         assert callable(logging_config._count_lines)
 
+    @pytest.mark.parametrize("data", [b"", b"a", b"a\n", b"a\nb", b"a\r\nb\r\n", "中文\n日志".encode("utf-8")])
+    def test_count_lines_matches_line_iteration(self, tmp_path, data):
+        """测试 _count_lines 与逐行迭代的计数一致（含末尾无换行的情况）"""
+        import logging_config
+
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes(data)
+
+        with open(log_file, 'r', encoding='utf-8') as f:
+            expected = sum(1 for _ in f)
+        assert logging_config._count_lines(log_file) == expected
+
 
 # ============================================================================
 # 向后兼容性测试
@@ -130,3 +130,73 @@ class TestMCPManagerInstantiation:
         assert callable(manager.get_all_tools_async)
         assert callable(manager.call_tool_async)
         assert callable(manager.format_tools_for_prompt)
+
+
+class TestFormatToolsForPrompt:
+    """测试工具提示词格式化"""
+
+    def test_result_cached_until_tools_replaced(self):
+        """测试工具列表不变时复用结果，整体替换后重新生成"""
+        from mcp_client import MCPManager
+        from mcp_client.manager import Tool
+
+        manager = MCPManager("nonexistent_config.json")
+        schema = {"properties": {"city": {}}, "required": ["city"]}
+        manager.tools = {"weather": Tool("weather", "查询天气", schema, "srv")}
+
+        first = manager.format_tools_for_prompt()
+        assert "weather(city*): 查询天气" in first
+        assert manager.format_tools_for_prompt() is first
+
+        manager.tools = {"stock": Tool("stock", "查询股票", {}, "srv")}
+        second = manager.format_tools_for_prompt()
+        assert "stock(): 查询股票" in second
+        assert "weather" not in second
+
+        manager.tools["news"] = Tool("news", "新闻", {}, "srv")
+        assert "news" in manager.format_tools_for_prompt()
+
+
+class TestMCPToolsCache:
+    """测试工具列表磁盘缓存"""
+
+    def _make_manager(self, tmp_path):
+        import json
+        from mcp_client import MCPManager
+
+        config_path = tmp_path / "mcp.json"
+        config_path.write_text(json.dumps({
+            "mcpServers": {"weather-server": {"command": "python", "args": []}}
+        }), encoding="utf-8")
+        return MCPManager(str(config_path), cache_path=str(tmp_path / "_mcp_cache.json"))
+
+    def test_cache_round_trip(self, tmp_path):
+        """测试保存后可以从缓存恢复工具"""
+        from mcp_client import Tool
+
+        manager = self._make_manager(tmp_path)
+        tool = Tool(
+            name="weather_query",
+            description="查询天气信息",
+            input_schema={"type": "object", "properties": {"city": {"type": "string"}}},
+            server_name="weather-server"
+        )
+        manager._save_tools_cache([tool])
+
+        cached = manager._load_tools_cache()
+        assert cached == [tool]
+
+    def test_cache_invalidated_when_config_changes(self, tmp_path):
+        """测试 mcp.json 修改后缓存失效"""
+        import os
+        from mcp_client import Tool
+
+        manager = self._make_manager(tmp_path)
+        manager._save_tools_cache([
+            Tool(name="t", description="", input_schema={}, server_name="weather-server")
+        ])
+
+        stat = os.stat(manager.config_path)
+        os.utime(manager.config_path, (stat.st_atime, stat.st_mtime + 10))
+
+        assert manager._load_tools_cache() is None
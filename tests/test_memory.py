@@ -86,6 +86,76 @@ class TestSimpleVectorIndex:
         assert results[0][0]["content"] == "base"
         assert results[0][1] > 0.99  # 相似度应该很高
 
+    def test_search_ann_matches_exact(self, monkeypatch):
+        """测试 HNSW 近似搜索与精确搜索返回相同的最相似项"""
+        pytest.importorskip("usearch")
+        import memory
+        from memory import SimpleVectorIndex
+
+        index = SimpleVectorIndex(dimension=16)
+        rng = np.random.default_rng(0)
+        for i in range(50):
+            index.add(rng.random(16, dtype=np.float32), {"content": f"item_{i}"})
+        query = index.vectors[7] * 0.99
+
+        exact = index.search(query, k=1)
+        monkeypatch.setattr(memory, "ANN_INDEX_MIN_SIZE", 10)
+        approx = index.search(query, k=1)
+
+        assert approx[0][0] == exact[0][0]
+        assert abs(approx[0][1] - exact[0][1]) < 1e-3
+
+    def test_find_similar_ann_matches_exact(self, monkeypatch):
+        """测试 HNSW top-1 去重查找与精确查找结果一致"""
+        pytest.importorskip("usearch")
+        import memory
+        from memory import SimpleVectorIndex
+
+        index = SimpleVectorIndex(dimension=16)
+        rng = np.random.default_rng(0)
+        for i in range(50):
+            index.add(rng.random(16, dtype=np.float32), {"content": f"item_{i}"})
+        query = index.vectors[7] * 0.99
+
+        exact = index.find_similar(query, threshold=0.9)
+        monkeypatch.setattr(memory, "ANN_INDEX_MIN_SIZE", 10)
+        approx = index.find_similar(query, threshold=0.9)
+
+        assert approx[0] == exact[0] == 7
+        assert abs(approx[1] - exact[1]) < 1e-3
+
+    def test_search_top_k_order(self):
+        """测试搜索结果按相似度降序返回 top-k，且相似度为余弦值"""
+        from memory import SimpleVectorIndex
+
+        index = SimpleVectorIndex(dimension=4)
+        index.add(np.array([1, 0, 0, 0], dtype=np.float32), {"content": "x"})
+        index.add(np.array([0, 2, 0, 0], dtype=np.float32), {"content": "y"})
+        index.add(np.array([3, 3, 0, 0], dtype=np.float32), {"content": "xy"})
+
+        results = index.search(np.array([0, 5, 0, 0], dtype=np.float32), k=2)
+
+        assert [item["content"] for item, _ in results] == ["y", "xy"]
+        assert results[0][1] == pytest.approx(1.0)
+        assert results[1][1] == pytest.approx(np.sqrt(0.5))
+
+    def test_add_beyond_capacity(self):
+        """测试超过初始容量后扩容，已有向量和索引保持不变"""
+        from memory import SimpleVectorIndex, INDEX_INITIAL_CAPACITY
+
+        index = SimpleVectorIndex(dimension=8)
+        count = INDEX_INITIAL_CAPACITY * 2 + 5
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((count, 8)).astype(np.float32)
+        for i, vec in enumerate(vectors):
+            assert index.add(vec, {"content": str(i)}) == i
+
+        assert len(index) == count
+        assert index.vectors.shape == (count, 8)
+        expected = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.testing.assert_allclose(index.vectors, expected, rtol=1e-5)
+        assert index.search(vectors[100], k=1)[0][0]["content"] == "100"
+
     def test_cosine_similarity(self):
         """测试余弦相似度计算"""
         from memory import SimpleVectorIndex
@@ -229,6 +299,182 @@ class TestSimpleVectorIndex:
             if os.path.exists(temp_path):
                 os.remove(temp_path)
 
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_save_and_load_preserves_vectors(self, tmp_path, monkeypatch, use_orjson):
+        """测试保存后加载的向量与归一化后的原向量一致（orjson 与标准库 json 两种路径）"""
+        import memory
+        from memory import SimpleVectorIndex
+
+        if not use_orjson:
+            monkeypatch.setattr(memory, "orjson", None)
+        elif memory.orjson is None:
+            pytest.skip("orjson not installed")
+
+        index = SimpleVectorIndex(dimension=8)
+        vectors = [np.random.rand(8).astype(np.float32) for _ in range(2)]
+        for i, vector in enumerate(vectors):
+            index.add(vector, {"content": f"记忆_{i}"})
+
+        path = str(tmp_path / "memory_index.json")
+        index.save(path)
+
+        new_index = SimpleVectorIndex(dimension=8)
+        assert new_index.load(path) is True
+        assert new_index.items[1]["content"] == "记忆_1"
+        for original, loaded in zip(vectors, new_index.vectors):
+            np.testing.assert_allclose(original / np.linalg.norm(original), loaded, rtol=1e-6)
+
+    def test_load_legacy_file_normalizes_vectors(self, tmp_path):
+        """测试加载没有 normalized 标记的旧版文件时归一化向量"""
+        import json
+        from memory import SimpleVectorIndex
+
+        path = tmp_path / "memory_index.json"
+        path.write_text(json.dumps({
+            "dimension": 2,
+            "vectors": [[3.0, 4.0], [0.0, 0.0]],
+            "items": [{"content": "a"}, {"content": "b"}],
+        }), encoding="utf-8")
+
+        index = SimpleVectorIndex(dimension=2)
+        assert index.load(str(path)) is True
+        np.testing.assert_allclose(index.vectors, [[0.6, 0.8], [0.0, 0.0]])
+
+    def test_add_batch_matches_individual_adds(self):
+        """测试批量添加与逐条添加结果一致，且可超出初始容量"""
+        from memory import SimpleVectorIndex, INDEX_INITIAL_CAPACITY
+
+        rng = np.random.default_rng(1)
+        vectors = rng.random((INDEX_INITIAL_CAPACITY * 3 + 5, 8)).astype(np.float32)
+        items = [{"content": str(i)} for i in range(len(vectors))]
+
+        batch = SimpleVectorIndex(dimension=8)
+        batch.add(vectors[0], items[0])
+        assert batch.add_batch(vectors[1:], items[1:]) == list(range(1, len(vectors)))
+
+        single = SimpleVectorIndex(dimension=8)
+        for vector, item in zip(vectors, items):
+            single.add(vector, item)
+
+        assert len(batch) == len(vectors)
+        assert batch.items == single.items
+        np.testing.assert_allclose(batch.vectors, single.vectors, rtol=1e-6)
+
+    def test_add_batch_length_mismatch(self):
+        """测试向量数与项目数不一致时报错"""
+        from memory import SimpleVectorIndex
+
+        index = SimpleVectorIndex(dimension=4)
+        with pytest.raises(ValueError):
+            index.add_batch(np.ones((2, 4)), [{"content": "only one"}])
+        assert len(index) == 0
+
+    def test_add_or_update_batch_matches_sequential(self):
+        """测试批量去重与逐条 add_or_update 结果一致（包括本批次内部的重复）"""
+        from memory import SimpleVectorIndex
+
+        rng = np.random.default_rng(2)
+        centers = rng.standard_normal((5, 8))
+        existing = centers[:3] + 0.05 * rng.standard_normal((3, 8))
+        vectors = centers[rng.integers(0, 5, 20)] + 0.05 * rng.standard_normal((20, 8))
+        items = [{"content": str(i)} for i in range(len(vectors))]
+
+        batch = SimpleVectorIndex(dimension=8)
+        single = SimpleVectorIndex(dimension=8)
+        for i, vector in enumerate(existing):
+            batch.add(vector, {"content": f"old {i}"})
+            single.add(vector, {"content": f"old {i}"})
+
+        results = batch.add_or_update_batch(vectors, items, dedup_threshold=0.9)
+        expected = [single.add_or_update(v, item, dedup_threshold=0.9) for v, item in zip(vectors, items)]
+
+        assert results == expected
+        assert any(is_new for _, is_new in results) and not all(is_new for _, is_new in results)
+        assert batch.items == single.items
+        np.testing.assert_allclose(batch.vectors, single.vectors, rtol=1e-6)
+
+    def test_concurrent_add_or_update_deduplicates(self):
+        """测试多线程同时写入相同记忆时只新增一条"""
+        import threading
+        from memory import SimpleVectorIndex
+
+        index = SimpleVectorIndex(dimension=4)
+        vector = np.array([1, 2, 3, 4], dtype=np.float32)
+        start = threading.Barrier(8)
+
+        def worker(i):
+            start.wait()
+            index.add_or_update(vector, {"content": f"copy {i}"})
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(index) == 1
+
+    def test_search_during_concurrent_adds(self):
+        """测试并发写入时搜索不会读到缺少 item 的记录"""
+        import threading
+        from memory import SimpleVectorIndex
+
+        index = SimpleVectorIndex(dimension=8)
+        rng = np.random.default_rng(0)
+        errors = []
+        done = threading.Event()
+
+        def writer():
+            for i in range(500):
+                index.add(rng.random(8), {"content": str(i)})
+            done.set()
+
+        def reader():
+            try:
+                while not done.is_set():
+                    for item, _ in index.search(np.ones(8), k=3):
+                        assert "content" in item
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert len(index) == len(index.items) == 500
+
+    @pytest.mark.asyncio
+    async def test_save_in_background_uses_snapshot(self, tmp_path):
+        """测试后台保存写入调用时的快照，且多次保存按顺序完成"""
+        from memory import SimpleVectorIndex, wait_for_pending_saves_async
+
+        index = SimpleVectorIndex(dimension=4)
+        index.add(np.array([1, 0, 0, 0], dtype=np.float32), {"content": "first"})
+        first_path = str(tmp_path / "first.json")
+        index.save_in_background(first_path)
+
+        # 快照之后的修改不应出现在第一次保存中
+        index.add(np.array([0, 1, 0, 0], dtype=np.float32), {"content": "second"})
+        path = str(tmp_path / "memory_index.json")
+        index.save_in_background(path)
+        index.update(0, np.array([0, 0, 1, 0], dtype=np.float32), {"content": "updated"})
+        last = index.save_in_background(path)
+
+        await wait_for_pending_saves_async()
+        assert last.done()
+
+        first = SimpleVectorIndex(dimension=4)
+        assert first.load(first_path) is True
+        assert [item["content"] for item in first.items] == ["first"]
+
+        loaded = SimpleVectorIndex(dimension=4)
+        assert loaded.load(path) is True
+        assert [item["content"] for item in loaded.items] == ["updated", "second"]
+        np.testing.assert_allclose(loaded.vectors[0], [0, 0, 1, 0])
+
     def test_load_nonexistent_file(self):
         """测试加载不存在的文件"""
         from memory import SimpleVectorIndex
@@ -307,6 +553,201 @@ class TestHuggingFaceConfig:
         model_name = get_embedding_model_name()
         assert model_name == "paraphrase-multilingual-MiniLM-L12-v2"
 
+    def test_get_embedding_device(self, monkeypatch):
+        """测试设备名称来自环境变量，未设置时交给模型自动选择"""
+        from memory import get_embedding_device
+
+        monkeypatch.setenv("EMBEDDING_DEVICE", "cuda:1")
+        assert get_embedding_device() == "cuda:1"
+
+        monkeypatch.delenv("EMBEDDING_DEVICE")
+        assert get_embedding_device() is None
+
+
+class TestEmbeddingCache:
+    """测试嵌入结果缓存"""
+
+    def _mock_model(self, monkeypatch):
+        import memory
+        from unittest.mock import MagicMock
+
+        model = MagicMock()
+        model.encode.side_effect = lambda text, convert_to_numpy=True: np.full(4, len(text), dtype=np.float64)
+        monkeypatch.setattr(memory, "_get_embedding_model", lambda: model)
+        return model
+
+    def test_repeated_text_encoded_once(self, monkeypatch):
+        """测试相同文本只调用一次模型，且缓存结果为只读 float32"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+
+        first = memory.get_embedding("hello")
+        second = memory.get_embedding("hello")
+
+        assert model.encode.call_count == 1
+        assert first is second
+        assert first.dtype == np.float32
+        assert not first.flags.writeable
+
+    @pytest.mark.asyncio
+    async def test_async_shares_cache_with_sync(self, monkeypatch):
+        """测试异步版本与同步版本共享缓存"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+
+        sync_result = memory.get_embedding("shared")
+        async_result = await memory.get_embedding_async("shared")
+
+        assert model.encode.call_count == 1
+        assert async_result is sync_result
+
+    def test_cache_evicts_least_recently_used(self, monkeypatch):
+        """测试超出容量时淘汰最久未使用的项"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+        monkeypatch.setattr(memory, "EMBEDDING_CACHE_SIZE", 2)
+        # 只验证内存 LRU，被淘汰的项不从磁盘缓存读回
+        monkeypatch.setattr(memory, "EMBEDDING_DISK_CACHE_ENABLED", False)
+
+        memory.get_embedding("a")
+        memory.get_embedding("bb")
+        memory.get_embedding("a")    # a 变为最近使用
+        memory.get_embedding("ccc")  # 淘汰 bb
+        memory.get_embedding("a")
+        memory.get_embedding("bb")
+
+        assert model.encode.call_count == 4
+
+    def test_disk_cache_survives_memory_clear(self, monkeypatch):
+        """测试清空内存缓存后仍从磁盘缓存读取，不再调用模型"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+
+        first = memory.get_embedding("persisted")
+        memory.clear_embedding_cache()
+        second = memory.get_embedding("persisted")
+
+        assert model.encode.call_count == 1
+        np.testing.assert_array_equal(first, second)
+        assert second.dtype == np.float32
+
+    def test_disk_cache_keyed_by_model_name(self, monkeypatch):
+        """测试更换模型后不会命中旧模型的缓存"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+
+        memory.get_embedding("text")
+        memory.clear_embedding_cache()
+        monkeypatch.setenv("EMBEDDING_MODEL_NAME", "other-model")
+        memory.get_embedding("text")
+
+        assert model.encode.call_count == 2
+
+    def test_disk_cache_disabled(self, monkeypatch, tmp_path):
+        """测试关闭磁盘缓存时不创建缓存文件"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+        monkeypatch.setattr(memory, "EMBEDDING_DISK_CACHE_ENABLED", False)
+
+        memory.get_embedding("text")
+        memory.clear_embedding_cache()
+        memory.get_embedding("text")
+
+        assert model.encode.call_count == 2
+        assert not (tmp_path / "embeddings.sqlite").exists()
+
+
+class TestEmbeddingsBatch:
+    """测试批量嵌入"""
+
+    def _mock_model(self, monkeypatch):
+        import memory
+        from unittest.mock import MagicMock
+
+        def encode(texts, batch_size=32, convert_to_numpy=True):
+            return np.array([np.full(4, len(t), dtype=np.float64) for t in texts])
+
+        model = MagicMock()
+        model.encode.side_effect = encode
+        monkeypatch.setattr(memory, "_get_embedding_model", lambda: model)
+        return model
+
+    def test_batch_encodes_uncached_texts_once(self, monkeypatch):
+        """测试只对未缓存的文本调用一次模型，重复文本只计算一次，结果按原顺序排列"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+        monkeypatch.setattr(memory, "EMBEDDING_DISK_CACHE_ENABLED", False)
+        memory._put_cached_embedding(memory._embedding_cache_key("cached"), np.zeros(4, dtype=np.float32))
+
+        result = memory.get_embeddings_batch(["a", "cached", "bbb", "a"])
+
+        assert model.encode.call_count == 1
+        assert model.encode.call_args[0][0] == ["a", "bbb"]
+        assert result.shape == (4, 4)
+        assert result.dtype == np.float32
+        np.testing.assert_array_equal(result[:, 0], [1, 0, 3, 1])
+
+    @pytest.mark.asyncio
+    async def test_batch_async_fills_caches(self, monkeypatch):
+        """测试异步批量结果写入内存和磁盘缓存，单条查询可直接命中"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+
+        result = await memory.get_embeddings_batch_async(["xy", "z"])
+        assert memory.get_embedding("xy") is not None
+        memory.clear_embedding_cache()
+        again = memory.get_embeddings_batch(["z", "xy"])
+
+        assert model.encode.call_count == 1
+        np.testing.assert_array_equal(again, result[::-1])
+
+    @pytest.mark.asyncio
+    async def test_concurrent_async_calls_coalesced(self, monkeypatch):
+        """测试并发的 get_embedding_async 请求合为一次 encode，相同文本只计算一次"""
+        import asyncio
+        import memory
+
+        model = self._mock_model(monkeypatch)
+
+        results = await asyncio.gather(*(
+            memory.get_embedding_async(text) for text in ["a", "bb", "a", "cccc"]
+        ))
+
+        assert model.encode.call_count == 1
+        assert sorted(model.encode.call_args[0][0]) == ["a", "bb", "cccc"]
+        assert [float(r[0]) for r in results] == [1, 2, 1, 4]
+        assert results[0] is results[2]
+
+    def test_empty_batch(self, monkeypatch):
+        """测试空列表不调用模型"""
+        import memory
+
+        model = self._mock_model(monkeypatch)
+
+        assert memory.get_embeddings_batch([]).shape[0] == 0
+        assert model.encode.call_count == 0
+
+    def test_batch_failure_raises(self, monkeypatch):
+        """测试模型失败时抛出 VectorMemoryError"""
+        import memory
+        from exceptions import VectorMemoryError
+
+        def broken():
+            raise RuntimeError("model unavailable")
+
+        monkeypatch.setattr(memory, "_get_embedding_model", broken)
+
+        with pytest.raises(VectorMemoryError):
+            memory.get_embeddings_batch(["a"])
+
 
 class TestGetEmbedding:
     """测试 get_embedding 函数"""
@@ -0,0 +1,78 @@
+"""
+EmbedNode 测试
+
+验证滑动窗口之外的对话轮次被批量嵌入并存入记忆索引。
+
+运行方式:
+    pytest tests/test_nodes/test_embed_node.py -v
+"""
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+
+def _round(i):
+    return [{"role": "user", "content": f"问题 {i}"}, {"role": "assistant", "content": f"回答 {i}"}]
+
+
+@pytest.fixture
+def mock_model(monkeypatch, tmp_path):
+    """使用 mock 嵌入模型（每条文本得到不同方向的向量），记忆文件写入临时目录"""
+    import memory
+
+    def encode(texts, batch_size=32, convert_to_numpy=True):
+        vectors = np.zeros((len(texts), 8))
+        for row, text in enumerate(texts):
+            vectors[row, int(text.split()[2]) % 8] = 1.0
+        return vectors
+
+    model = MagicMock()
+    model.encode.side_effect = encode
+    monkeypatch.setattr(memory, "_get_embedding_model", lambda: model)
+    monkeypatch.chdir(tmp_path)
+    return model
+
+
+class TestEmbedNode:
+    """测试记忆存储节点"""
+
+    @pytest.mark.asyncio
+    async def test_within_window_not_stored(self, mock_model):
+        """测试消息数量未超过窗口时不存储"""
+        from nodes import EmbedNode
+
+        shared = {"messages": _round(0)}
+
+        assert await EmbedNode().prep_async(shared) is None
+        assert len(shared["messages"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_overflow_rounds_embedded_in_one_batch(self, mock_model, monkeypatch, capsys):
+        """测试窗口之外的多轮对话一次批量嵌入，窗口内的消息保留"""
+        import memory
+        from nodes import EmbedNode
+        from nodes.base import MEMORY_WINDOW_SIZE
+
+        extra_rounds = 2
+        messages = [msg for i in range(MEMORY_WINDOW_SIZE // 2 + extra_rounds) for msg in _round(i)]
+        index = memory.SimpleVectorIndex(dimension=8)
+        monkeypatch.setattr(memory, "_memory_index", index)
+        shared = {"messages": messages}
+
+        await EmbedNode().run_async(shared)
+
+        assert mock_model.encode.call_count == 1
+        assert len(index) == extra_rounds
+        assert [item["content"] for item in index.items] == [
+            "User: 问题 0\nAssistant: 回答 0",
+            "User: 问题 1\nAssistant: 回答 1",
+        ]
+        assert shared["messages"] == messages[2 * extra_rounds:]
+        assert "[Memory] Added 2 new, updated 0 similar memories (total: 2 items)" in capsys.readouterr().out
+
+        # 索引在后台保存，等待完成后文件包含新存入的记忆
+        await memory.wait_for_pending_saves_async()
+        saved = memory.SimpleVectorIndex(dimension=8)
+        assert saved.load("memory_index.json") is True
+        assert saved.items == index.items
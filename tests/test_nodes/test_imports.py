@@ -191,3 +191,85 @@ answer: |
 
         with pytest.raises(ValueError):
             parse_yaml_response(invalid_response)
+
+    def test_parse_yaml_answer_with_nested_code_block(self):
+        """测试 answer 中包含嵌套代码块时完整提取"""
+        from nodes import parse_yaml_response
+
+        response = """```yaml
+action: answer
+answer: |
+  示例代码：
+  ```python
+  print("hi")
+  ```
+  结束
+```
+其他说明"""
+        result = parse_yaml_response(response)
+
+        assert result["action"] == "answer"
+        assert 'print("hi")' in result["answer"]
+        assert "结束" in result["answer"]
+
+
+class TestTrimContext:
+    """测试上下文修剪"""
+
+    def test_short_context_unchanged(self):
+        """测试步骤数未超过窗口时原样返回"""
+        from nodes import trim_context
+
+        context = "### Step 1\na\n\n### Step 2\nb"
+
+        assert trim_context(context, 2) == context
+        assert trim_context("", 2) == ""
+
+    def test_keeps_last_steps(self):
+        """测试只保留最近 N 步，并保留步骤之间的空行"""
+        from nodes import trim_context
+
+        context = "".join(f"\n\n### Step {i}\nresult {i}" for i in range(1, 6))
+
+        assert trim_context(context, 2) == "### Step 4\nresult 4\n\n### Step 5\nresult 5"
+
+    @pytest.mark.parametrize("window_size", [1, 2, 3, 6, 10])
+    def test_chunked_context_matches_full_trim(self, window_size):
+        """测试上下文缓冲区的修剪结果与对完整字符串修剪一致"""
+        from nodes import append_context, get_context, get_trimmed_context, trim_context
+
+        shared = {}
+        append_context(shared, "### Step 0\nstart")
+        for i in range(1, 6):
+            append_context(shared, f"\n\n### Step {i}\nresult {i}")
+        append_context(shared, "\n\n[Tool call failed: x]")
+
+        full = get_context(shared)
+        trimmed, was_trimmed = get_trimmed_context(shared, window_size)
+
+        assert trimmed == trim_context(full, window_size)
+        assert was_trimmed == (trimmed != full)
+
+    def test_empty_chunked_context(self):
+        """测试没有上下文时返回空字符串"""
+        from nodes import get_trimmed_context, reset_context
+
+        shared = {}
+        assert get_trimmed_context(shared, 3) == ("", False)
+        reset_context(shared)
+        assert get_trimmed_context(shared, 3) == ("", False)
+
+
+class TestEstimateTokens:
+    """测试 token 估算"""
+
+    def test_matches_character_scan(self):
+        """测试与逐字符统计中文字符的估算结果一致"""
+        from nodes import estimate_tokens
+
+        text = "分析贵州茅台 stock price 走势 😀 and 600519 行情\n第二行"
+        chinese = sum(1 for c in text if '一' <= c <= '鿿')
+        expected = int(chinese * 1.5 + (len(text.split()) - chinese) * 1.3)
+
+        assert estimate_tokens(text) == expected
+        assert estimate_tokens("") == 0
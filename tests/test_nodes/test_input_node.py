@@ -0,0 +1,102 @@
+"""
+InputNode 控制命令测试
+
+验证控制命令在 prep 阶段通过 _COMMAND_HANDLERS 分发处理。
+
+运行方式:
+    pytest tests/test_nodes/test_input_node.py -v
+"""
+import pytest
+
+
+@pytest.fixture
+def input_node(monkeypatch):
+    """创建 InputNode，并让 async_input 返回预设输入"""
+    from nodes import input_node as module
+
+    def _make(user_input):
+        async def fake_input(prompt):
+            return user_input
+
+        monkeypatch.setattr(module, "async_input", fake_input)
+        monkeypatch.setattr(module, "log_user_input", lambda text: None)
+        return module.InputNode()
+
+    return _make
+
+
+class TestInputCommands:
+    """测试控制命令分发"""
+
+    @pytest.mark.asyncio
+    async def test_clear_command_handled_in_prep(self, input_node):
+        """测试 /clear 在 prep 阶段重置上下文，post 返回 INPUT"""
+        from nodes import Action
+
+        node = input_node("/CLEAR")
+        shared = {"mcp_manager": None, "context_chunks": ["old"], "step_count": 3}
+
+        prep_res = await node.prep_async(shared)
+        exec_res = await node.exec_async(prep_res)
+        action = await node.post_async(shared, prep_res, exec_res)
+
+        assert shared["context_chunks"] == []
+        assert shared["step_count"] == 0
+        assert action == Action.INPUT
+
+    @pytest.mark.asyncio
+    async def test_unknown_command(self, input_node, capsys):
+        """测试未知命令提示帮助并返回 INPUT"""
+        from nodes import Action
+
+        node = input_node("/nope")
+        shared = {"mcp_manager": None}
+
+        prep_res = await node.prep_async(shared)
+        action = await node.post_async(shared, prep_res, prep_res)
+
+        assert action == Action.INPUT
+        assert "Unknown command: /nope" in capsys.readouterr().out
+
+    @pytest.mark.asyncio
+    async def test_plain_text_matching_sentinel_name_is_task(self, input_node):
+        """测试普通输入不会被误判为已处理的命令"""
+        from nodes import Action
+
+        node = input_node("command")
+        shared = {"mcp_manager": None, "messages": []}
+
+        prep_res = await node.prep_async(shared)
+        action = await node.post_async(shared, prep_res, prep_res)
+
+        assert action == Action.PLANNING
+        assert shared["current_task"] == "command"
+
+    def test_aliases_share_handler(self):
+        """测试 /new 与 /newtask 使用同一处理函数"""
+        from nodes.input_node import _COMMAND_HANDLERS
+
+        assert _COMMAND_HANDLERS["/new"] is _COMMAND_HANDLERS["/newtask"]
+
+    @pytest.mark.asyncio
+    async def test_forget_waits_for_pending_saves(self, input_node, tmp_path, monkeypatch):
+        """测试 /forget 等待排队中的后台保存后再删除文件，并换成空索引"""
+        import numpy as np
+        import memory
+        from nodes import Action
+
+        monkeypatch.chdir(tmp_path)
+        index = memory.SimpleVectorIndex(dimension=4)
+        index.add(np.ones(4, dtype=np.float32), {"content": "old"})
+        index.save_in_background("memory_index.json")
+
+        node = input_node("/forget")
+        shared = {"mcp_manager": None, "memory_index": index}
+        prep_res = await node.prep_async(shared)
+        action = await node.post_async(shared, prep_res, prep_res)
+        await memory.wait_for_pending_saves_async()
+
+        assert action == Action.INPUT
+        assert isinstance(shared["memory_index"], memory.SimpleVectorIndex)
+        assert len(shared["memory_index"]) == 0
+        assert not (tmp_path / "memory_index.json").exists()
@@ -0,0 +1,369 @@
+"""
+规划文件辅助函数测试
+
+验证 planning_utils 中规划文件的读写与追加行为。
+
+运行方式:
+    pytest tests/test_nodes/test_planning_utils.py -v
+"""
+import os
+
+import pytest
+
+
+@pytest.fixture
+def planning_dir(tmp_path, monkeypatch):
+    """将规划文件目录重定向到临时目录"""
+    from nodes import planning_utils
+
+    monkeypatch.setattr(planning_utils, "_PLANNING_ABS", str(tmp_path))
+    return tmp_path
+
+
+class TestWritePlanningFile:
+    """测试整体写入规划文件"""
+
+    def test_write_replaces_content_without_temp_file(self, planning_dir):
+        """测试写入后目标文件内容被替换，且不残留临时文件"""
+        from nodes.planning_utils import write_planning_file, PLAN_FILE
+
+        (planning_dir / PLAN_FILE).write_text("old", encoding="utf-8")
+
+        assert write_planning_file(PLAN_FILE, "new") is True
+        assert (planning_dir / PLAN_FILE).read_text(encoding="utf-8") == "new"
+        assert sorted(p.name for p in planning_dir.iterdir()) == [PLAN_FILE]
+
+    def test_write_recreates_missing_directory(self, tmp_path, monkeypatch):
+        """测试规划目录被删除后写入时自动重建"""
+        from nodes import planning_utils
+
+        missing_dir = tmp_path / "removed"
+        monkeypatch.setattr(planning_utils, "_PLANNING_ABS", str(missing_dir))
+
+        assert planning_utils.write_planning_file(planning_utils.PLAN_FILE, "content") is True
+        assert (missing_dir / planning_utils.PLAN_FILE).read_text(encoding="utf-8") == "content"
+
+
+class TestAppendPlanningFile:
+    """测试追加写入规划文件"""
+
+    def test_append_missing_file_returns_false(self, planning_dir):
+        """测试文件不存在时不创建文件"""
+        from nodes.planning_utils import append_planning_file, FINDINGS_FILE
+
+        assert append_planning_file(FINDINGS_FILE, "entry") is False
+        assert not (planning_dir / FINDINGS_FILE).exists()
+
+    def test_append_to_findings_keeps_existing_content(self, planning_dir):
+        """测试追加发现只在文件末尾新增内容"""
+        from nodes.planning_utils import append_to_findings, FINDINGS_FILE
+
+        (planning_dir / FINDINGS_FILE).write_text("# Findings\n", encoding="utf-8")
+
+        assert append_to_findings("Title", "Tool: test", "some finding") is True
+
+        content = (planning_dir / FINDINGS_FILE).read_text(encoding="utf-8")
+        assert content.startswith("# Findings\n")
+        assert "Title" in content
+        assert "some finding" in content
+
+    def test_shared_timestamp_is_used(self, planning_dir):
+        """测试调用方传入的时间戳直接写入记录"""
+        from nodes.planning_utils import append_to_progress, PROGRESS_FILE
+
+        (planning_dir / PROGRESS_FILE).write_text("# Progress Log\n", encoding="utf-8")
+
+        assert append_to_progress("Step", "action", timestamp="2025-01-01 08:00") is True
+        assert "### [2025-01-01 08:00] Step" in (planning_dir / PROGRESS_FILE).read_text(encoding="utf-8")
+
+    def test_current_timestamp_format(self):
+        """测试默认时间戳精确到分钟"""
+        from datetime import datetime
+        from nodes.planning_utils import current_timestamp
+
+        assert datetime.strptime(current_timestamp(), "%Y-%m-%d %H:%M")
+
+    def test_append_to_progress_trims_entries(self, planning_dir, monkeypatch):
+        """测试 progress 条目超过上限时被裁剪"""
+        from nodes import planning_utils
+
+        monkeypatch.setattr(planning_utils, "_progress_append_count", 0)
+        (planning_dir / planning_utils.PROGRESS_FILE).write_text(
+            "# Progress Log\n\n## Log Entries\n", encoding="utf-8"
+        )
+
+        total = planning_utils.MAX_PROGRESS_ENTRIES + planning_utils.PROGRESS_TRIM_INTERVAL
+        for i in range(total):
+            assert planning_utils.append_to_progress("Step", f"action {i}") is True
+
+        content = (planning_dir / planning_utils.PROGRESS_FILE).read_text(encoding="utf-8")
+        assert content.count("### [") == planning_utils.MAX_PROGRESS_ENTRIES
+        assert f"action {total - 1}" in content
+        assert "action 0\n" not in content
+
+
+class TestArchivePlanningFiles:
+    """测试规划文件归档"""
+
+    def test_archive_creates_parent_and_copies_files(self, planning_dir, tmp_path, monkeypatch):
+        """测试首次归档时创建归档父目录并复制已有的规划文件"""
+        from nodes import planning_utils
+
+        archive_root = tmp_path / "archive_root"
+        monkeypatch.setattr(planning_utils, "_ARCHIVE_ABS", str(archive_root))
+        monkeypatch.setattr(planning_utils, "_archive_dir_ready", False)
+        (planning_dir / planning_utils.PLAN_FILE).write_text("# Plan\n", encoding="utf-8")
+
+        archive_dir = planning_utils.archive_planning_files("demo task")
+
+        assert archive_dir is not None
+        assert os.path.dirname(archive_dir) == str(archive_root)
+        with open(os.path.join(archive_dir, planning_utils.PLAN_FILE), encoding="utf-8") as f:
+            assert f.read() == "# Plan\n"
+        assert (planning_dir / planning_utils.PLAN_FILE).exists()
+
+    def test_archive_unaffected_by_later_rewrite(self, planning_dir, tmp_path, monkeypatch):
+        """测试归档后重写规划文件不会改变已归档内容"""
+        from nodes import planning_utils
+
+        monkeypatch.setattr(planning_utils, "_ARCHIVE_ABS", str(tmp_path / "archive_root"))
+        monkeypatch.setattr(planning_utils, "_archive_dir_ready", False)
+        (planning_dir / planning_utils.PLAN_FILE).write_text("# Plan\n", encoding="utf-8")
+
+        archive_dir = planning_utils.archive_planning_files("demo")
+        planning_utils.write_planning_file(planning_utils.PLAN_FILE, "# New Plan\n")
+
+        with open(os.path.join(archive_dir, planning_utils.PLAN_FILE), encoding="utf-8") as f:
+            assert f.read() == "# Plan\n"
+
+    def test_archive_unaffected_by_later_append(self, planning_dir, tmp_path, monkeypatch):
+        """测试归档后原地追加规划文件不会改变已归档内容"""
+        from nodes import planning_utils
+
+        monkeypatch.setattr(planning_utils, "_ARCHIVE_ABS", str(tmp_path / "archive_root"))
+        monkeypatch.setattr(planning_utils, "_archive_dir_ready", False)
+        (planning_dir / planning_utils.PROGRESS_FILE).write_text("# 进度\n", encoding="utf-8")
+
+        archive_dir = planning_utils.archive_planning_files("demo")
+        assert planning_utils.append_planning_file(planning_utils.PROGRESS_FILE, "\nLATER ENTRY\n") is True
+
+        with open(os.path.join(archive_dir, planning_utils.PROGRESS_FILE), encoding="utf-8") as f:
+            assert f.read() == "# 进度\n"
+
+    def test_archive_without_files_returns_none(self, planning_dir, tmp_path, monkeypatch):
+        """测试没有规划文件时不返回归档目录"""
+        from nodes import planning_utils
+
+        monkeypatch.setattr(planning_utils, "_ARCHIVE_ABS", str(tmp_path / "archive_root"))
+        monkeypatch.setattr(planning_utils, "_archive_dir_ready", False)
+
+        assert planning_utils.archive_planning_files("demo") is None
+
+
+class TestRecordErrorInPlan:
+    """测试在计划文件中记录错误"""
+
+    def test_error_inserted_before_next_section(self, planning_dir):
+        """测试错误追加到 Errors Encountered 段落末尾，后续段落保持不变"""
+        from nodes.planning_utils import record_error_in_plan, PLAN_FILE
+
+        (planning_dir / PLAN_FILE).write_text(
+            "## Goal\ntest\n\n## Errors Encountered\n- old error\n\n## Notes\nnote\n",
+            encoding="utf-8",
+        )
+
+        assert record_error_in_plan(r"Tool failed: \1 bad") is True
+
+        content = (planning_dir / PLAN_FILE).read_text(encoding="utf-8")
+        errors_section, notes_section = content.split("## Notes")
+        assert "- old error" in errors_section
+        assert r"Tool failed: \1 bad" in errors_section
+        assert notes_section == "\nnote\n"
+
+    def test_no_errors_section(self, planning_dir):
+        """测试计划文件没有 Errors Encountered 段落时返回 False"""
+        from nodes.planning_utils import record_error_in_plan, PLAN_FILE
+
+        (planning_dir / PLAN_FILE).write_text("## Goal\ntest\n", encoding="utf-8")
+
+        assert record_error_in_plan("error") is False
+
+    @pytest.mark.asyncio
+    async def test_async_variant(self, planning_dir):
+        """测试异步版本在线程中完成同样的记录"""
+        from nodes.planning_utils import record_error_in_plan_async, PLAN_FILE
+
+        (planning_dir / PLAN_FILE).write_text("## Errors Encountered\n", encoding="utf-8")
+
+        assert await record_error_in_plan_async("boom", timestamp="2024-01-01 00:00") is True
+        assert "- [2024-01-01 00:00] boom" in (planning_dir / PLAN_FILE).read_text(encoding="utf-8")
+
+
+class TestUpdatePlanPhases:
+    """测试计划阶段状态更新"""
+
+    def test_batch_update_applies_in_order(self, planning_dir):
+        """测试批量更新按顺序应用所有阶段，并更新当前阶段"""
+        from nodes.planning_utils import update_plan_phases, PLAN_FILE
+
+        (planning_dir / PLAN_FILE).write_text(
+            "## Current Phase\nPhase 1\n\n- [ ] Phase 1: Collect\n- [ ] Phase 2: Analyze\n- [ ] Phase 3: Verify\n",
+            encoding="utf-8",
+        )
+
+        assert update_plan_phases([(1, True), (2, False)]) is True
+
+        content = (planning_dir / PLAN_FILE).read_text(encoding="utf-8")
+        assert "- [x] Phase 1: Collect" in content
+        assert "- [ ] Phase 2: Analyze" in content
+        assert "- [ ] Phase 3: Verify" in content
+        assert "## Current Phase\nPhase 2" in content
+
+    def test_unknown_phase_returns_false(self, planning_dir):
+        """测试没有匹配阶段时不写文件并返回 False"""
+        from nodes.planning_utils import update_plan_phase, PLAN_FILE
+
+        (planning_dir / PLAN_FILE).write_text("- [ ] Phase 1: Collect\n", encoding="utf-8")
+
+        assert update_plan_phase(5, completed=True) is False
+
+
+class TestPlanCompletionStatus:
+    """测试计划完成状态统计"""
+
+    def test_counts_completed_and_total(self, planning_dir):
+        """测试统计已完成阶段数、总阶段数和未完成阶段"""
+        from nodes.planning_utils import get_plan_completion_status, PLAN_FILE
+
+        (planning_dir / PLAN_FILE).write_text(
+            "- [x] Phase 1: Collect\n- [ ] Phase 2: Analyze\n- [ ] Phase 3: Verify\n",
+            encoding="utf-8",
+        )
+
+        completed, total, uncompleted = get_plan_completion_status()
+
+        assert (completed, total) == (1, 3)
+        assert uncompleted == ["Phase 2: Analyze", "Phase 3: Verify"]
+
+    def test_missing_plan(self, planning_dir):
+        """测试计划文件不存在时返回空状态"""
+        from nodes.planning_utils import get_plan_completion_status
+
+        assert get_plan_completion_status() == (0, 0, [])
+
+
+class TestIsComplexTask:
+    """测试任务复杂度判断"""
+
+    def test_long_task_is_complex(self):
+        """测试长任务直接判定为复杂任务"""
+        from nodes.planning_utils import is_complex_task, COMPLEX_TASK_MIN_LENGTH
+
+        assert is_complex_task("x" * COMPLEX_TASK_MIN_LENGTH) is True
+
+    def test_short_task_with_keyword_case_insensitive(self):
+        """测试短任务关键词匹配忽略大小写"""
+        from nodes.planning_utils import is_complex_task
+
+        assert is_complex_task("STOCK?") is True
+        assert is_complex_task("k线") is True
+
+    def test_short_task_with_pattern(self):
+        """测试短任务句式模式匹配"""
+        from nodes.planning_utils import is_complex_task
+
+        assert is_complex_task("600519行情") is True
+
+    def test_simple_task(self):
+        """测试简单任务"""
+        from nodes.planning_utils import is_complex_task
+
+        assert is_complex_task("hi") is False
+        assert is_complex_task("") is False
+
+
+class TestSmartImplications:
+    """测试根据工具名生成 implications"""
+
+    def test_exact_match(self):
+        """测试精确匹配优先"""
+        from nodes.planning_utils import get_smart_implications, TOOL_IMPLICATIONS_MAP
+
+        assert get_smart_implications("fetch_stock_quote") == TOOL_IMPLICATIONS_MAP["fetch_stock_quote"]
+
+    def test_keyword_priority_follows_category_order(self):
+        """测试同时命中多个类别时按类别顺序取第一个"""
+        from nodes.planning_utils import get_smart_implications
+
+        # "news" 属于热点类，"search" 属于搜索类，搜索类优先
+        assert get_smart_implications("news_search") == "搜索结果已获取，可提取相关信息"
+        assert get_smart_implications("Search_Stock") == "金融数据已获取，可用于市场分析"
+
+    def test_unknown_tool_returns_default(self):
+        """测试未命中任何关键词时返回默认文本"""
+        from nodes.planning_utils import get_smart_implications
+
+        assert get_smart_implications("xyz") == "数据已收集，待进一步分析"
+
+
+class TestPlanningNodeFiles:
+    """测试 PlanningNode 创建规划文件"""
+
+    @pytest.mark.asyncio
+    async def test_post_creates_planning_files(self, planning_dir):
+        """测试复杂任务会根据模板创建三个规划文件"""
+        from nodes import PlanningNode, Action
+        from nodes.planning_node import PlanningResult
+        from nodes.planning_utils import PLAN_FILE, FINDINGS_FILE, PROGRESS_FILE
+
+        node = PlanningNode()
+        shared = {}
+        exec_res = PlanningResult(
+            needs_planning=True,
+            task="分析贵州茅台的股价走势",
+            task_type="Research & Analysis",
+            timestamp="2025-01-01 00:00",
+        )
+
+        action = await node.post_async(shared, {}, exec_res)
+
+        assert action == Action.RETRIEVE
+        assert shared["has_plan"] is True
+        for filename in (PLAN_FILE, FINDINGS_FILE, PROGRESS_FILE):
+            content = (planning_dir / filename).read_text(encoding="utf-8")
+            assert "分析贵州茅台的股价走势" in content
+
+    @pytest.mark.asyncio
+    async def test_simple_task_skips_planning(self, planning_dir):
+        """测试简单任务不创建规划文件"""
+        from nodes import PlanningNode, Action
+
+        node = PlanningNode()
+        shared = {}
+        exec_res = await node.exec_async({"task": "hi"})
+        action = await node.post_async(shared, {}, exec_res)
+
+        assert exec_res.needs_planning is False
+        assert action == Action.RETRIEVE
+        assert shared["has_plan"] is False
+        assert list(planning_dir.iterdir()) == []
+
+
+class TestPlanningNodeTaskType:
+    """测试 PlanningNode 任务类型分类"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("task, expected", [
+        ("请帮我比较并分析这两只股票的走势", "Research & Analysis"),
+        ("Summarize and COMPARE these two reports for me", "Comparison"),
+        ("请总结一下今天的市场新闻并给出要点", "Summarization"),
+        ("帮我查询一下明天北京的天气情况并提醒我", "Multi-step Task"),
+    ])
+    async def test_task_type_priority(self, task, expected):
+        """测试同时命中多个类型时按优先级分类"""
+        from nodes import PlanningNode
+
+        exec_res = await PlanningNode().exec_async({"task": task})
+
+        assert exec_res.needs_planning is True
+        assert exec_res.task_type == expected
@@ -0,0 +1,37 @@
+"""
+系统提示词测试
+
+验证 build_system_prompt 与直接 format 模板的结果一致。
+
+运行方式:
+    pytest tests/test_nodes/test_prompts.py -v
+"""
+
+
+class TestBuildSystemPrompt:
+    """测试主系统提示词填充"""
+
+    def test_matches_str_format(self):
+        """测试拼接结果与 str.format 完全一致（含转义的花括号）"""
+        from nodes.prompts import AGENT_SYSTEM_PROMPT, build_system_prompt
+
+        fields = {
+            "tool_info": "- tool_a: {not a field}",
+            "current_datetime": "2025-01-01 08:00:00 (Wednesday) [UTC+08:00]",
+            "project_root": "/root/project",
+            "sandbox_path": "/root/project/sandbox",
+        }
+
+        result = build_system_prompt(**fields)
+
+        assert result == AGENT_SYSTEM_PROMPT.format(**fields)
+        assert '`tool_params: {city: "东京"}`' in result
+
+    def test_datetime_at_end(self):
+        """测试当前时间位于提示词末尾，静态内容在前"""
+        from nodes.prompts import build_system_prompt
+
+        result = build_system_prompt("tools", "NOW", "/root", "/root/sandbox")
+
+        assert result.rstrip().endswith("NOW")
+        assert result.index("tools") < result.index("NOW")
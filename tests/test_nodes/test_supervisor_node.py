@@ -0,0 +1,76 @@
+"""
+SupervisorNode 答案质量检查测试
+
+运行方式:
+    pytest tests/test_nodes/test_supervisor_node.py -v
+"""
+import pytest
+
+
+async def _check(answer: str) -> dict:
+    from nodes import SupervisorNode
+
+    return await SupervisorNode().exec_async(
+        {"answer": answer, "task": "task", "retry_count": 0, "has_plan": False}
+    )
+
+
+class TestSupervisorChecks:
+    """测试答案质量检查规则"""
+
+    @pytest.mark.asyncio
+    async def test_reject_reply_detected(self):
+        """测试短回复开头的拒绝模式（忽略大小写和前导空白）"""
+        result = await _check("  SORRY, I cannot help with that request today.")
+
+        assert result["valid"] is False
+        assert "答案可能是拒绝回复" in result["reason"]
+
+    @pytest.mark.asyncio
+    async def test_error_and_incomplete_markers(self):
+        """测试错误标记和未完成标记"""
+        result = await _check("Result ERROR: connection reset while fetching data. 待续")
+
+        assert "答案包含错误标记" in result["reason"]
+        assert "答案可能不完整" in result["reason"]
+
+    @pytest.mark.asyncio
+    async def test_normal_answer_passes(self):
+        """测试正常回答通过检查（讨论 error 一词不算错误标记）"""
+        result = await _check("贵州茅台今日收盘价为 1500 元，较昨日上涨 1.2%，没有出现 error 信息。")
+
+        assert result["valid"] is True
+
+
+class TestSupervisorFeedback:
+    """测试拒绝反馈的保存方式"""
+
+    @pytest.mark.asyncio
+    async def test_rejection_keeps_context_and_overwrites_feedback(self):
+        """测试拒绝时不修改上下文，且只保留最新一条反馈"""
+        from nodes import SupervisorNode, Action
+        from nodes.base import append_context, get_context, with_supervisor_feedback
+
+        node = SupervisorNode()
+        shared = {"context_chunks": ["### Tool Call: a\nresult"], "messages": [], "has_plan": False}
+
+        action = await node.post_async(shared, {}, {"valid": False, "reason": "答案过短"})
+        append_context(shared, "\n\n### Tool Call: b\nmore")
+        await node.post_async(shared, {}, {"valid": False, "reason": "答案可能不完整"})
+
+        assert action == Action.DECIDE
+        assert get_context(shared) == "### Tool Call: a\nresult\n\n### Tool Call: b\nmore"
+        rendered = with_supervisor_feedback(get_context(shared), shared["supervisor_feedback"])
+        assert rendered.endswith("\n\n[Supervisor] Previous answer rejected: 答案可能不完整")
+        assert "答案过短" not in rendered
+
+    @pytest.mark.asyncio
+    async def test_approval_clears_feedback(self):
+        """测试答案通过后清除拒绝反馈"""
+        from nodes import SupervisorNode
+
+        shared = {"supervisor_feedback": "答案过短", "has_plan": False}
+
+        await SupervisorNode().post_async(shared, {}, {"valid": True, "reason": "ok"})
+
+        assert shared["supervisor_feedback"] is None
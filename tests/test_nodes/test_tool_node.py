@@ -0,0 +1,333 @@
+"""
+ToolNode 内置工具测试
+
+验证 execute_python / execute_terminal 的子进程执行与 get_current_time 的时区查找。
+
+运行方式:
+    pytest tests/test_nodes/test_tool_node.py -v
+"""
+import asyncio
+import sys
+import time
+
+import pytest
+import pytest_asyncio
+
+
+class TestRunProcess:
+    """测试异步子进程执行"""
+
+    @pytest.mark.asyncio
+    async def test_collects_stdout_stderr_and_exit_code(self):
+        """测试输出包含 stdout、stderr 和非零退出码"""
+        from nodes.tool_node import _run_process_async
+
+        code = "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"
+        result = await _run_process_async(sys.executable, "-c", code)
+
+        assert result == "out\n\n[STDERR] err\n\n[Exit Code: 3]"
+
+    @pytest.mark.asyncio
+    async def test_no_output(self):
+        """测试无输出时返回占位文本"""
+        from nodes.tool_node import _run_process_async
+
+        assert await _run_process_async(sys.executable, "-c", "pass") == "(No output)"
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_process(self, monkeypatch):
+        """测试超时抛出 TimeoutError 且立即终止子进程"""
+        from nodes import tool_node
+
+        monkeypatch.setattr(tool_node, "CODE_EXECUTION_TIMEOUT", 0.5)
+
+        start = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await tool_node._run_process_async(sys.executable, "-c", "import time; time.sleep(10)")
+        assert time.monotonic() - start < 5
+
+    @pytest.mark.asyncio
+    async def test_runaway_output_terminates_process(self, monkeypatch):
+        """测试输出超过上限时停止读取并终止子进程"""
+        from nodes import tool_node
+
+        monkeypatch.setattr(tool_node, "OUTPUT_BYTE_LIMIT", 1000)
+
+        code = "import sys\nwhile True: sys.stdout.write('x' * 100)"
+        result = await tool_node._run_process_async(sys.executable, "-c", code)
+
+        assert result.startswith("x" * 1000)
+        assert result.endswith("[Output exceeded 1000 bytes, process terminated]")
+
+    def test_format_truncates_each_stream(self, monkeypatch):
+        """测试格式化时截断超长输出并保留退出码"""
+        from nodes import tool_node
+
+        monkeypatch.setattr(tool_node, "OUTPUT_BYTE_LIMIT", 4)
+
+        result = tool_node._format_process_output(b"abcdef", b"", 1)
+
+        assert result == "abcd\n[Output truncated at 4 bytes]\n[Exit Code: 1]"
+
+
+@pytest_asyncio.fixture
+async def worker_pool():
+    """使用系统 Python 的工作进程池（测试结束后终止所有进程）"""
+    from nodes.python_worker import PythonWorkerPool
+
+    pool = PythonWorkerPool(sys.executable, ".", size=1, max_tasks=3)
+    yield pool
+    await pool.close_async()
+
+
+class TestPythonWorkerPool:
+    """测试常驻 Python 工作进程池"""
+
+    @pytest.mark.asyncio
+    async def test_runs_code_in_fresh_namespace(self, worker_pool):
+        """测试每次执行使用独立命名空间，且复用同一个工作进程"""
+        stdout, stderr, code, _ = await worker_pool.run_async("x = 1\nprint(x)", timeout=10)
+        assert (stdout.strip(), code) == (b"1", 0)
+        worker = worker_pool._idle[0]
+
+        stdout, stderr, code, _ = await worker_pool.run_async("print(x)", timeout=10)
+        assert code == 1
+        assert b"NameError" in stderr
+        assert worker_pool._idle == [worker]
+
+    @pytest.mark.asyncio
+    async def test_exit_codes_match_python_c(self, worker_pool):
+        """测试 sys.exit / os._exit 的退出码与 python -c 一致"""
+        assert (await worker_pool.run_async("import sys; sys.exit(5)", timeout=10))[2] == 5
+        assert (await worker_pool.run_async("import sys; sys.exit()", timeout=10))[2] == 0
+
+        stdout, _, code, _ = await worker_pool.run_async(
+            "import os; print('a', flush=True); os._exit(4)", timeout=10
+        )
+        assert (stdout, code) == (b"a\n", 4)
+        assert worker_pool._idle == []
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_worker(self, worker_pool):
+        """测试超时后终止工作进程，下一次执行启动新进程"""
+        with pytest.raises(asyncio.TimeoutError):
+            await worker_pool.run_async("import time; time.sleep(10)", timeout=0.5)
+        assert worker_pool._idle == []
+
+        stdout, _, code, _ = await worker_pool.run_async("print('ok')", timeout=10)
+        assert (stdout, code) == (b"ok\n", 0)
+
+    @pytest.mark.asyncio
+    async def test_worker_recycled_after_max_tasks(self, worker_pool):
+        """测试执行 max_tasks 次后回收工作进程"""
+        for _ in range(3):
+            await worker_pool.run_async("pass", timeout=10)
+        assert worker_pool._idle == []
+
+    @pytest.mark.asyncio
+    async def test_runaway_output_kills_worker(self, worker_pool):
+        """测试输出超过上限时立即终止工作进程，并返回截断后的输出"""
+        start = time.monotonic()
+        stdout, _, _, terminated = await worker_pool.run_async(
+            "import sys\nwhile True: sys.stdout.write('x' * 100)", timeout=10, output_limit=1000
+        )
+
+        assert terminated is True
+        assert stdout == b"x" * 1001
+        assert worker_pool._idle == []
+        assert time.monotonic() - start < 5
+
+    @pytest.mark.asyncio
+    async def test_runaway_output_formatted_like_subprocess(self, monkeypatch):
+        """测试 execute_python 的输出超限结果与单次子进程一致"""
+        from nodes import tool_node
+        from nodes.python_worker import PythonWorkerPool
+
+        monkeypatch.setattr(tool_node, "OUTPUT_BYTE_LIMIT", 1000)
+        pool = PythonWorkerPool(sys.executable, ".", size=1)
+        monkeypatch.setattr(tool_node, "_PYTHON_WORKER_POOL", pool)
+        try:
+            result = await tool_node._run_python_async("import sys\nwhile True: sys.stdout.write('x' * 100)")
+        finally:
+            await pool.close_async()
+
+        assert result.startswith("x" * 1000)
+        assert result.endswith("[Output exceeded 1000 bytes, process terminated]")
+
+    @pytest.mark.asyncio
+    async def test_sys_path_restored_and_worker_reused(self, worker_pool):
+        """测试 sys.path 修改在执行后恢复，工作进程继续复用"""
+        await worker_pool.run_async("import sys; sys.path.append('/leaked')", timeout=10)
+        worker = worker_pool._idle[0]
+
+        stdout, _, _, _ = await worker_pool.run_async("import sys; print('/leaked' in sys.path)", timeout=10)
+        assert stdout.strip() == b"False"
+        assert worker_pool._idle == [worker]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("code", [
+        "import os; os.chdir('..')",
+        "import os; os.environ['PYWORKER_LEAK'] = '1'",
+        "import threading, time; threading.Thread(target=time.sleep, args=(5,), daemon=True).start()",
+    ])
+    async def test_leaked_state_recycles_worker(self, worker_pool, code):
+        """测试改变工作目录、环境变量或留下运行中线程时回收工作进程，下一次执行不受影响"""
+        import os
+
+        await worker_pool.run_async(code, timeout=10)
+        assert worker_pool._idle == []
+
+        check = "import os, threading; print(os.getcwd(), os.environ.get('PYWORKER_LEAK'), threading.active_count())"
+        stdout, _, _, _ = await worker_pool.run_async(check, timeout=10)
+        assert stdout.decode().split() == [os.getcwd(), "None", "1"]
+
+    @pytest.mark.asyncio
+    async def test_local_module_changes_visible(self, tmp_path):
+        """测试导入本地模块后回收工作进程，修改模块文件后再次导入得到新代码"""
+        from nodes.python_worker import PythonWorkerPool
+
+        pool = PythonWorkerPool(sys.executable, str(tmp_path), size=1)
+        try:
+            (tmp_path / "mymod.py").write_text("X = 1\n")
+            stdout, _, _, _ = await pool.run_async("import mymod; print(mymod.X)", timeout=10)
+            assert stdout.strip() == b"1"
+            assert pool._idle == []
+
+            (tmp_path / "mymod.py").write_text("X = 2\n")
+            stdout, _, _, _ = await pool.run_async("import mymod; print(mymod.X)", timeout=10)
+            assert stdout.strip() == b"2"
+        finally:
+            await pool.close_async()
+
+    @pytest.mark.asyncio
+    async def test_stdlib_import_keeps_worker(self, worker_pool):
+        """测试只导入标准库模块时继续复用工作进程"""
+        await worker_pool.run_async("import fractions", timeout=10)
+        assert len(worker_pool._idle) == 1
+
+    @pytest.mark.asyncio
+    async def test_patched_json_does_not_break_protocol(self, worker_pool):
+        """测试用户代码替换 json 函数后，执行结果和后续请求不受影响"""
+        code = "import json; json.dumps = json.loads = lambda *a, **k: 'HIJACKED'; print('done')"
+        stdout, _, code_, _ = await worker_pool.run_async(code, timeout=10)
+        assert (stdout, code_) == (b"done\n", 0)
+
+        stdout, _, _, _ = await worker_pool.run_async("print('next')", timeout=10)
+        assert stdout == b"next\n"
+
+    @pytest.mark.asyncio
+    async def test_unparsable_reply_raises(self, monkeypatch):
+        """测试无法解析的响应视为 PythonWorkerError（调用方回退为单次子进程）"""
+        from nodes import python_worker
+        from nodes.python_worker import PythonWorkerPool, PythonWorkerError
+
+        def broken_loads(line):
+            raise ValueError("bad reply")
+
+        monkeypatch.setattr(python_worker.json, "loads", broken_loads)
+        pool = PythonWorkerPool(sys.executable, ".", size=1)
+        try:
+            with pytest.raises(PythonWorkerError):
+                await pool.run_async("pass", timeout=10)
+            assert pool._idle == []
+        finally:
+            await pool.close_async()
+
+    @pytest.mark.asyncio
+    async def test_start_failure_raises(self):
+        """测试解释器无法启动时抛出 PythonWorkerError"""
+        from nodes.python_worker import PythonWorkerPool, PythonWorkerError
+
+        pool = PythonWorkerPool("/nonexistent/python", ".")
+        with pytest.raises(PythonWorkerError):
+            await pool.run_async("pass", timeout=10)
+
+
+class TestCityTimezone:
+    """测试城市时区查找"""
+
+    def test_known_city_case_insensitive(self):
+        """测试城市名大小写不敏感，且中文城市可直接查找"""
+        from nodes.tool_node import _get_city_timezone
+
+        assert str(_get_city_timezone("Tokyo")) == "Asia/Tokyo"
+        assert _get_city_timezone("TOKYO") is _get_city_timezone("tokyo")
+        assert str(_get_city_timezone("北京")) == "Asia/Shanghai"
+
+    def test_unknown_city(self):
+        """测试未知城市返回 None"""
+        from nodes.tool_node import _get_city_timezone
+
+        assert _get_city_timezone("Atlantis") is None
+
+
+class TestCap:
+    """测试结果截断"""
+
+    def test_short_text_returned_as_is(self):
+        """测试未超出上限时返回原对象"""
+        from nodes.tool_node import _cap
+
+        text = "abc"
+        assert _cap(text, 3, "...") is text
+
+    def test_long_text_truncated_with_suffix(self):
+        """测试超出上限时截断并追加后缀"""
+        from nodes.tool_node import _cap, _TRUNCATED_SUFFIX
+
+        assert _cap("abcdef", 4, _TRUNCATED_SUFFIX) == "abcd\n... (truncated)"
+        assert _cap("abcdef", 4) == "abcd"
+
+
+class TestStringifyResult:
+    """测试 MCP 工具结果转文本"""
+
+    def test_str_returned_as_is(self):
+        """测试字符串结果原样返回"""
+        from nodes.tool_node import _stringify_result
+
+        text = '{"a": 1}'
+        assert _stringify_result(text) is text
+
+    def test_dict_and_bytes(self):
+        """测试 dict 输出紧凑 JSON（保留中文），bytes 解码为文本"""
+        from nodes.tool_node import _stringify_result
+
+        assert _stringify_result({"城市": "北京", "temp": [1, 2]}) == '{"城市":"北京","temp":[1,2]}'
+        assert _stringify_result(b"ok\xff") == "ok�"
+
+    def test_unserializable_falls_back_to_str(self):
+        """测试无法 JSON 序列化时退回 str()"""
+        from nodes.tool_node import _stringify_result
+
+        value = {"s": {1, 2}}
+        assert _stringify_result(value) == str(value)
+
+
+class TestBuiltinDispatch:
+    """测试内置工具分派"""
+
+    @pytest.mark.asyncio
+    async def test_builtin_tool_handled_without_mcp(self):
+        """测试内置工具不需要 MCP Manager 即可执行并写入上下文"""
+        from nodes import Action, ToolNode, get_context
+
+        shared = {}
+        exec_res = {"tool_name": "get_current_time", "tool_params": {"city": "Tokyo"}}
+        action = await ToolNode().post_async(shared, {}, exec_res)
+
+        assert action == Action.DECIDE
+        context = get_context(shared)
+        assert "### Tool Call: get_current_time (Built-in)" in context
+        assert "[Tokyo]" in context
+
+    @pytest.mark.asyncio
+    async def test_missing_parameter_reported(self):
+        """测试内置工具缺少参数时在上下文中返回错误"""
+        from nodes import ToolNode, get_context
+
+        shared = {}
+        exec_res = {"tool_name": "execute_terminal", "tool_params": {}}
+        await ToolNode().post_async(shared, {}, exec_res)
+
+        assert "Error: command parameter is required" in get_context(shared)
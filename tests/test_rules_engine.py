@@ -0,0 +1,94 @@
+"""
+RulesEngine 单元测试
+
+测试全局规则文件的加载与缓存。
+
+运行方式:
+    pytest tests/test_rules_engine.py -v
+"""
+import os
+
+import pytest
+
+
+@pytest.fixture
+def rules_dir(tmp_path, monkeypatch):
+    """将规则目录重定向到临时目录"""
+    import rules_engine
+
+    monkeypatch.setattr(rules_engine, "RULES_DIR", tmp_path)
+    return tmp_path
+
+
+class TestLoadGlobalRules:
+    """测试全局规则加载"""
+
+    def test_cached_until_file_changes(self, rules_dir, capsys):
+        """测试文件未修改时使用缓存，修改后自动重新读取"""
+        from rules_engine import RulesEngine
+
+        rules_file = rules_dir / "global.md"
+        rules_file.write_text("rule A", encoding="utf-8")
+        engine = RulesEngine()
+
+        first = engine.load_global_rules()
+        assert "rule A" in first
+        assert engine.load_global_rules() is first
+        assert capsys.readouterr().out.count("Global rules loaded") == 1
+
+        rules_file.write_text("rule B changed", encoding="utf-8")
+        stat = rules_file.stat()
+        os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert "rule B changed" in engine.load_global_rules()
+
+    def test_missing_file_warns_once(self, rules_dir, capsys):
+        """测试规则文件不存在时只警告一次，文件创建后自动加载"""
+        from rules_engine import RulesEngine
+
+        engine = RulesEngine()
+
+        assert engine.load_global_rules() == ""
+        assert engine.load_global_rules() == ""
+        assert capsys.readouterr().out.count("Global rules file not found") == 1
+
+        (rules_dir / "global.md").write_text("new rule", encoding="utf-8")
+        assert "new rule" in engine.load_global_rules()
+
+
+class TestFormatRules:
+    """测试规则格式化"""
+
+    def test_banner_layout(self):
+        """测试标题框与规则内容之间的空行布局"""
+        from rules_engine import RulesEngine
+
+        formatted = RulesEngine()._format_rules("rule")
+        banner = "=" * 70
+
+        assert formatted == (
+            f"{banner}\n\n📋 BEHAVIOR RULES (行为准则)\n\n{banner}\n\n\n\n"
+            f"rule\n\n\n\n{banner}\n\n⚠️  请严格遵守以上规则，确保行为一致性和质量\n\n{banner}"
+        )
+
+
+class TestInjectRules:
+    """测试规则注入"""
+
+    def test_inject_prefixes_rules(self, rules_dir):
+        """测试规则以空行分隔注入到 prompt 前"""
+        from rules_engine import RulesEngine
+
+        (rules_dir / "global.md").write_text("rule A", encoding="utf-8")
+        engine = RulesEngine()
+
+        result = engine.inject_rules_to_prompt("do it")
+
+        assert result == f"{engine.load_global_rules()}\n\ndo it"
+        assert engine.inject_rules_to_prompt("do it", include_rules=False) == "do it"
+
+    def test_inject_without_rules_file(self, rules_dir):
+        """测试没有规则文件时原样返回 prompt"""
+        from rules_engine import RulesEngine
+
+        assert RulesEngine().inject_rules_to_prompt("do it") == "do it"
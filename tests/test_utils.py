@@ -75,3 +75,52 @@ class TestCallLlmAsync:
         # async_input 需要在事件循环中调用
         # 这里只验证函数存在且是异步函数
         assert asyncio.iscoroutinefunction(async_input)
+
+
+class TestCallLlmsAsync:
+    """测试 call_llms_async 并发调用"""
+
+    @pytest.mark.asyncio
+    async def test_results_in_order_with_concurrency_cap(self, monkeypatch):
+        """测试结果顺序与输入一致，且并发数不超过上限"""
+        import asyncio
+        import utils
+
+        monkeypatch.setattr(utils, "LLM_MAX_CONCURRENCY", 2)
+        active = 0
+        peak = 0
+
+        async def fake_call_llm_async(messages, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01 * (5 - len(messages)))
+            active -= 1
+            return f"{len(messages)}:{kwargs['use_fast']}"
+
+        monkeypatch.setattr(utils, "call_llm_async", fake_call_llm_async)
+
+        batches = [[{"role": "user", "content": "x"}] * n for n in range(1, 5)]
+        result = await utils.call_llms_async(batches, use_fast=True)
+
+        assert result == ["1:True", "2:True", "3:True", "4:True"]
+        assert peak == 2
+
+
+class TestLlmConfig:
+    """测试 LLM 配置缓存"""
+
+    def test_config_cached_until_reload(self, monkeypatch):
+        """测试配置只读取一次环境变量，reload_config 后重新读取"""
+        import utils
+
+        monkeypatch.setenv("LLM_MODEL", "test/model-a")
+        monkeypatch.setenv("LLM_TEMPERATURE", "0.1")
+        cfg = utils.reload_config()
+        assert (cfg.model, cfg.temperature) == ("test/model-a", 0.1)
+
+        monkeypatch.setenv("LLM_MODEL", "test/model-b")
+        assert utils._config() is cfg
+
+        monkeypatch.undo()
+        assert utils.reload_config().model == os.environ.get("LLM_MODEL", utils.DEFAULT_MODEL)
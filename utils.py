@@ -2,11 +2,17 @@
 LLM 调用工具模块
 
 提供同步和异步两种 LLM 调用方式，推荐使用异步版本。
+
+多个互不依赖的请求应使用 call_llms_async() 并发发出，而不是逐个 await:
+    answers = await call_llms_async([messages_a, messages_b], use_fast=True)
 """
 
 from litellm import completion, acompletion
 import os
 import asyncio
+import time
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
@@ -28,6 +34,41 @@ DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 4096  # 默认最大响应 token 数
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 2  # 指数退避基数（秒）
+LLM_MAX_CONCURRENCY = 8  # call_llms_async 同时进行的请求数上限
+
+
+@dataclass(slots=True, frozen=True)
+class LLMConfig:
+    """
+    从环境变量读取的 LLM 配置
+
+    Attributes:
+        model: 默认模型（LLM_MODEL）
+        fast_model: 快速模型（LLM_FAST_MODEL）
+        temperature: 生成温度（LLM_TEMPERATURE）
+        max_tokens: 最大响应 token 数（LLM_MAX_TOKENS）
+    """
+    model: str
+    fast_model: str
+    temperature: float
+    max_tokens: int
+
+
+@lru_cache(maxsize=1)
+def _config() -> LLMConfig:
+    """读取并缓存 LLM 配置（环境变量在运行期间修改后需调用 reload_config()）"""
+    return LLMConfig(
+        model=os.environ.get("LLM_MODEL", DEFAULT_MODEL),
+        fast_model=os.environ.get("LLM_FAST_MODEL", DEFAULT_FAST_MODEL),
+        temperature=float(os.environ.get("LLM_TEMPERATURE", str(DEFAULT_TEMPERATURE))),
+        max_tokens=int(os.environ.get("LLM_MAX_TOKENS", str(DEFAULT_MAX_TOKENS))),
+    )
+
+
+def reload_config() -> LLMConfig:
+    """丢弃缓存的 LLM 配置，重新从环境变量读取"""
+    _config.cache_clear()
+    return _config()
 
 
 # ============================================================================
@@ -49,25 +90,21 @@ def call_llm(messages: List[Dict]) -> str:
     Raises:
         RuntimeError: LLM 调用失败时抛出
     """
-    model = os.environ.get("LLM_MODEL", DEFAULT_MODEL)
-    temperature = float(os.environ.get("LLM_TEMPERATURE", str(DEFAULT_TEMPERATURE)))
-    max_tokens = int(os.environ.get("LLM_MAX_TOKENS", str(DEFAULT_MAX_TOKENS)))
-
+    cfg = _config()
     last_error: Optional[Exception] = None
 
     for attempt in range(MAX_RETRIES):
         try:
             response = completion(
-                model=model,
+                model=cfg.model,
                 messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
+                temperature=cfg.temperature,
+                max_tokens=cfg.max_tokens
             )
             return response.choices[0].message.content
         except Exception as e:
             last_error = e
             if attempt < MAX_RETRIES - 1:
-                import time
                 delay = RETRY_DELAY_BASE ** attempt
                 print(f"[WARN] LLM call failed (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
                 print(f"       Retrying in {delay}s...")
@@ -109,18 +146,17 @@ async def call_llm_async(
         3. 环境变量 LLM_MODEL
         4. 默认模型
     """
+    cfg = _config()
+
     # 模型选择
     if model is None:
-        if use_fast:
-            model = os.environ.get("LLM_FAST_MODEL", DEFAULT_FAST_MODEL)
-        else:
-            model = os.environ.get("LLM_MODEL", DEFAULT_MODEL)
+        model = cfg.fast_model if use_fast else cfg.model
 
     # 参数配置
     if temperature is None:
-        temperature = float(os.environ.get("LLM_TEMPERATURE", str(DEFAULT_TEMPERATURE)))
+        temperature = cfg.temperature
     if max_tokens is None:
-        max_tokens = int(os.environ.get("LLM_MAX_TOKENS", str(DEFAULT_MAX_TOKENS)))
+        max_tokens = cfg.max_tokens
 
     last_error: Optional[Exception] = None
 
@@ -144,6 +180,31 @@ async def call_llm_async(
     raise RuntimeError(f"LLM call failed after {MAX_RETRIES} attempts: {last_error}")
 
 
+async def call_llms_async(batches: List[List[Dict]], **kwargs) -> List[str]:
+    """
+    【异步】并发调用 LLM
+
+    对每组消息调用 call_llm_async()，同时进行的请求不超过 LLM_MAX_CONCURRENCY 个。
+
+    Args:
+        batches: 多组消息列表
+        **kwargs: 传给 call_llm_async() 的参数（model、use_fast 等）
+
+    Returns:
+        与 batches 顺序一致的响应文本列表
+
+    Raises:
+        RuntimeError: 任一调用多次重试后仍失败时抛出
+    """
+    semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+    async def _call_async(messages: List[Dict]) -> str:
+        async with semaphore:
+            return await call_llm_async(messages, **kwargs)
+
+    return list(await asyncio.gather(*(_call_async(messages) for messages in batches)))
+
+
 async def async_input(prompt: str) -> str:
     """
     【异步】获取用户输入